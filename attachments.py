@@ -0,0 +1,179 @@
+"""Content-addressed storage for images embedded in notes.
+
+Images pasted into a note arrive as base64 data: URIs inside the HTML. Before
+a note is written they are moved into the attachments table, keyed by their
+SHA-256, and the <img> tags point at "cs-attachment:<hash>" instead. Identical
+images are stored once no matter how many notes use them, and the notes rows
+stay small. Large blobs can optionally live as files next to the database.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import re
+
+SCHEME = "cs-attachment"
+
+_DATA_URI = re.compile(
+    r"""(?P<prefix>\bsrc\s*=\s*)(?P<quote>["'])data:(?P<mime>image/[\w.+-]+);base64,"""
+    r"""(?P<data>[A-Za-z0-9+/=\s]+)(?P=quote)""",
+    re.IGNORECASE,
+)
+_REFERENCE = re.compile(SCHEME + r":([0-9a-f]{64})")
+
+
+def extract_data_uris(html):
+    """Replace embedded base64 images by attachment references.
+
+    Returns the rewritten HTML and a list of (hash, mime, data) tuples.
+    """
+    if not html or "data:" not in html:
+        return html, []
+    blobs = {}
+
+    def replace(match):
+        try:
+            data = base64.b64decode(re.sub(r"\s+", "", match.group("data")), validate=True)
+        except (binascii.Error, ValueError):
+            return match.group(0)
+        digest = hashlib.sha256(data).hexdigest()
+        blobs[digest] = (digest, match.group("mime").lower(), data)
+        quote = match.group("quote")
+        return f"{match.group('prefix')}{quote}{SCHEME}:{digest}{quote}"
+
+    html = _DATA_URI.sub(replace, html)
+    return html, list(blobs.values())
+
+
+def references(html):
+    """Hashes of the attachments an HTML body points at."""
+    return set(_REFERENCE.findall(html or ""))
+
+
+class AttachmentStore:
+    """Attachment tables of one DatabaseManager.
+
+    Methods that write take the cursor of the caller's transaction. Files of
+    external attachments are only removed by DatabaseManager after the
+    transaction that dropped their last reference has committed.
+    """
+
+    def __init__(self, directory, external=False, external_min_size=64 * 1024):
+        self.directory = directory
+        self.external = external
+        self.external_min_size = external_min_size
+
+    def create_tables(self, cursor):
+        """Create the tables; returns True when they did not exist yet."""
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'attachments'"
+        ).fetchone()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS attachments (
+                hash TEXT PRIMARY KEY,
+                mime TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                data BLOB,
+                path TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS note_attachments (
+                note_id INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+                hash TEXT NOT NULL REFERENCES attachments (hash),
+                PRIMARY KEY (note_id, hash)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_note_attachments_hash ON note_attachments (hash)")
+        return exists is None
+
+    def _file_path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def store(self, cursor, blobs):
+        for digest, mime, data in blobs:
+            if cursor.execute("SELECT 1 FROM attachments WHERE hash = ?", (digest,)).fetchone():
+                continue
+            path = None
+            if self.external and len(data) >= self.external_min_size:
+                path = self._file_path(digest)
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp = path + ".tmp"
+                    with open(tmp, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp, path)
+                data = None
+            cursor.execute(
+                "INSERT INTO attachments (hash, mime, size, data, path) VALUES (?, ?, ?, ?, ?)",
+                (digest, mime, len(data) if data is not None else os.path.getsize(path), data, path),
+            )
+
+    def link(self, cursor, note_id, html, extra=()):
+        """Point note_attachments of a note at what its HTML references.
+
+        `extra` are hashes the note keeps using besides its HTML (images of
+        its earlier revisions). Returns file paths of attachments that are
+        no longer used anywhere.
+        """
+        current = {row[0] for row in cursor.execute(
+            "SELECT hash FROM note_attachments WHERE note_id = ?", (note_id,))}
+        wanted = references(html) | set(extra)
+        known = {row[0] for row in cursor.execute(
+            f"SELECT hash FROM attachments WHERE hash IN ({','.join('?' * len(wanted))})",
+            tuple(wanted))} if wanted else set()
+        cursor.executemany(
+            "INSERT OR IGNORE INTO note_attachments (note_id, hash) VALUES (?, ?)",
+            [(note_id, digest) for digest in wanted & known],
+        )
+        dropped = current - wanted
+        cursor.executemany(
+            "DELETE FROM note_attachments WHERE note_id = ? AND hash = ?",
+            [(note_id, digest) for digest in dropped],
+        )
+        return self.release(cursor, dropped)
+
+    def release(self, cursor, hashes):
+        """Delete attachments among `hashes` that no note references anymore."""
+        paths = []
+        for digest in hashes:
+            if cursor.execute(
+                "SELECT 1 FROM note_attachments WHERE hash = ? LIMIT 1", (digest,)
+            ).fetchone():
+                continue
+            row = cursor.execute("SELECT path FROM attachments WHERE hash = ?", (digest,)).fetchone()
+            cursor.execute("DELETE FROM attachments WHERE hash = ?", (digest,))
+            if row and row[0]:
+                paths.append(row[0])
+        return paths
+
+    def load(self, conn, digest):
+        """Return (mime, data) of an attachment, or None if it is unknown."""
+        row = conn.execute(
+            "SELECT mime, data, path FROM attachments WHERE hash = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            return None
+        mime, data, path = row
+        if data is None and path:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                return None
+        return mime, data
+
+    def resolve(self, conn, html):
+        """Turn attachment references back into data: URIs (for exports)."""
+        if not html or SCHEME not in html:
+            return html
+
+        def replace(match):
+            found = self.load(conn, match.group(1))
+            if found is None:
+                return match.group(0)
+            mime, data = found
+            return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+        return _REFERENCE.sub(replace, html)
@@ -0,0 +1,157 @@
+"""Online backups and restores built on the SQLite backup API.
+
+Backups copy pages in small steps from a consistent snapshot of the live
+database, so they are safe while the app keeps writing. Snapshots can be
+gzip compressed and rotated by SnapshotManager.
+"""
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from database import QueryCancelled
+
+# Pages copied per backup step; between steps the writer can get in
+BACKUP_PAGES = 256
+SNAPSHOT_PREFIX = "notes-"
+SNAPSHOT_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+
+class RestoreError(Exception):
+    """The file chosen for a restore is not a usable notes database."""
+
+
+def _step_callback(progress, cancel):
+    def callback(status, remaining, total):
+        if cancel is not None and cancel.is_set():
+            raise QueryCancelled()
+        if progress is not None:
+            progress(total - remaining, total)
+    return callback
+
+
+def is_compressed(path):
+    return path.endswith(".gz")
+
+
+def backup_database(db, dest, compress=None, pages=BACKUP_PAGES, progress=None, cancel=None):
+    """Write a consistent copy of the notes database to `dest`.
+
+    `compress` defaults to True when `dest` ends with ".gz". The copy is built
+    next to `dest` under a temporary name and only moved in place once it is
+    complete, so an interrupted backup never leaves a torn file behind.
+    """
+    if compress is None:
+        compress = is_compressed(dest)
+    folder = os.path.dirname(os.path.abspath(dest))
+    fd, tmp_db = tempfile.mkstemp(suffix=".db", dir=folder)
+    os.close(fd)
+    try:
+        target = sqlite3.connect(tmp_db)
+        try:
+            db.backup_to(target, pages=pages, progress=_step_callback(progress, cancel))
+            # A single self-contained file: no -wal/-shm needed next to it
+            target.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            target.close()
+        if compress:
+            tmp_gz = tmp_db + ".gz"
+            with open(tmp_db, "rb") as src, gzip.open(tmp_gz, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.remove(tmp_db)
+            tmp_db = tmp_gz
+        os.replace(tmp_db, dest)
+    except BaseException:
+        if os.path.exists(tmp_db):
+            os.remove(tmp_db)
+        raise
+    return dest
+
+
+def verify_backup(path):
+    """Raise RestoreError unless `path` is an intact notes database."""
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        raise RestoreError(str(e)) from e
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != "ok":
+            raise RestoreError(f"integrity check failed: {result}")
+        if conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes'"
+        ).fetchone() is None:
+            raise RestoreError("file does not contain a notes table")
+    except sqlite3.DatabaseError as e:
+        raise RestoreError(str(e)) from e
+    finally:
+        conn.close()
+
+
+def restore_database(db, source, pages=BACKUP_PAGES, progress=None, cancel=None):
+    """Verify the backup at `source` and copy it over the live database."""
+    tmp_db = None
+    path = source
+    try:
+        if is_compressed(source):
+            fd, tmp_db = tempfile.mkstemp(suffix=".db")
+            with os.fdopen(fd, "wb") as dst, gzip.open(source, "rb") as src:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            path = tmp_db
+        verify_backup(path)
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            db.restore_from(conn, pages=pages, progress=_step_callback(progress, cancel))
+        finally:
+            conn.close()
+    finally:
+        if tmp_db is not None and os.path.exists(tmp_db):
+            os.remove(tmp_db)
+    return source
+
+
+class SnapshotManager:
+    """Keeps a rotating set of compressed snapshots in one directory."""
+
+    def __init__(self, db, directory=None, keep=7, compress=True):
+        self.db = db
+        self.directory = directory or os.path.join(os.path.dirname(db.db_name), "snapshots")
+        self.keep = keep
+        self.compress = compress
+
+    def snapshots(self):
+        """Snapshot paths, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        names = [n for n in os.listdir(self.directory)
+                 if n.startswith(SNAPSHOT_PREFIX) and (n.endswith(".db") or n.endswith(".db.gz"))]
+        return [os.path.join(self.directory, n) for n in sorted(names, reverse=True)]
+
+    def last_snapshot_time(self):
+        snapshots = self.snapshots()
+        if not snapshots:
+            return None
+        stamp = os.path.basename(snapshots[0])[len(SNAPSHOT_PREFIX):].split(".")[0]
+        try:
+            return datetime.strptime(stamp, SNAPSHOT_TIME_FORMAT)
+        except ValueError:
+            return None
+
+    def is_due(self, interval=timedelta(days=1), now=None):
+        last = self.last_snapshot_time()
+        return last is None or (now or datetime.now()) - last >= interval
+
+    def create(self, progress=None, cancel=None, now=None):
+        """Take a snapshot, then drop the ones beyond `keep`."""
+        os.makedirs(self.directory, exist_ok=True)
+        name = SNAPSHOT_PREFIX + (now or datetime.now()).strftime(SNAPSHOT_TIME_FORMAT)
+        name += ".db.gz" if self.compress else ".db"
+        path = backup_database(self.db, os.path.join(self.directory, name),
+                               compress=self.compress, progress=progress, cancel=cancel)
+        self.prune()
+        return path
+
+    def prune(self):
+        for path in self.snapshots()[self.keep:]:
+            os.remove(path)
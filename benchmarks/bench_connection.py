@@ -0,0 +1,89 @@
+"""Micro-benchmark: per-call connections vs. the pooled DatabaseManager.
+
+Run from the repository root:
+
+    python benchmarks/bench_connection.py [--ops 2000]
+
+"Before" reproduces the old access pattern (sqlite3.connect + execute +
+commit for every call, rollback journal). "After" goes through the pooled
+writer/reader connections in WAL mode.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager, text_columns  # noqa: E402
+
+BODY = "<p>Catatan benchmark dengan <b>sedikit</b> HTML dan teks biasa.</p>" * 5
+
+
+def legacy_add(path, i):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(
+            "INSERT INTO notes (title, catatan, sumber_catatan, plain_text, snippet, char_count)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (f"Catatan {i}", BODY, None) + text_columns(BODY),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def legacy_read(path, i):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("SELECT id, title, catatan FROM notes WHERE id = ?", (i,)).fetchone()
+    finally:
+        conn.close()
+
+
+def pooled_add(db, i):
+    db.add_note(f"Catatan {i}", BODY)
+
+
+def pooled_read(db, i):
+    with db.reader() as conn:
+        conn.execute("SELECT id, title, catatan FROM notes WHERE id = ?", (i,)).fetchone()
+
+
+def timed(fn, target, ops):
+    start = time.perf_counter()
+    for i in range(1, ops + 1):
+        fn(target, i)
+    elapsed = time.perf_counter() - start
+    return ops / elapsed if elapsed else float("inf")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=2000, help="operations per scenario")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        # Same schema for both; the legacy file goes back to a rollback journal
+        DatabaseManager("legacy.db", folder=folder).close()
+        legacy_path = os.path.join(folder, "legacy.db")
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+
+        db = DatabaseManager("pooled.db", folder=folder)
+        results = [
+            ("add_note", timed(legacy_add, legacy_path, args.ops), timed(pooled_add, db, args.ops)),
+            ("read by id", timed(legacy_read, legacy_path, args.ops), timed(pooled_read, db, args.ops)),
+        ]
+        db.close()
+
+    print(f"{'operation':<12} {'before ops/s':>14} {'after ops/s':>14} {'speedup':>9}")
+    for name, before, after in results:
+        print(f"{name:<12} {before:>14.0f} {after:>14.0f} {after / before:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Synthetic note corpora that look like rich text pasted from the web.
+
+Bodies mimic what QTextEdit.toHtml() stores for pasted articles: a full HTML
+document with a <style> header, inline-styled spans, links and lists. Sizes
+follow a long-tailed distribution, like real pasted content.
+"""
+import random
+
+WORDS = (
+    "catatan kopi teh rapat anggaran proyek laporan jadwal server database python "
+    "kode fungsi kelas modul data query indeks cache memori disk jaringan cloud "
+    "deploy rilis versi bug fitur desain antarmuka pengguna tabel kolom baris "
+    "pencarian ekspor impor backup kunci token rahasia artikel berita resep "
+    "the quick brown fox performance latency throughput benchmark profile sqlite "
+    "qt widget model view thread async worker pool commit branch merge review"
+).split()
+
+DOC_HEAD = (
+    '<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.0//EN" "http://www.w3.org/TR/REC-html40/strict.dtd">\n'
+    '<html><head><meta name="qrichtext" content="1" /><meta charset="utf-8" />'
+    '<style type="text/css">\np, li { white-space: pre-wrap; }\nhr { height: 1px; border-width: 0; }\n'
+    'li.unchecked::marker { content: "\\2610"; }\nli.checked::marker { content: "\\2612"; }\n'
+    "</style></head><body style=\" font-family:'Noto Sans'; font-size:10pt; font-weight:400; "
+    'font-style:normal;">\n'
+)
+DOC_TAIL = "</body></html>"
+PARAGRAPH = (
+    '<p style=" margin-top:12px; margin-bottom:12px; margin-left:0px; margin-right:0px; '
+    '-qt-block-indent:0; text-indent:0px;">{}</p>\n'
+)
+
+
+def _sentence(rng, length):
+    words = [rng.choice(WORDS) for _ in range(length)]
+    # A few unique tokens per note so selective searches have something to hit
+    words.append(f"tok{rng.randrange(100000)}")
+    return " ".join(words).capitalize() + "."
+
+
+def _inline(rng, text):
+    words = text.split(" ")
+    i = rng.randrange(len(words))
+    style = rng.choice((
+        "font-weight:700;", "font-style:italic;", "color:#1d4ed8;", "text-decoration: underline;"
+    ))
+    words[i] = f'<span style=" {style}">{words[i]}</span>'
+    if rng.random() < 0.3:
+        j = rng.randrange(len(words))
+        words[j] = f'<a href="https://example.com/{rng.randrange(10**6)}"><span style=" text-decoration: underline; color:#0000ff;">{words[j]}</span></a>'
+    return " ".join(words)
+
+
+def make_body(rng, target_bytes):
+    parts = [DOC_HEAD]
+    size = len(DOC_HEAD)
+    while size < target_bytes:
+        if rng.random() < 0.15:
+            items = "".join(
+                f'<li style=" margin-top:0px; margin-bottom:0px;">{_sentence(rng, rng.randint(3, 10))}</li>\n'
+                for _ in range(rng.randint(2, 6))
+            )
+            block = f'<ul style="margin-top: 0px; margin-bottom: 0px;">\n{items}</ul>\n'
+        else:
+            text = " ".join(_sentence(rng, rng.randint(6, 20)) for _ in range(rng.randint(1, 5)))
+            block = PARAGRAPH.format(_inline(rng, text))
+        parts.append(block)
+        size += len(block)
+    parts.append(DOC_TAIL)
+    return "".join(parts)
+
+
+def generate_notes(count, seed=1, mean_bytes=4000):
+    """Yield `count` note dicts for DatabaseManager.import_notes."""
+    rng = random.Random(seed)
+    for i in range(count):
+        target = min(int(rng.lognormvariate(0, 0.8) * mean_bytes), mean_bytes * 25)
+        yield {
+            "title": " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 7))).title(),
+            "catatan": make_body(rng, target),
+            "sumber": f"https://example.com/artikel/{i}" if rng.random() < 0.6 else None,
+            "created_at": f"20{rng.randint(18, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                          f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}",
+        }
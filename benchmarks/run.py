@@ -0,0 +1,297 @@
+"""Benchmark suite for the DatabaseManager and MainWindow hot paths.
+
+Run from the repository root:
+
+    python benchmarks/run.py --sizes 1000,10000 --output results.json
+    python benchmarks/run.py --sizes 100000 --profile prof/ --tracemalloc
+    python benchmarks/run.py --compare results.json
+
+Each corpus size gets its own synthetic database (see corpus.py). Results are
+written as JSON with the git commit, so runs can be compared across commits
+with --compare. display_notes and startup (a cold start of main.py in a new
+process) run under the offscreen Qt platform and are skipped when PySide6 is
+not installed.
+"""
+import argparse
+import cProfile
+import importlib.util
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import backup  # noqa: E402
+import exporter  # noqa: E402
+from corpus import generate_notes, make_body  # noqa: E402
+from database import DatabaseManager  # noqa: E402
+from text_utils import html_to_text  # noqa: E402
+
+SEARCH_QUERIES = ("kopi", "data", '"quick brown"', "bench*", "tok4242", "laporan anggaran")
+ADD_NOTE_OPS = 200
+STRIP_HTML_OPS = 200
+
+
+def scenario_strip_html(ctx):
+    rng = random.Random(7)
+    bodies = [make_body(rng, 4000) for _ in range(STRIP_HTML_OPS)]
+
+    def run():
+        for body in bodies:
+            html_to_text(body)
+        return len(bodies)
+    return run
+
+
+def scenario_get_all_notes(ctx):
+    return lambda: len(ctx["db"].get_all_notes())
+
+
+def scenario_list_pages(ctx):
+    def run():
+        pages, after = 0, None
+        for _ in range(10):
+            page = ctx["db"].get_notes_page(after=after, limit=200)
+            if not page:
+                break
+            after = (page[-1][4], page[-1][0])
+            pages += 1
+        return pages
+    return run
+
+
+def scenario_search_notes(ctx):
+    def run():
+        for query in SEARCH_QUERIES:
+            ctx["db"].search_notes(query, limit=200)
+        return len(SEARCH_QUERIES)
+    return run
+
+
+def scenario_display_notes(ctx):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PySide6.QtWidgets import QApplication
+    except ImportError:
+        return None
+    import main
+    app = QApplication.instance() or QApplication([])
+    window = ctx.get("window")
+    if window is None or window.db is not ctx["db"]:
+        window = ctx["window"] = main.MainWindow(ctx["db"])
+        window.show()
+
+    def run():
+        window.display_notes()
+        app.processEvents()
+        return 1
+    return run
+
+
+def scenario_startup(ctx):
+    """Cold start of main.py in a fresh process until the first page is shown."""
+    if importlib.util.find_spec("PySide6") is None:
+        return None
+    home = os.path.join(ctx["workdir"], f"startup-{ctx['size']}")
+    path = os.path.join(home, ".catat-segala", "notes.db")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        backup.backup_database(ctx["db"], path)
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    command = [sys.executable, os.path.join(ROOT, "main.py"), "--profile-startup",
+               "--quit-after-startup"]
+
+    def run():
+        # Exit status 1 means over budget, the timing is still recorded
+        subprocess.run(command, cwd=home, env=env, capture_output=True, timeout=60)
+        return 1
+    return run
+
+
+def scenario_export_csv(ctx):
+    path = os.path.join(ctx["workdir"], "export.csv")
+    return lambda: exporter.export_notes(ctx["db"], path, "csv")
+
+
+def scenario_backup(ctx):
+    path = os.path.join(ctx["workdir"], "backup.db")
+
+    def run():
+        backup.backup_database(ctx["db"], path)
+        return 1
+    return run
+
+
+def scenario_add_note(ctx):
+    rng = random.Random(11)
+    notes = list(generate_notes(ADD_NOTE_OPS, seed=rng.randrange(10**6)))
+
+    def run():
+        for note in notes:
+            ctx["db"].add_note(note["title"], note["catatan"], note["sumber"])
+        return len(notes)
+    return run
+
+
+# add_note grows the corpus, so it runs last
+SCENARIOS = {
+    "strip_html": scenario_strip_html,
+    "get_all_notes": scenario_get_all_notes,
+    "list_pages": scenario_list_pages,
+    "search_notes": scenario_search_notes,
+    "display_notes": scenario_display_notes,
+    "startup": scenario_startup,
+    "export_csv": scenario_export_csv,
+    "backup": scenario_backup,
+    "add_note": scenario_add_note,
+}
+
+
+def prepare_corpus(size, workdir, seed, mean_bytes):
+    """Open (or build) the corpus database for `size` notes."""
+    name = f"corpus-{size}-{seed}-{mean_bytes}.db"
+    db = DatabaseManager(name, folder=workdir)
+    existing = db.count_notes()
+    result = None
+    if existing < size:
+        stats = db.import_notes(generate_notes(size, seed=seed, mean_bytes=mean_bytes))
+        # Includes generating the synthetic HTML, not just import_notes
+        result = {"scenario": "build_corpus", "size": size, "ops": stats.imported,
+                  "seconds": [stats.seconds], "ops_per_sec": stats.rate}
+    return db, result
+
+
+def measure(name, run, size, repeat, profile_dir, trace_memory):
+    timings, ops = [], 0
+    for i in range(repeat):
+        profiler = None
+        if profile_dir and i == 0:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        ops = run()
+        timings.append(time.perf_counter() - start)
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(profile_dir, f"{name}-{size}.prof"))
+    result = {
+        "scenario": name,
+        "size": size,
+        "ops": ops,
+        "seconds": timings,
+        "median_seconds": statistics.median(timings),
+        "ops_per_sec": ops / min(timings) if min(timings) else None,
+    }
+    if trace_memory:
+        # Separate run: tracemalloc slows allocation-heavy code a lot
+        tracemalloc.start()
+        run()
+        result["peak_kib"] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline_path, results):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["scenario"], r["size"]): r for r in json.load(f)["results"]}
+    print(f"{'scenario':<16} {'size':>8} {'before s':>10} {'after s':>10} {'change':>8}", file=sys.stderr)
+    for r in results:
+        old = baseline.get((r["scenario"], r["size"]))
+        if not old:
+            continue
+        before, after = min(old["seconds"]), min(r["seconds"])
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{r['scenario']:<16} {r['size']:>8} {before:>10.4f} {after:>10.4f} {change:>+7.1f}%",
+              file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="comma separated corpus sizes, e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="comma separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mean-bytes", type=int, default=4000, help="average HTML body size")
+    parser.add_argument("--workdir", help="keep corpus databases here and reuse them between runs")
+    parser.add_argument("--output", help="write JSON results to this file instead of stdout")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--profile", metavar="DIR", help="write a cProfile .prof file per scenario")
+    parser.add_argument("--tracemalloc", action="store_true", help="record peak Python memory")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    names = [n for n in args.scenarios.split(",") if n]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error("unknown scenario: " + ", ".join(sorted(unknown)))
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+
+    tmp = None
+    workdir = args.workdir
+    if workdir is None:
+        tmp = tempfile.TemporaryDirectory()
+        workdir = tmp.name
+    results = []
+    try:
+        for size in sizes:
+            db, import_result = prepare_corpus(size, workdir, args.seed, args.mean_bytes)
+            if import_result:
+                results.append(import_result)
+            ctx = {"db": db, "workdir": workdir, "size": size}
+            for name in names:
+                run = SCENARIOS[name](ctx)
+                if run is None:
+                    print(f"skipping {name}: PySide6 not available", file=sys.stderr)
+                    continue
+                result = measure(name, run, size, args.repeat, args.profile, args.tracemalloc)
+                print(f"{name:<16} {size:>8} {min(result['seconds']):.4f}s", file=sys.stderr)
+                results.append(result)
+            window = ctx.get("window")
+            if window is not None:
+                window.close()
+            db.close()
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.compare:
+        compare(args.compare, results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
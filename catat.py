@@ -0,0 +1,150 @@
+"""Command line interface, run as `python -m catat <command>`.
+
+Works on the same database as the app without loading Qt, for scripts and
+shell pipelines:
+
+    python -m catat add "Judul" "isi catatan" --sumber https://... --tag kerja
+    echo "isi" | python -m catat add "Judul" -
+    python -m catat import notes.jsonl        (or - for JSON Lines on stdin)
+    python -m catat search "kata kunci" --json
+    python -m catat export notes.csv --format csv
+    python -m catat backup cadangan.db.gz
+    python -m catat serve --port 8765         (HTTP API, see server.py)
+"""
+import argparse
+import json
+import os
+import sys
+
+from database import DatabaseManager
+
+# Export format by file extension; a path without one is a Markdown folder
+EXPORT_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", "": "markdown"}
+
+
+def _add_filter_arguments(parser):
+    parser.add_argument("--since", help="dibuat pada atau setelah (YYYY-MM-DD)")
+    parser.add_argument("--until", help="dibuat sebelum (YYYY-MM-DD)")
+    parser.add_argument("--sumber", help="hanya catatan dari sumber ini")
+    parser.add_argument("--tag", action="append", dest="tags", help="harus punya tag ini (bisa diulang)")
+    parser.add_argument("--pinned", action="store_true", default=None, help="hanya catatan tersemat")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m catat", description="Catat Segala tanpa GUI")
+    parser.add_argument("--folder", default=".catat-segala", help="folder database (default: %(default)s)")
+    parser.add_argument("--db", default="notes.db", help="nama file database (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="tambah satu catatan")
+    add.add_argument("title")
+    add.add_argument("catatan", nargs="?", default="", help="isi catatan, - untuk membaca stdin")
+    add.add_argument("--sumber")
+    add.add_argument("--tag", action="append", dest="tags")
+    add.add_argument("--pinned", action="store_true")
+
+    search = commands.add_parser("search", help="cari catatan")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--json", action="store_true", help="keluaran JSON Lines")
+    _add_filter_arguments(search)
+
+    export = commands.add_parser("export", help="ekspor semua catatan")
+    export.add_argument("path")
+    export.add_argument("--format", choices=("csv", "jsonl", "markdown"), default=None,
+                        help="default dari ekstensi: .csv, .jsonl, tanpa ekstensi untuk folder markdown")
+    export.add_argument("--strip", action="store_true", default=None, help="simpan teks biasa, bukan HTML")
+
+    import_ = commands.add_parser("import", help="impor csv, json, jsonl atau folder html")
+    import_.add_argument("path", help="- untuk JSON Lines dari stdin")
+
+    backup = commands.add_parser("backup", help="cadangkan database")
+    backup.add_argument("dest", help="file tujuan, .gz untuk kompresi")
+
+    serve = commands.add_parser("serve", help="jalankan HTTP API lokal")
+    serve.add_argument("--host", default=None)
+    serve.add_argument("--port", type=int, default=None)
+    return parser
+
+
+def _filters(args):
+    return {"since": args.since, "until": args.until, "sumber": args.sumber,
+            "tags": args.tags, "pinned": args.pinned}
+
+
+def cmd_add(db, args, out):
+    catatan = sys.stdin.read() if args.catatan == "-" else args.catatan
+    row = db.add_note(args.title, catatan, args.sumber, tags=args.tags, pinned=args.pinned)
+    print(row[0], file=out)
+
+
+def cmd_search(db, args, out):
+    for note_id, title, snippet, sumber, created_at in db.search_notes(
+            args.query, limit=args.limit, **_filters(args)):
+        if args.json:
+            print(json.dumps({"id": note_id, "title": title, "snippet": snippet,
+                              "sumber": sumber, "created_at": created_at},
+                             ensure_ascii=False), file=out)
+        else:
+            print(f"{note_id}\t{created_at}\t{title}", file=out)
+
+
+def export_format(parser, args):
+    """The --format of an export, or the one its path asks for."""
+    if args.format is not None:
+        return args.format
+    extension = os.path.splitext(args.path.rstrip("/\\"))[1].lower()
+    if extension not in EXPORT_FORMATS:
+        parser.error(f"format ekspor untuk {extension} tidak dikenal, pilih dengan --format")
+    return EXPORT_FORMATS[extension]
+
+
+def cmd_export(db, args, out):
+    import exporter
+    count = exporter.export_notes(db, args.path, args.format, strip=args.strip)
+    print(f"{count} catatan diekspor ke {args.path}", file=out)
+
+
+def cmd_import(db, args, out):
+    import importer
+    if args.path == "-":
+        notes = (importer.normalize(json.loads(line)) for line in sys.stdin if line.strip())
+    else:
+        notes = importer.read_source(args.path)
+    stats = db.import_notes(notes)
+    print(f"{stats.imported} catatan diimpor, {stats.skipped} dilewati "
+          f"({stats.rate:.0f} catatan/detik)", file=out)
+
+
+def cmd_backup(db, args, out):
+    import backup
+    backup.backup_database(db, args.dest)
+    print(f"Cadangan disimpan di {args.dest}", file=out)
+
+
+def cmd_serve(db, args, out):
+    import server
+    server.serve(db, args.host or server.DEFAULT_HOST, args.port or server.DEFAULT_PORT)
+
+
+COMMANDS = {"add": cmd_add, "search": cmd_search, "export": cmd_export,
+            "import": cmd_import, "backup": cmd_backup, "serve": cmd_serve}
+
+
+def main(argv=None, out=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        args.format = export_format(parser, args)
+    out = out or sys.stdout
+    with DatabaseManager(args.db, args.folder) as db:
+        try:
+            COMMANDS[args.command](db, args, out)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
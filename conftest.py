@@ -0,0 +1,10 @@
+import os
+
+
+def remove_database(*names, folder=".catat-segala"):
+    """Delete test databases together with their WAL and shared-memory files."""
+    for name in names:
+        for suffix in ("", "-wal", "-shm"):
+            path = os.path.join(folder, name + suffix)
+            if os.path.exists(path):
+                os.remove(path)
@@ -1,73 +1,1621 @@
 import sqlite3
+import multiprocessing
 import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import chain, islice
+from contextlib import contextmanager
+import dedup
+import locking
+import revisions
+from attachments import AttachmentStore, extract_data_uris, references
+from text_utils import html_to_text, make_snippet, parse_tags
+
+# bm25() weights for the notes_fts columns (title, body, sumber_catatan):
+# a hit in the title counts for more than a hit somewhere in the body.
+FTS_RANK = "bm25(notes_fts, 10.0, 1.0, 2.0)"
+
+# Keep notes_fts in sync with notes; only changes to indexed columns reindex
+FTS_TRIGGERS = {
+    "notes_fts_ai": """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts (rowid, title, plain_text, sumber_catatan)
+            VALUES (new.id, new.title, new.plain_text, new.sumber_catatan);
+        END
+    """,
+    "notes_fts_ad": """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, title, plain_text, sumber_catatan)
+            VALUES ('delete', old.id, old.title, old.plain_text, old.sumber_catatan);
+        END
+    """,
+    "notes_fts_au": """
+        CREATE TRIGGER IF NOT EXISTS notes_fts_au
+        AFTER UPDATE OF title, plain_text, sumber_catatan ON notes BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, title, plain_text, sumber_catatan)
+            VALUES ('delete', old.id, old.title, old.plain_text, old.sumber_catatan);
+            INSERT INTO notes_fts (rowid, title, plain_text, sumber_catatan)
+            VALUES (new.id, new.title, new.plain_text, new.sumber_catatan);
+        END
+    """,
+}
+# import_notes drops notes_fts_ai while it runs
+_INSERT_TRIGGER_EXISTS = "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'notes_fts_ai'"
+
+# Note counts of tags and notebooks, so facets never need COUNT(*). FK
+# cascades (deleting a note or a tag) fire these like ordinary deletes.
+COUNTER_TRIGGERS = {
+    "note_tags_ai": """
+        CREATE TRIGGER IF NOT EXISTS note_tags_ai AFTER INSERT ON note_tags BEGIN
+            UPDATE tags SET note_count = note_count + 1 WHERE id = new.tag_id;
+        END
+    """,
+    "note_tags_ad": """
+        CREATE TRIGGER IF NOT EXISTS note_tags_ad AFTER DELETE ON note_tags BEGIN
+            UPDATE tags SET note_count = note_count - 1 WHERE id = old.tag_id;
+        END
+    """,
+    "notes_notebook_ai": """
+        CREATE TRIGGER IF NOT EXISTS notes_notebook_ai AFTER INSERT ON notes
+        WHEN new.notebook_id IS NOT NULL BEGIN
+            UPDATE notebooks SET note_count = note_count + 1 WHERE id = new.notebook_id;
+        END
+    """,
+    "notes_notebook_ad": """
+        CREATE TRIGGER IF NOT EXISTS notes_notebook_ad AFTER DELETE ON notes
+        WHEN old.notebook_id IS NOT NULL BEGIN
+            UPDATE notebooks SET note_count = note_count - 1 WHERE id = old.notebook_id;
+        END
+    """,
+    "notes_notebook_au": """
+        CREATE TRIGGER IF NOT EXISTS notes_notebook_au AFTER UPDATE OF notebook_id ON notes
+        WHEN old.notebook_id IS NOT new.notebook_id BEGIN
+            UPDATE notebooks SET note_count = note_count - 1 WHERE id = old.notebook_id;
+            UPDATE notebooks SET note_count = note_count + 1 WHERE id = new.notebook_id;
+        END
+    """,
+}
+
+# Applied to every pooled connection. WAL lets readers run while a write is in
+# progress; synchronous=NORMAL is durable across application crashes in WAL
+# mode and only skips the fsync on every single commit.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -20000",      # ~20 MB page cache per connection
+    "PRAGMA mmap_size = 268435456",    # 256 MB memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = ON",
+)
+STATEMENT_CACHE_SIZE = 256
+# Number of full note bodies kept in memory after view/edit
+NOTE_CACHE_SIZE = 32
+# Shown in the list instead of the snippet of an encrypted note
+LOCKED_SNIPPET = "\U0001F512 Catatan terkunci"
+# Notes encrypted or re-keyed per transaction by the bulk lock jobs
+LOCK_BATCH_SIZE = 200
+# Notes written per transaction by import_notes
+IMPORT_CHUNK_SIZE = 5000
+# Processes parsing note bodies during imports larger than one chunk
+IMPORT_WORKERS = os.cpu_count() or 1
+# SQLite VM instructions between two checks of a query's cancel flag
+CANCEL_CHECK_INTERVAL = 1000
+
+
+class QueryCancelled(Exception):
+    """Raised when a query is abandoned through its cancel event."""
+
+_FTS_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def text_columns(catatan):
+    """Derived (plain_text, snippet, char_count) values stored with a note."""
+    plain_text = html_to_text(catatan)
+    return plain_text, make_snippet(plain_text), len(plain_text)
+
+
+def untitled_title(plain_text):
+    """Title given to a note saved without one: the start of its text."""
+    return make_snippet(plain_text, 60) or "Tanpa Judul"
+
+
+def _import_row(note):
+    """(row for the import INSERT, embedded images, notebook name, tags), or None for empty notes."""
+    catatan = note.get("catatan") or ""
+    if catatan.startswith(locking.TOKEN_PREFIX):
+        # Encrypted for another note id, it could never be opened here
+        return None
+    catatan, blobs = extract_data_uris(catatan)
+    plain_text, snippet, char_count = text_columns(catatan)
+    title = (note.get("title") or "").strip()
+    if not title and not plain_text and not blobs:
+        return None
+    title = title or untitled_title(plain_text)
+    row = (title, catatan, note.get("sumber") or None, note.get("created_at") or None,
+           plain_text, snippet, char_count, int(bool(note.get("pinned"))))
+    notebook = " ".join((note.get("notebook") or "").split()) or None
+    return row, blobs, notebook, parse_tags(note.get("tags"))
+
+
+def _prepare_import(notes, chunk_size, workers):
+    """Yield the _import_row() results of `notes`, one list per chunk.
+
+    When the first chunk is full and there is more than one worker, the
+    bodies are parsed in a pool of spawned processes (they share no threads
+    or connections with this one) and the next chunk is parsed while the
+    caller writes the current one.
+    """
+    notes = iter(notes)
+    chunks = iter(lambda: list(islice(notes, chunk_size)), [])
+    first = next(chunks, None)
+    if first is None:
+        return
+    chunks = chain([first], chunks)
+    if workers <= 1 or len(first) < chunk_size:
+        for chunk in chunks:
+            yield [_import_row(note) for note in chunk]
+        return
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.map(_import_row, chunk, chunksize=max(1, len(chunk) // (workers * 4))))
+            if len(pending) > 1:
+                yield list(pending.popleft())
+        while pending:
+            yield list(pending.popleft())
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def _vault_aad(key_id):
+    return f"vault-key:{key_id}".encode("ascii")
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def build_fts_query(query):
+    """Translate free text typed by the user into an FTS5 MATCH expression.
+
+    Text wrapped in double quotes is kept as an exact phrase, every other word
+    becomes a prefix query so results show up while the word is still being
+    typed. Everything is quoted, so FTS5 operators in the input are harmless.
+    Returns None when the input contains nothing searchable.
+    """
+    terms = []
+    for phrase, word in _FTS_TOKEN.findall(query or ""):
+        if phrase.strip():
+            terms.append('"%s"' % phrase.strip())
+        elif word:
+            word = word.replace('"', "").rstrip("*")
+            if word:
+                terms.append('"%s"*' % word)
+    return " ".join(terms) or None
+
+# Columns of a list row: what the table shows, never the HTML body
+LIST_COLUMNS = "id, title, snippet, sumber_catatan, created_at"
+
+
+class NoteChange(namedtuple("NoteChange", "kind note_id row")):
+    """A committed write, published to DatabaseManager subscribers.
+
+    `kind` is "added", "updated" or "deleted" with the list row of the note
+    (as returned by get_notes_page), or "reset" after bulk writes such as
+    imports and restores, where both other fields are None.
+    """
+
+
+def note_filters(since=None, until=None, sumber=None, pinned=None, tags=None,
+                 notebook=None, locked=None, alias="notes"):
+    """SQL terms and parameters for the list filters.
+
+    `since` (inclusive) and `until` (exclusive) bound created_at and take
+    dates or "YYYY-MM-DD[ HH:MM:SS]" strings; `sumber` is an exact source,
+    "" for notes without one; `pinned=True` keeps pinned notes only. Each
+    of these is served by an index that is already in list order.
+    `tags` keeps notes carrying every one of the given tag names: their
+    posting lists in note_tags are intersected once, then probed per row.
+    `notebook` is a notebook id; `locked=False` leaves locked notes out.
+    """
+    terms, params = [], []
+    if since is not None:
+        terms.append(f"{alias}.created_at >= ?")
+        params.append(str(since))
+    if until is not None:
+        terms.append(f"{alias}.created_at < ?")
+        params.append(str(until))
+    if sumber == "":
+        terms.append(f"{alias}.sumber_catatan IS NULL")
+    elif sumber is not None:
+        terms.append(f"{alias}.sumber_catatan = ?")
+        params.append(sumber)
+    if pinned:
+        terms.append(f"{alias}.pinned = 1")
+    names = parse_tags(tags)
+    if names:
+        terms.append(f"""{alias}.id IN (
+            SELECT nt.note_id FROM note_tags nt
+            WHERE nt.tag_id IN (SELECT id FROM tags WHERE name IN ({','.join('?' * len(names))}))
+            GROUP BY nt.note_id HAVING COUNT(*) = ?)""")
+        params += names + [len(names)]
+    if notebook is not None:
+        terms.append(f"{alias}.notebook_id = ?")
+        params.append(notebook)
+    if locked is not None:
+        terms.append(f"{alias}.locked = ?")
+        params.append(int(bool(locked)))
+    return terms, params
+
+
+def _where(terms):
+    return ("WHERE " + " AND ".join(terms)) if terms else ""
+
+
+class ImportStats(namedtuple("ImportStats", "imported skipped seconds")):
+    @property
+    def rate(self):
+        """Imported notes per second."""
+        return self.imported / self.seconds if self.seconds else float(self.imported)
+
+
+class LRUCache:
+    """Small thread-safe least-recently-used mapping."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
 
 class DatabaseManager:
-    def __init__(self, db_name="notes.db"):
-        folder_name = ".catat-segala"
+    """Access to the notes database.
+
+    One long-lived writer connection (serialized by a lock) and a small pool of
+    read-only connections are shared by all methods, so a call costs a cursor
+    execute instead of opening the file again. Connections are created with
+    check_same_thread=False; the pool makes sure each one is only used by one
+    thread at a time. With init=False the schema is left to a later call of
+    init_db(), e.g. on a background thread.
+    """
+
+    def __init__(self, db_name="notes.db", folder=".catat-segala", max_readers=4,
+                 note_cache_size=NOTE_CACHE_SIZE, external_attachments=False, init=True):
+        folder_name = folder
         # Create the folder if it doesn't exist
         if not os.path.exists(folder_name):
             os.makedirs(folder_name)
         # Construct the full path to the database file
         database_path = os.path.join(folder_name, db_name)
         self.db_name = database_path
+        self.max_readers = max_readers
+        self._write_lock = threading.RLock()
+        self._writer_conn = None
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._pool_lock = threading.Lock()
+        self.note_cache = LRUCache(note_cache_size)
+        self._listeners = []
+        # Keys of locked notes, forgotten after a timeout
+        self.keys = locking.KeyCache()
+        # Images are stored in the database unless external files are asked for
+        self.attachments = AttachmentStore(os.path.join(folder_name, "attachments"),
+                                           external=external_attachments)
+        if init:
+            self.init_db()
+
+    def _connect(self, read_only=False):
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=10,
+            isolation_level=None,  # transactions are opened explicitly in writer()
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _writer_connection(self):
+        # Caller holds _write_lock
+        if self._writer_conn is None:
+            self._writer_conn = self._connect()
+            self._writer_conn.execute("PRAGMA journal_mode = WAL")
+            # Deleted content is zeroed, so locked notes leave no readable
+            # text behind in free pages
+            self._writer_conn.execute("PRAGMA secure_delete = ON")
+        return self._writer_conn
+
+    @contextmanager
+    def writer(self):
+        """Yield the writer connection inside a transaction.
+
+        Nested use from the same thread joins the outer transaction.
+        """
+        with self._write_lock:
+            conn = self._writer_connection()
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection from the pool."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                create = self._reader_count < self.max_readers
+                if create:
+                    self._reader_count += 1
+            if create:
+                try:
+                    conn = self._connect(read_only=True)
+                except BaseException:
+                    with self._pool_lock:
+                        self._reader_count -= 1
+                    raise
+            else:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    @contextmanager
+    def cancellable(self, conn, cancel):
+        """Abort statements on `conn` with QueryCancelled once `cancel` is set.
+
+        `cancel` is a threading.Event (or None for a plain query); it is polled
+        from SQLite's progress handler, so even a long scan stops promptly.
+        """
+        if cancel is None:
+            yield conn
+            return
+        conn.set_progress_handler(lambda: 1 if cancel.is_set() else 0, CANCEL_CHECK_INTERVAL)
+        try:
+            yield conn
+        except sqlite3.OperationalError as e:
+            if cancel.is_set() and "interrupted" in str(e):
+                raise QueryCancelled() from e
+            raise
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def backup_to(self, target, pages=-1, progress=None):
+        """Copy a consistent snapshot of the database into connection `target`.
+
+        Uses the SQLite online backup API, so it includes committed WAL
+        content and never sees a half-written transaction.
+        """
+        source = self._connect(read_only=True)
+        try:
+            source.backup(target, pages=pages, progress=progress)
+        finally:
+            source.close()
+
+    def restore_from(self, source, pages=-1, progress=None):
+        """Replace the whole database with the content of connection `source`.
+
+        Writes are blocked while the pages are copied; afterwards the schema
+        is brought up to date in case the backup came from an older version.
+        """
+        with self._write_lock:
+            conn = self._writer_connection()
+            source.backup(conn, pages=pages, progress=progress)
+            conn.execute("PRAGMA journal_mode = WAL")
+            self.invalidate_notes()
+            # Keys cached for the old vault would not open the restored notes
+            self.keys.clear()
         self.init_db()
+        self._publish("reset")
 
-    def get_connection(self):
-        return sqlite3.connect(self.db_name)
+    def close(self):
+        """Close every pooled connection. The manager reconnects on next use."""
+        with self._write_lock:
+            if self._writer_conn is not None:
+                self._writer_conn.close()
+                self._writer_conn = None
+        with self._pool_lock:
+            while True:
+                try:
+                    self._readers.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._reader_count -= 1
 
-    def init_db(self):
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            # Create table only if it doesn't exist (preserves existing data)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS notes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    title TEXT NOT NULL,
-                    catatan TEXT NOT NULL,
-                    sumber_catatan TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            conn.commit()
+    def subscribe(self, callback):
+        """Call `callback(NoteChange)` after every committed write.
+
+        Callbacks run on the thread that wrote, background tasks included.
+        """
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _publish(self, kind, row=None):
+        change = NoteChange(kind, row[0] if row else None, row)
+        for callback in list(self._listeners):
+            callback(change)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
-    def add_note(self, title, catatan, sumber_catatan=None):
-        with self.get_connection() as conn:
+    def schema_version(self):
+        with self.reader() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def init_db(self, progress=None, cancel=None):
+        """Bring the schema up to date with the pending MIGRATIONS.
+
+        PRAGMA user_version holds the number of migrations applied. Pending
+        ones run in order inside one transaction that also stores the new
+        version, so an upgrade is applied completely or not at all. Opening
+        an up-to-date database costs a PRAGMA read and a trigger lookup;
+        databases written by a newer version of the app are left as they are.
+        """
+        if self.schema_version() >= len(self.MIGRATIONS):
+            self._repair_fts()
+            return
+        with self.writer() as conn:
             cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO notes (title, catatan, sumber_catatan) VALUES (?, ?, ?)",
-                (title, catatan, sumber_catatan)
+            # Another process may have upgraded while we waited for the lock
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            for migration in self.MIGRATIONS[version:]:
+                migration(self, cursor)
+            cursor.execute(f"PRAGMA user_version = {max(version, len(self.MIGRATIONS))}")
+
+    def _repair_fts(self):
+        """Recreate the search insert trigger of an import that was killed."""
+        with self.reader() as conn:
+            if conn.execute(_INSERT_TRIGGER_EXISTS).fetchone() is not None:
+                return
+        with self.writer() as conn:
+            if conn.execute(_INSERT_TRIGGER_EXISTS).fetchone() is None:
+                conn.execute(FTS_TRIGGERS["notes_fts_ai"])
+                conn.execute("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')")
+
+    # Migrations, each takes the cursor of the upgrade transaction
+
+    def _migrate_base(self, cursor):
+        """Version 1: the layout built before migrations were versioned.
+
+        Databases from those versions are at user_version 0 in any of their
+        intermediate layouts, so every step here checks what already exists.
+        """
+        # Create table only if it doesn't exist (preserves existing data)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS notes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                catatan TEXT NOT NULL,
+                sumber_catatan TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                plain_text TEXT NOT NULL DEFAULT '',
+                snippet TEXT NOT NULL DEFAULT '',
+                char_count INTEGER NOT NULL DEFAULT 0,
+                locked INTEGER NOT NULL DEFAULT 0,
+                key_id INTEGER
+            )
+        """)
+        self._add_text_columns(cursor)
+        self._init_vault(cursor)
+        self._init_fts(cursor)
+        if self.attachments.create_tables(cursor):
+            self._move_embedded_images(cursor)
+        # Keyset pagination in get_notes_page walks this index
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_created ON notes (created_at, id)")
+
+    def _add_text_columns(self, cursor):
+        """Add and backfill the derived text columns on older databases."""
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(notes)")}
+        if "plain_text" in columns:
+            return
+        cursor.execute("ALTER TABLE notes ADD COLUMN plain_text TEXT NOT NULL DEFAULT ''")
+        cursor.execute("ALTER TABLE notes ADD COLUMN snippet TEXT NOT NULL DEFAULT ''")
+        cursor.execute("ALTER TABLE notes ADD COLUMN char_count INTEGER NOT NULL DEFAULT 0")
+        # Drop the old search triggers first, they would fire on every backfilled row
+        for trigger in FTS_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        last_id = 0
+        while True:
+            rows = cursor.execute(
+                "SELECT id, catatan FROM notes WHERE id > ? ORDER BY id LIMIT 500", (last_id,)
+            ).fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                "UPDATE notes SET plain_text = ?, snippet = ?, char_count = ? WHERE id = ?",
+                [text_columns(catatan) + (note_id,) for note_id, catatan in rows],
+            )
+            last_id = rows[-1][0]
+
+    def _init_vault(self, cursor):
+        """Columns and tables for locked (encrypted) notes."""
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(notes)")}
+        if "locked" not in columns:
+            cursor.execute("ALTER TABLE notes ADD COLUMN locked INTEGER NOT NULL DEFAULT 0")
+            cursor.execute("ALTER TABLE notes ADD COLUMN key_id INTEGER")
+        # One row per password; the newest is active. After a password change
+        # the previous key is kept wrapped (encrypted) by the new one until
+        # every note has been re-encrypted.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS vault_keys (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                salt BLOB NOT NULL,
+                n INTEGER NOT NULL,
+                r INTEGER NOT NULL,
+                p INTEGER NOT NULL,
+                verifier BLOB NOT NULL,
+                wrapped_key BLOB,
+                wrapped_by INTEGER,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
             )
-            conn.commit()
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_locked ON notes (key_id) WHERE locked = 1")
+
+    def _move_embedded_images(self, cursor):
+        """Move data: URI images of existing notes into the attachments table."""
+        last_id = 0
+        while True:
+            rows = cursor.execute("""
+                SELECT id, catatan FROM notes
+                WHERE id > ? AND catatan LIKE '%data:image/%'
+                ORDER BY id LIMIT 100
+            """, (last_id,)).fetchall()
+            if not rows:
+                break
+            for note_id, catatan in rows:
+                catatan, blobs = extract_data_uris(catatan)
+                if blobs:
+                    self.attachments.store(cursor, blobs)
+                    cursor.execute("UPDATE notes SET catatan = ? WHERE id = ?", (catatan, note_id))
+                    self.attachments.link(cursor, note_id, catatan)
+            last_id = rows[-1][0]
+
+    def _init_fts(self, cursor):
+        """Full-text index over notes.plain_text, kept in sync by triggers.
+
+        The index is an external-content table: it only stores the inverted
+        index and reads title/plain_text/sumber_catatan back from notes for
+        snippet() and highlight().
+        """
+        row = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'"
+        ).fetchone()
+        if row and "content_rowid" not in row[0]:
+            # Index from before the plain_text column, stored its own copy
+            for trigger in FTS_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute("DROP TABLE notes_fts")
+            row = None
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+                title, plain_text, sumber_catatan,
+                content = 'notes', content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        """)
+        for trigger in FTS_TRIGGERS.values():
+            cursor.execute(trigger)
+        if row is None:
+            # Newly created index, fill it from the existing notes
+            cursor.execute("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')")
+
+    def _migrate_note_metadata(self, cursor):
+        """Version 2: updated_at, pinned and tags, indexes for the list filters."""
+        # ADD COLUMN cannot default to CURRENT_TIMESTAMP, writers set it
+        cursor.execute("ALTER TABLE notes ADD COLUMN updated_at DATETIME")
+        cursor.execute("ALTER TABLE notes ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("ALTER TABLE notes ADD COLUMN tags TEXT NOT NULL DEFAULT ''")
+        cursor.execute("UPDATE notes SET updated_at = created_at")
+        # Filtering by source walks this index in list order, no sort needed
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_notes_source
+            ON notes (sumber_catatan, created_at, id)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_notes_pinned
+            ON notes (created_at, id) WHERE pinned = 1
+        """)
+
+    def _migrate_tags_and_notebooks(self, cursor):
+        """Version 3: tags and notebooks in their own tables with note counters.
+
+        The comma separated notes.tags column of version 2 is moved into
+        note_tags and dropped.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS notebooks (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+                note_count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tags (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+                note_count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Clustered by tag: the notes of a tag are one contiguous range
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS note_tags (
+                tag_id INTEGER NOT NULL REFERENCES tags (id) ON DELETE CASCADE,
+                note_id INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+                PRIMARY KEY (tag_id, note_id)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_note_tags_note ON note_tags (note_id, tag_id)")
+        cursor.execute("""
+            ALTER TABLE notes ADD COLUMN notebook_id INTEGER
+            REFERENCES notebooks (id) ON DELETE SET NULL
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_notes_notebook
+            ON notes (notebook_id, created_at, id)
+        """)
+        for trigger in COUNTER_TRIGGERS.values():
+            cursor.execute(trigger)
+        rows = cursor.execute("SELECT id, tags FROM notes WHERE tags != ''").fetchall()
+        for note_id, tags in rows:
+            self._set_tags(cursor, note_id, tags)
+        cursor.execute("ALTER TABLE notes DROP COLUMN tags")
+
+    def _migrate_drafts(self, cursor):
+        """Version 4: autosaved editor content, one row per open editor."""
+        # No foreign key to notes: a draft outlives a note deleted meanwhile
+        # and is then restored as a new note
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS drafts (
+                key TEXT PRIMARY KEY,
+                note_id INTEGER,
+                title TEXT NOT NULL DEFAULT '',
+                catatan TEXT NOT NULL DEFAULT '',
+                sumber TEXT NOT NULL DEFAULT '',
+                tags TEXT NOT NULL DEFAULT '',
+                pinned INTEGER NOT NULL DEFAULT 0,
+                notebook_id INTEGER,
+                saved_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    def _migrate_revisions(self, cursor):
+        """Version 5: history of note edits, see revisions.py."""
+        revisions.create_tables(cursor)
+
+    def _migrate_duplicates(self, cursor):
+        """Version 6: MinHash signatures and LSH buckets, see dedup.py.
+
+        Existing notes are indexed afterwards by index_duplicates(), in the
+        background instead of during the upgrade.
+        """
+        dedup.create_tables(cursor)
+
+    # Applied in order; a database at user_version N still needs MIGRATIONS[N:]
+    MIGRATIONS = (
+        _migrate_base,
+        _migrate_note_metadata,
+        _migrate_tags_and_notebooks,
+        _migrate_drafts,
+        _migrate_revisions,
+        _migrate_duplicates,
+    )
+
+    # Tags and notebooks
+
+    def _set_tags(self, cursor, note_id, tags):
+        """Make the tags of a note exactly `tags` (a list or "a, b" string)."""
+        names = parse_tags(tags)
+        cursor.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(name,) for name in names])
+        wanted = {row[0] for row in cursor.execute(
+            f"SELECT id FROM tags WHERE name IN ({','.join('?' * len(names))})", names)} if names else set()
+        current = {row[0] for row in cursor.execute(
+            "SELECT tag_id FROM note_tags WHERE note_id = ?", (note_id,))}
+        cursor.executemany("INSERT INTO note_tags (tag_id, note_id) VALUES (?, ?)",
+                           [(tag_id, note_id) for tag_id in wanted - current])
+        cursor.executemany("DELETE FROM note_tags WHERE tag_id = ? AND note_id = ?",
+                           [(tag_id, note_id) for tag_id in current - wanted])
+
+    def tag_notes(self, note_ids, tags, batch_size=IMPORT_CHUNK_SIZE):
+        """Add `tags` to many notes at once, keeping the tags they have."""
+        names = parse_tags(tags)
+        note_ids = list(note_ids)
+        if not names or not note_ids:
+            return
+        with self.writer() as conn:
+            conn.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(name,) for name in names])
+            tag_ids = [row[0] for row in conn.execute(
+                f"SELECT id FROM tags WHERE name IN ({','.join('?' * len(names))})", names)]
+            for start in range(0, len(note_ids), batch_size):
+                batch = note_ids[start:start + batch_size]
+                conn.executemany(
+                    "INSERT OR IGNORE INTO note_tags (tag_id, note_id) SELECT ?, id FROM notes WHERE id = ?",
+                    [(tag_id, note_id) for tag_id in tag_ids for note_id in batch])
+        self._publish("reset")
+
+    def list_tags(self):
+        """(id, name, note_count) of every tag in use, by name; counts come from triggers."""
+        with self.reader() as conn:
+            return conn.execute(
+                "SELECT id, name, note_count FROM tags WHERE note_count > 0 ORDER BY name"
+            ).fetchall()
+
+    def list_notebooks(self):
+        """(id, name, note_count) of every notebook, by name."""
+        with self.reader() as conn:
+            return conn.execute("SELECT id, name, note_count FROM notebooks ORDER BY name").fetchall()
+
+    def add_notebook(self, name):
+        """Create a notebook (or find the one with that name) and return its id."""
+        name = " ".join(name.split())
+        if not name:
+            raise ValueError("Nama notebook tidak boleh kosong")
+        with self.writer() as conn:
+            conn.execute("INSERT OR IGNORE INTO notebooks (name) VALUES (?)", (name,))
+            return conn.execute("SELECT id FROM notebooks WHERE name = ?", (name,)).fetchone()[0]
+
+    def delete_notebook(self, notebook_id):
+        """Delete a notebook; its notes stay, without notebook."""
+        with self.writer() as conn:
+            conn.execute("DELETE FROM notebooks WHERE id = ?", (notebook_id,))
+        self._publish("reset")
+
+    # Drafts
+
+    def save_drafts(self, drafts):
+        """Store editor snapshots, (key, note_id, data) with data as from NoteDialog.get_data()."""
+        with self.writer() as conn:
+            conn.executemany("""
+                INSERT INTO drafts (key, note_id, title, catatan, sumber, tags, pinned, notebook_id,
+                                    saved_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (key) DO UPDATE SET
+                    note_id = excluded.note_id, title = excluded.title, catatan = excluded.catatan,
+                    sumber = excluded.sumber, tags = excluded.tags, pinned = excluded.pinned,
+                    notebook_id = excluded.notebook_id, saved_at = excluded.saved_at
+            """, [
+                (key, note_id, data["title"], data["catatan"], data["sumber"], data["tags"],
+                 int(bool(data["pinned"])), data["notebook_id"] or None)
+                for key, note_id, data in drafts
+            ])
+
+    def list_drafts(self):
+        """(key, note_id, data, saved_at) of every stored draft, newest first."""
+        with self.reader() as conn:
+            rows = conn.execute("""
+                SELECT key, note_id, title, catatan, sumber, tags, pinned, notebook_id, saved_at
+                FROM drafts ORDER BY saved_at DESC
+            """).fetchall()
+        return [
+            (key, note_id, {"title": title, "catatan": catatan, "sumber": sumber, "tags": tags,
+                            "pinned": bool(pinned), "notebook_id": notebook_id or 0}, saved_at)
+            for key, note_id, title, catatan, sumber, tags, pinned, notebook_id, saved_at in rows
+        ]
+
+    def delete_drafts(self, keys):
+        with self.writer() as conn:
+            conn.executemany("DELETE FROM drafts WHERE key = ?", [(key,) for key in keys])
+
+    def add_note(self, title, catatan, sumber_catatan=None, tags=None, pinned=False,
+                 notebook_id=None):
+        """Insert a note and return its list row (id, title, snippet, sumber, created_at)."""
+        with self.writer() as conn:
+            row = self._insert_note(conn.cursor(), title, catatan, sumber_catatan, tags,
+                                    pinned, notebook_id)
+        self._publish("added", row)
+        return row
+
+    def add_notes(self, notes):
+        """Insert several notes in one transaction and return their list rows.
+
+        `notes` are dicts with "title", "catatan" and optionally "sumber",
+        "tags", "pinned" and "notebook_id". Used to coalesce many small
+        writes (e.g. concurrent API requests) into a single commit.
+        """
+        with self.writer() as conn:
+            cursor = conn.cursor()
+            rows = [
+                self._insert_note(cursor, note.get("title") or "", note.get("catatan") or "",
+                                  note.get("sumber") or None, note.get("tags"),
+                                  note.get("pinned", False), note.get("notebook_id"))
+                for note in notes
+            ]
+        for row in rows:
+            self._publish("added", row)
+        return rows
+
+    def _insert_note(self, cursor, title, catatan, sumber_catatan, tags, pinned, notebook_id):
+        catatan, blobs = extract_data_uris(catatan)
+        columns = text_columns(catatan)
+        if not (title or "").strip():
+            title = untitled_title(columns[0])
+        self.attachments.store(cursor, blobs)
+        row = cursor.execute(
+            f"""INSERT INTO notes (title, catatan, sumber_catatan, plain_text, snippet, char_count,
+                                   pinned, notebook_id, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                RETURNING {LIST_COLUMNS}""",
+            (title, catatan, sumber_catatan) + columns + (int(bool(pinned)), notebook_id or None)
+        ).fetchone()
+        dedup.index(cursor, row[0], columns[0])
+        if tags:
+            self._set_tags(cursor, row[0], tags)
+        if blobs or references(catatan):
+            self.attachments.link(cursor, row[0], catatan)
+        return row
+
+    def import_notes(self, notes, chunk_size=IMPORT_CHUNK_SIZE, progress=None, cancel=None,
+                     workers=IMPORT_WORKERS):
+        """Insert many notes quickly and return ImportStats.
+
+        `notes` is any iterable of dicts with "title", "catatan" and optionally
+        "sumber", "created_at", "tags", "pinned" and "notebook" (a name, the
+        notebook is created when missing); it is consumed lazily, one chunk
+        at a time.
+        Bodies are parsed outside the write lock, by `workers` processes for
+        large imports (see _prepare_import). Each chunk is one transaction
+        inserted with executemany(). The search index trigger is dropped once
+        for the whole import and each chunk indexes the rows added since the
+        previous one in a single INSERT ... SELECT, in the same transaction;
+        the trigger is recreated when the import ends, however it ends.
+        Notes without title and body are skipped, and so are encrypted
+        bodies found in exports of locked notes. Setting `cancel` stops after
+        the current chunk with QueryCancelled; chunks already written stay.
+        Imported notes join the duplicate index through index_duplicates().
+        """
+        started = time.perf_counter()
+        imported = skipped = 0
+        # Other writers of this process wait for the import; rows written by
+        # other processes meanwhile are indexed with the next chunk
+        with self._write_lock:
+            with self.writer() as conn:
+                indexed = conn.execute("SELECT COALESCE(MAX(id), 0) FROM notes").fetchone()[0]
+                conn.execute("DROP TRIGGER IF EXISTS notes_fts_ai")
+            try:
+                for prepared in _prepare_import(notes, chunk_size, workers):
+                    if cancel is not None and cancel.is_set():
+                        raise QueryCancelled()
+                    rows, blobs, notebooks, tags = [], [], [], []
+                    for row in prepared:
+                        if row is None:
+                            skipped += 1
+                        else:
+                            rows.append(row[0])
+                            blobs.extend(row[1])
+                            notebooks.append(row[2])
+                            tags.append(row[3])
+                    if rows:
+                        with self.writer() as conn:
+                            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM notes").fetchone()[0]
+                            notebook_ids = self._name_ids(conn, "notebooks", notebooks)
+                            conn.executemany("""
+                                INSERT INTO notes (title, catatan, sumber_catatan, created_at,
+                                                   plain_text, snippet, char_count, pinned,
+                                                   notebook_id, updated_at)
+                                VALUES (?1, ?2, ?3, COALESCE(?4, CURRENT_TIMESTAMP), ?5, ?6, ?7, ?8,
+                                        ?9, COALESCE(?4, CURRENT_TIMESTAMP))
+                            """, [row + (notebook_ids.get(name and name.lower()),)
+                                  for row, name in zip(rows, notebooks)])
+                            indexed = self._index_imported(conn, indexed)
+                            if blobs or any(tags):
+                                new_ids = [note_id for (note_id,) in conn.execute(
+                                    "SELECT id FROM notes WHERE id > ? ORDER BY id", (last_id,))]
+                            if blobs:
+                                self.attachments.store(conn, blobs)
+                                for note_id, row in zip(new_ids, rows):
+                                    if references(row[1]):
+                                        self.attachments.link(conn, note_id, row[1])
+                            if any(tags):
+                                tag_ids = self._name_ids(conn, "tags", [tag for names in tags for tag in names])
+                                conn.executemany(
+                                    "INSERT OR IGNORE INTO note_tags (tag_id, note_id) VALUES (?, ?)",
+                                    [(tag_ids[tag.lower()], note_id)
+                                     for note_id, names in zip(new_ids, tags) for tag in names])
+                        imported += len(rows)
+                    if progress is not None:
+                        progress(imported + skipped, 0)
+            finally:
+                with self.writer() as conn:
+                    self._index_imported(conn, indexed)
+                    conn.execute(FTS_TRIGGERS["notes_fts_ai"])
+                if imported:
+                    # Chunks committed before a cancel or an error are shown as well
+                    self._publish("reset")
+        return ImportStats(imported, skipped, time.perf_counter() - started)
+
+    def _name_ids(self, conn, table, names):
+        """Ids of the tags or notebooks called `names`, created when missing.
+
+        Keyed by the lowercased name. Both tables are small, reading them
+        whole avoids a bound parameter per name.
+        """
+        names = {name for name in names if name}
+        if not names:
+            return {}
+        conn.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(name,) for name in names])
+        ids = {}
+        for row_id, name in conn.execute(f"SELECT id, name FROM {table}"):
+            ids.setdefault(name.lower(), row_id)
+        return ids
+
+    def _index_imported(self, conn, after):
+        """Index the notes above id `after` while the insert trigger is gone.
+
+        Returns the highest note id, the `after` of the next call. Does
+        nothing but that when the trigger was recreated meanwhile by
+        _repair_fts() in another process, whose rebuild indexed every row.
+        """
+        if conn.execute(_INSERT_TRIGGER_EXISTS).fetchone() is None:
+            conn.execute("""
+                INSERT INTO notes_fts (rowid, title, plain_text, sumber_catatan)
+                SELECT id, title, plain_text, sumber_catatan FROM notes WHERE id > ?
+            """, (after,))
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM notes").fetchone()[0]
 
     def get_all_notes(self):
-        with self.get_connection() as conn:
+        with self.reader() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT id, title, catatan, sumber_catatan, created_at FROM notes ORDER BY created_at DESC")
+            cursor.execute("SELECT id, title, catatan, sumber_catatan, created_at FROM notes ORDER BY created_at DESC, id DESC")
             return cursor.fetchall()
 
-    def update_note(self, note_id, title, catatan, sumber_catatan=None):
-        with self.get_connection() as conn:
+    def get_note(self, note_id):
+        """Return one full note (id, title, catatan, sumber, created_at) or None.
+
+        Recently opened notes are served from an LRU cache; the list queries
+        never load bodies, so this is the only place they enter memory.
+        Locked notes are decrypted here, one at a time, and raise
+        locking.NoteLocked when their key is not cached; their plain text is
+        never put in the cache.
+        """
+        note = self.note_cache.get(note_id)
+        if note is not None:
+            return note
+        with self.reader() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "UPDATE notes SET title = ?, catatan = ?, sumber_catatan = ? WHERE id = ?",
-                (title, catatan, sumber_catatan, note_id)
+                """SELECT id, title, catatan, sumber_catatan, created_at, locked, key_id
+                   FROM notes WHERE id = ?""",
+                (note_id,)
             )
-            conn.commit()
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        note = row[:5]
+        if row[5]:
+            key = self.keys.get(row[6])
+            if key is None:
+                raise locking.NoteLocked(note_id)
+            body = locking.decrypt_text(key, row[2], locking.note_aad(note_id))
+            return note[:2] + (body,) + note[3:]
+        self.note_cache.put(note_id, note)
+        return note
 
-    def delete_note(self, note_id):
-        with self.get_connection() as conn:
+    def invalidate_notes(self, note_id=None):
+        """Forget cached bodies, of one note or all of them after bulk writes."""
+        if note_id is None:
+            self.note_cache.clear()
+        else:
+            self.note_cache.pop(note_id)
+
+    def get_notes_page(self, after=None, limit=200, **filters):
+        """Return up to `limit` notes, newest first, starting after `after`.
+
+        Rows carry the stored snippet instead of the HTML body:
+        (id, title, snippet, sumber, created_at).
+
+        `after` is the (created_at, id) of the last row of the previous page, so
+        each page is an index seek instead of an OFFSET scan. `filters` are
+        those of note_filters().
+        """
+        terms, params = note_filters(**filters)
+        if after is not None:
+            terms.append("(created_at, id) < (?, ?)")
+            params += [after[0], after[1]]
+        with self.reader() as conn:
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM notes WHERE id = ?", (note_id,))
-            conn.commit()
+            cursor.execute(f"""
+                SELECT {LIST_COLUMNS} FROM notes
+                {_where(terms)}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """, params + [limit])
+            return cursor.fetchall()
 
-    def search_notes(self, query):
-        with self.get_connection() as conn:
+    def count_notes(self, **filters):
+        terms, params = note_filters(**filters)
+        with self.reader() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM notes {_where(terms)}", params).fetchone()[0]
+
+    def list_sources(self):
+        """(sumber, number of notes) for every source, most used first."""
+        with self.reader() as conn:
+            return conn.execute("""
+                SELECT sumber_catatan, COUNT(*) FROM notes
+                WHERE sumber_catatan IS NOT NULL
+                GROUP BY sumber_catatan
+                ORDER BY COUNT(*) DESC, sumber_catatan
+            """).fetchall()
+
+    def iter_notes(self, batch_size=500, cancel=None, resolve_attachments=False):
+        """Yield every full note in batches, oldest first.
+
+        Rows are streamed from one cursor with fetchmany(), so memory use
+        depends on `batch_size` and not on the size of the database. The read
+        transaction keeps a consistent snapshot while writes go on in WAL mode.
+        With `resolve_attachments` images are inlined as data: URIs, read on
+        the same connection: borrowing a second one could wait forever on a
+        pool the generator itself keeps busy. Locked notes are left out, their
+        ciphertext is bound to the note id and useless anywhere else.
+        Rows are (id, title, catatan, sumber, created_at, tags, pinned,
+        notebook) with tags as "a, b" and the notebook by name.
+        """
+        with self.reader() as conn, self.cancellable(conn, cancel):
             cursor = conn.cursor()
-            search_pattern = f"%{query}%"
             cursor.execute("""
-                SELECT id, title, catatan, sumber_catatan, created_at 
-                FROM notes 
-                WHERE title LIKE ? OR catatan LIKE ? OR sumber_catatan LIKE ?
-                ORDER BY created_at DESC
-            """, (search_pattern,) * 3)
+                SELECT notes.id, notes.title, notes.catatan, notes.sumber_catatan, notes.created_at,
+                       (SELECT group_concat(name, ', ') FROM (
+                            SELECT tags.name FROM note_tags JOIN tags ON tags.id = note_tags.tag_id
+                            WHERE note_tags.note_id = notes.id ORDER BY tags.name)),
+                       notes.pinned, notebooks.name
+                FROM notes LEFT JOIN notebooks ON notebooks.id = notes.notebook_id
+                WHERE notes.locked = 0 ORDER BY notes.id
+            """)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                if resolve_attachments:
+                    rows = [row[:2] + (self.attachments.resolve(conn, row[2]),) + row[3:] for row in rows]
+                yield rows
+
+    def update_note(self, note_id, title, catatan, sumber_catatan=None, tags=None, pinned=None,
+                    notebook_id=None):
+        """Save a note and return its new list row, or None if it is gone.
+
+        `tags`, `pinned` and `notebook_id` stay as they are when left at None;
+        notebook_id=0 takes the note out of its notebook.
+        """
+        pinned = None if pinned is None else int(bool(pinned))
+        prepared = None
+        if not self.is_locked(note_id):
+            # Parsing and hashing the text are the costly parts, done before
+            # taking the write lock; the note may still get locked meanwhile,
+            # so the transaction looks at `locked` again
+            prepared = self._prepare_body(catatan)
+        unused_files = []
+        with self.writer() as conn:
+            cursor = conn.cursor()
+            old = cursor.execute(
+                "SELECT title, catatan, sumber_catatan, updated_at, locked FROM notes WHERE id = ?",
+                (note_id,)
+            ).fetchone()
+            if old is None:
+                row = None
+            elif old[4]:
+                # Stays encrypted, images included, with the current key
+                key_id, key = self.active_key()
+                token = locking.encrypt_text(key, catatan, locking.note_aad(note_id))
+                row = cursor.execute(
+                    f"""UPDATE notes SET title = ?, catatan = ?, sumber_catatan = ?, key_id = ?,
+                            pinned = COALESCE(?, pinned), updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                        RETURNING {LIST_COLUMNS}""",
+                    (title, token, sumber_catatan, key_id, pinned, note_id)
+                ).fetchone()
+            else:
+                stored, blobs, columns, signature = prepared or self._prepare_body(catatan)
+                self.attachments.store(cursor, blobs)
+                row = cursor.execute(
+                    f"""UPDATE notes SET title = ?, catatan = ?, sumber_catatan = ?,
+                            plain_text = ?, snippet = ?, char_count = ?,
+                            pinned = COALESCE(?, pinned), updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                        RETURNING {LIST_COLUMNS}""",
+                    (title, stored, sumber_catatan) + columns + (pinned, note_id)
+                ).fetchone()
+                if old[:3] != (title, stored, sumber_catatan):
+                    revisions.record(cursor, note_id, old[:4], stored)
+                if old[1] != stored:
+                    dedup.index(cursor, note_id, columns[0], signature)
+                # Images of older versions stay until their revisions are pruned
+                unused_files = self.attachments.link(
+                    cursor, note_id, stored, extra=revisions.attachment_references(cursor, note_id))
+            if row is not None:
+                self._organize(cursor, note_id, tags, notebook_id)
+        self.invalidate_notes(note_id)
+        _remove_files(unused_files)
+        if row is not None:
+            self._publish("updated", row)
+        return row
+
+    def _prepare_body(self, catatan):
+        """(stored HTML, images, text columns, MinHash signature) of an unlocked note body."""
+        stored, blobs = extract_data_uris(catatan)
+        columns = text_columns(stored)
+        return stored, blobs, columns, dedup.signature(columns[0])
+
+    def _organize(self, cursor, note_id, tags, notebook_id):
+        """Apply the optional tags/notebook arguments of update_note."""
+        if tags is not None:
+            self._set_tags(cursor, note_id, tags)
+        if notebook_id is not None:
+            cursor.execute("UPDATE notes SET notebook_id = ? WHERE id = ?",
+                           (notebook_id or None, note_id))
+
+    def get_note_details(self, note_id):
+        """(updated_at, pinned, tags, notebook_id) of a note, or None; tags as a list."""
+        with self.reader() as conn:
+            row = conn.execute(
+                "SELECT updated_at, pinned, notebook_id FROM notes WHERE id = ?", (note_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            tags = [name for (name,) in conn.execute("""
+                SELECT t.name FROM note_tags nt JOIN tags t ON t.id = nt.tag_id
+                WHERE nt.note_id = ? ORDER BY t.name
+            """, (note_id,))]
+        return row[0], bool(row[1]), tags, row[2]
+
+    def set_pinned(self, note_id, pinned=True):
+        """Pin or unpin a note; returns its list row, or None if it is gone."""
+        with self.writer() as conn:
+            row = conn.execute(
+                f"UPDATE notes SET pinned = ? WHERE id = ? RETURNING {LIST_COLUMNS}",
+                (int(bool(pinned)), note_id)
+            ).fetchone()
+        if row is not None:
+            self._publish("updated", row)
+        return row
+
+    # Duplicates
+
+    def index_duplicates(self, batch_size=500, progress=None, cancel=None):
+        """Compute signatures for notes not in the duplicate index yet.
+
+        Catches up after the upgrade to schema 6 and after import_notes,
+        which leaves hashing to this method. Signatures are computed outside
+        the write lock; a note indexed by a save in the meantime is left as
+        the save indexed it. Returns the number of notes indexed.
+        """
+        indexed, last_id = 0, 0
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise QueryCancelled()
+            # Walks the ids once instead of rescanning indexed notes every batch
+            with self.reader() as conn:
+                rows = conn.execute("""
+                    SELECT id, plain_text FROM notes
+                    WHERE id > ? AND locked = 0 AND id NOT IN (SELECT note_id FROM note_minhash)
+                    ORDER BY id LIMIT ?
+                """, (last_id, batch_size)).fetchall()
+            if not rows:
+                return indexed
+            last_id = rows[-1][0]
+            signatures = [(note_id, plain_text, dedup.signature(plain_text)) for note_id, plain_text in rows]
+            with self.writer() as conn:
+                cursor = conn.cursor()
+                for note_id, plain_text, signature in signatures:
+                    if cursor.execute("SELECT 1 FROM note_minhash WHERE note_id = ?", (note_id,)).fetchone():
+                        continue
+                    # Skips notes deleted or locked since they were read
+                    if cursor.execute("SELECT 1 FROM notes WHERE id = ? AND locked = 0",
+                                      (note_id,)).fetchone():
+                        dedup.index(cursor, note_id, plain_text, signature)
+                        indexed += 1
+            if progress is not None:
+                progress(indexed, 0)
+
+    def find_similar(self, catatan, exclude=None, threshold=dedup.DUPLICATE_THRESHOLD):
+        """Notes whose text is nearly that of the HTML `catatan`: (id, title, similarity)."""
+        with self.reader() as conn:
+            found = dedup.similar(conn, html_to_text(catatan), exclude, threshold)
+            titles = dict(conn.execute(
+                f"SELECT id, title FROM notes WHERE id IN ({','.join('?' * len(found))})",
+                [note_id for note_id, _ in found]).fetchall()) if found else {}
+        return [(note_id, titles[note_id], score) for note_id, score in found if note_id in titles]
+
+    def find_duplicates(self, threshold=dedup.DUPLICATE_THRESHOLD, progress=None, cancel=None):
+        """Groups of near-duplicate notes, each a list of list rows, largest groups first."""
+        self.index_duplicates(progress=progress, cancel=cancel)
+        with self.reader() as conn, self.cancellable(conn, cancel):
+            groups = dedup.groups(conn, threshold, cancel)
+            if groups is None:
+                raise QueryCancelled()
+            rows = {}
+            note_ids = [note_id for group in groups for note_id in group]
+            for start in range(0, len(note_ids), 500):
+                batch = note_ids[start:start + 500]
+                for row in conn.execute(
+                        f"SELECT {LIST_COLUMNS} FROM notes WHERE id IN ({','.join('?' * len(batch))})",
+                        batch):
+                    rows[row[0]] = row
+        return [[rows[note_id] for note_id in group if note_id in rows] for group in groups]
+
+    # Revisions
+
+    def list_revisions(self, note_id):
+        """(id, saved_at, title, size) of the earlier versions of a note, newest first."""
+        with self.reader() as conn:
+            return revisions.list_revisions(conn, note_id)
+
+    def get_revision(self, revision_id):
+        """Return (note_id, title, catatan, sumber, saved_at) of a revision, or None."""
+        with self.reader() as conn:
+            return revisions.load(conn, revision_id)
+
+    def restore_revision(self, revision_id):
+        """Make a revision the current version; the replaced one becomes a revision too."""
+        revision = self.get_revision(revision_id)
+        if revision is None:
+            return None
+        note_id, title, catatan, sumber, _ = revision
+        return self.update_note(note_id, title, catatan, sumber)
+
+    def prune_revisions(self, now=None, progress=None, cancel=None):
+        """Apply the retention of revisions.py to every note; returns the number deleted.
+
+        One transaction per note, so the app keeps writing in between.
+        """
+        # saved_at is CURRENT_TIMESTAMP, which is UTC
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        with self.reader() as conn:
+            note_ids = [row[0] for row in conn.execute(
+                "SELECT note_id FROM note_revisions GROUP BY note_id HAVING COUNT(*) > ?",
+                (revisions.KEEP_MIN,))]
+        deleted = 0
+        for done, note_id in enumerate(note_ids, 1):
+            if cancel is not None and cancel.is_set():
+                raise QueryCancelled()
+            unused_files = []
+            with self.writer() as conn:
+                cursor = conn.cursor()
+                keep = revisions.revisions_to_keep(cursor.execute(
+                    "SELECT id, saved_at FROM note_revisions WHERE note_id = ? ORDER BY id DESC",
+                    (note_id,)).fetchall(), now)
+                dropped = revisions.compact(cursor, note_id, keep)
+                if dropped:
+                    catatan = cursor.execute(
+                        "SELECT catatan FROM notes WHERE id = ?", (note_id,)).fetchone()[0]
+                    unused_files = self.attachments.link(
+                        cursor, note_id, catatan,
+                        extra=revisions.attachment_references(cursor, note_id))
+            _remove_files(unused_files)
+            deleted += dropped
+            if progress is not None:
+                progress(done, len(note_ids))
+        return deleted
+
+    def delete_note(self, note_id):
+        """Delete a note and return the list row it had, or None if it was gone."""
+        with self.writer() as conn:
+            cursor = conn.cursor()
+            hashes = [row[0] for row in cursor.execute(
+                "SELECT hash FROM note_attachments WHERE note_id = ?", (note_id,))]
+            row = cursor.execute(
+                f"DELETE FROM notes WHERE id = ? RETURNING {LIST_COLUMNS}", (note_id,)
+            ).fetchone()
+            unused_files = self.attachments.release(cursor, hashes)
+        self.invalidate_notes(note_id)
+        _remove_files(unused_files)
+        if row is not None:
+            self._publish("deleted", row)
+        return row
+
+    # Locked notes
+
+    def is_locked(self, note_id):
+        with self.reader() as conn:
+            row = conn.execute("SELECT locked FROM notes WHERE id = ?", (note_id,)).fetchone()
+        return bool(row and row[0])
+
+    def has_password(self):
+        with self.reader() as conn:
+            return conn.execute("SELECT 1 FROM vault_keys LIMIT 1").fetchone() is not None
+
+    def active_key(self):
+        """(key_id, key) of the current password; raises VaultLocked if not cached."""
+        with self.reader() as conn:
+            row = conn.execute("SELECT MAX(id) FROM vault_keys").fetchone()
+        if row[0] is None:
+            raise locking.VaultLocked("Belum ada kata sandi untuk catatan terkunci")
+        key = self.keys.get(row[0])
+        if key is None:
+            raise locking.VaultLocked()
+        return row[0], key
+
+    def unlock(self, password):
+        """Derive the key for `password` (slow on purpose) and cache it.
+
+        Keys of older passwords, kept wrapped by their successor until a
+        re-key finishes, are unwrapped into the cache as well.
+        """
+        with self.reader() as conn:
+            rows = conn.execute("""
+                SELECT id, salt, n, r, p, verifier, wrapped_key, wrapped_by
+                FROM vault_keys ORDER BY id DESC
+            """).fetchall()
+        if not rows:
+            raise locking.VaultLocked("Belum ada kata sandi untuk catatan terkunci")
+        key_id, salt, n, r, p, verifier = rows[0][:6]
+        key = locking.derive_key(password, salt, n, r, p)
+        locking.check_verifier(key, verifier)
+        self.keys.put(key_id, key)
+        for old_id, *_, wrapped_key, wrapped_by in rows[1:]:
+            wrapping = self.keys.get(wrapped_by)
+            if wrapped_key is not None and wrapping is not None:
+                self.keys.put(old_id, locking.decrypt_bytes(wrapping, wrapped_key, _vault_aad(old_id)))
+
+    def set_password(self, password, current_password=None):
+        """Create the first password, or change it (needs the current one).
+
+        After a change, notes stay readable through the wrapped old key;
+        rekey_notes() moves them to the new key in the background.
+        """
+        locking.require_available()
+        previous = None
+        if self.has_password():
+            self.unlock(current_password or "")
+            previous = self.active_key()
+        salt = locking.new_salt()
+        cost = (locking.SCRYPT_N, locking.SCRYPT_R, locking.SCRYPT_P)
+        key = locking.derive_key(password, salt, *cost)
+        with self.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO vault_keys (salt, n, r, p, verifier) VALUES (?, ?, ?, ?, ?)",
+                (salt,) + cost + (locking.make_verifier(key),)
+            )
+            key_id = cursor.lastrowid
+            if previous is not None:
+                old_id, old_key = previous
+                cursor.execute(
+                    "UPDATE vault_keys SET wrapped_key = ?, wrapped_by = ? WHERE id = ?",
+                    (locking.encrypt_bytes(key, old_key, _vault_aad(old_id)), key_id, old_id)
+                )
+        self.keys.put(key_id, key)
+        return key_id
+
+    def lock_session(self):
+        """Forget every cached key; locked notes need the password again."""
+        self.keys.clear()
+
+    def lock_notes(self, note_ids, batch_size=LOCK_BATCH_SIZE, progress=None, cancel=None):
+        """Encrypt the bodies of `note_ids` with the current key.
+
+        Works in batches of one transaction each and skips notes that are
+        already locked, so an interrupted run can simply be started again.
+        Images are inlined into the encrypted body and leave the attachment
+        store. Returns the number of notes locked.
+        """
+        key_id, key = self.active_key()
+        note_ids = list(note_ids)
+        changed = []
+        try:
+            for start in range(0, len(note_ids), batch_size):
+                if cancel is not None and cancel.is_set():
+                    raise QueryCancelled()
+                batch = note_ids[start:start + batch_size]
+                unused_files = []
+                with self.writer() as conn:
+                    rows = conn.execute(
+                        f"SELECT id, catatan FROM notes WHERE locked = 0 AND id IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+                    for note_id, catatan in rows:
+                        body = self.attachments.resolve(conn, catatan)
+                        # Earlier versions and autosaved drafts would keep the text readable
+                        conn.execute("DELETE FROM note_revisions WHERE note_id = ?", (note_id,))
+                        conn.execute("DELETE FROM drafts WHERE note_id = ?", (note_id,))
+                        dedup.remove(conn, note_id)
+                        token = locking.encrypt_text(key, body, locking.note_aad(note_id))
+                        changed.append(conn.execute(f"""
+                            UPDATE notes SET catatan = ?, plain_text = '', snippet = ?, char_count = 0,
+                                   locked = 1, key_id = ?
+                            WHERE id = ?
+                            RETURNING {LIST_COLUMNS}
+                        """, (token, LOCKED_SNIPPET, key_id, note_id)).fetchone())
+                        unused_files += self.attachments.link(conn, note_id, token)
+                    if rows:
+                        # Deleted terms stay in older FTS segments until they are merged
+                        conn.execute("INSERT INTO notes_fts (notes_fts) VALUES ('optimize')")
+                for note_id, _ in rows:
+                    self.invalidate_notes(note_id)
+                _remove_files(unused_files)
+                if progress is not None:
+                    progress(min(start + batch_size, len(note_ids)), len(note_ids))
+        finally:
+            if changed:
+                # Copy the zeroed pages into the database file and empty the WAL
+                with self._write_lock:
+                    self._writer_connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            # One row is updated in place, batches committed so far reload the list
+            if len(changed) == 1:
+                self._publish("updated", changed[0])
+            elif changed:
+                self._publish("reset")
+        return len(changed)
+
+    def unlock_note(self, note_id):
+        """Decrypt a note for good and return its new list row.
+
+        It becomes a normal note again; returns None if it was not locked.
+        """
+        note = self.get_note(note_id)
+        if note is None or not self.is_locked(note_id):
+            return None
+        catatan, blobs = extract_data_uris(note[2])
+        columns = text_columns(catatan)
+        with self.writer() as conn:
+            cursor = conn.cursor()
+            self.attachments.store(cursor, blobs)
+            row = cursor.execute(f"""
+                UPDATE notes SET catatan = ?, plain_text = ?, snippet = ?, char_count = ?,
+                       locked = 0, key_id = NULL
+                WHERE id = ?
+                RETURNING {LIST_COLUMNS}
+            """, (catatan,) + columns + (note_id,)).fetchone()
+            self.attachments.link(cursor, note_id, catatan)
+            dedup.index(cursor, note_id, columns[0])
+        self.invalidate_notes(note_id)
+        self._publish("updated", row)
+        return row
+
+    def pending_rekey(self):
+        """Number of locked notes still encrypted with an older password."""
+        with self.reader() as conn:
+            return conn.execute("""
+                SELECT COUNT(*) FROM notes
+                WHERE locked = 1 AND key_id != (SELECT MAX(id) FROM vault_keys)
+            """).fetchone()[0]
+
+    def rekey_notes(self, batch_size=LOCK_BATCH_SIZE, progress=None, cancel=None):
+        """Re-encrypt notes of older passwords with the current key.
+
+        Resumable: every batch commits on its own and only notes that still
+        use an old key are picked up. Old keys are deleted once unused.
+        """
+        key_id, key = self.active_key()
+        total = self.pending_rekey()
+        done = 0
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise QueryCancelled()
+            with self.writer() as conn:
+                rows = conn.execute("""
+                    SELECT id, catatan, key_id FROM notes
+                    WHERE locked = 1 AND key_id != ?
+                    LIMIT ?
+                """, (key_id, batch_size)).fetchall()
+                for note_id, token, old_id in rows:
+                    old_key = self.keys.get(old_id)
+                    if old_key is None:
+                        raise locking.NoteLocked(note_id)
+                    aad = locking.note_aad(note_id)
+                    body = locking.decrypt_text(old_key, token, aad)
+                    conn.execute("UPDATE notes SET catatan = ?, key_id = ? WHERE id = ?",
+                                 (locking.encrypt_text(key, body, aad), key_id, note_id))
+            if not rows:
+                break
+            done += len(rows)
+            if progress is not None:
+                progress(done, total)
+        with self.writer() as conn:
+            conn.execute("""
+                DELETE FROM vault_keys
+                WHERE id != ? AND id NOT IN (SELECT DISTINCT key_id FROM notes WHERE locked = 1)
+            """, (key_id,))
+        return done
+
+    def get_attachment(self, digest):
+        """Return (mime, data) of an attachment referenced by a note, or None."""
+        with self.reader() as conn:
+            return self.attachments.load(conn, digest)
+
+    def search_notes(self, query, limit=None, offset=0, cancel=None, **filters):
+        """Full-text search, best matches first (bm25).
+
+        Rows have the same shape as get_notes_page(), but their snippet is
+        the part of the body around the match, cut by FTS5 snippet(); notes
+        with an empty body (locked ones) keep their stored snippet. `filters`
+        are those of note_filters(). Setting the optional `cancel` event from
+        another thread aborts the query with QueryCancelled.
+        """
+        match = build_fts_query(query)
+        if match is None:
+            return []
+        if cancel is not None and cancel.is_set():
+            raise QueryCancelled()
+        terms, params = note_filters(alias="n", **filters)
+        with self.reader() as conn, self.cancellable(conn, cancel):
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT n.id, n.title,
+                       COALESCE(NULLIF(snippet(notes_fts, 1, '', '', '...', 16), ''), n.snippet),
+                       n.sumber_catatan, n.created_at
+                FROM notes_fts
+                JOIN notes n ON n.id = notes_fts.rowid
+                {_where(["notes_fts MATCH ?"] + terms)}
+                ORDER BY {FTS_RANK}, n.created_at DESC
+                LIMIT ? OFFSET ?
+            """, [match] + params + [-1 if limit is None else limit, offset])
             return cursor.fetchall()
+
+    def matches(self, query, note_id, **filters):
+        """True if note `note_id` is among the rows listed for `query` and `filters`.
+
+        Without a query only the filters of note_filters() are checked.
+        """
+        terms, params = note_filters(**filters)
+        terms.append("notes.id = ?")
+        params.append(note_id)
+        if query:
+            match = build_fts_query(query)
+            if match is None:
+                return False
+            terms.append("EXISTS (SELECT 1 FROM notes_fts WHERE notes_fts MATCH ? AND rowid = notes.id)")
+            params.append(match)
+        with self.reader() as conn:
+            return conn.execute(
+                f"SELECT 1 FROM notes {_where(terms)}", params
+            ).fetchone() is not None
@@ -0,0 +1,188 @@
+"""Near-duplicate detection with MinHash signatures and an LSH index.
+
+The plain text of a note is cut into overlapping word shingles. A MinHash
+signature of NUM_HASHES values estimates the share of shingles two notes
+have in common (Jaccard similarity) without looking at their texts again.
+The signature is cut into BANDS bands whose hashes go into note_lsh: notes
+sharing a bucket are candidates, and only candidates are compared, so
+finding all duplicates is one GROUP BY over the buckets instead of a
+comparison of every pair of notes.
+
+Signatures use one permutation hashing: one hash per shingle, spread over
+NUM_HASHES bins, empty bins filled from their right neighbour (rotation
+densification). That costs one pass over the shingles instead of one per
+hash function. Like revisions.py, functions that write take the cursor of
+the caller's transaction.
+"""
+import hashlib
+import re
+import struct
+import zlib
+
+SHINGLE_WORDS = 5
+NUM_HASHES = 64
+# 16 bands of 4 rows: pairs from about 0.5 similarity on become candidates,
+# pairs above DUPLICATE_THRESHOLD almost surely do
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+DUPLICATE_THRESHOLD = 0.8
+# Shorter texts are not indexed, a few words say little about duplication
+MIN_WORDS = 30
+# Buckets this crowded hold boilerplate, not duplicates
+MAX_BUCKET_SIZE = 1000
+
+_BIN_BITS = 6  # log2(NUM_HASHES)
+_VALUE_BITS = 32 - _BIN_BITS
+_EMPTY = 1 << 32
+_SIGNATURE = struct.Struct(f"<{NUM_HASHES}I")
+_WORD = re.compile(r"\w+")
+
+
+def create_tables(cursor):
+    # signature is NULL for notes too short to index, so they are not retried
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS note_minhash (
+            note_id INTEGER PRIMARY KEY REFERENCES notes (id) ON DELETE CASCADE,
+            signature BLOB
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS note_lsh (
+            bucket INTEGER NOT NULL,
+            note_id INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+            PRIMARY KEY (bucket, note_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_note_lsh_note ON note_lsh (note_id)")
+
+
+def signature(text):
+    """MinHash signature (tuple of NUM_HASHES ints) of a text, None if too short."""
+    words = _WORD.findall((text or "").lower())
+    if len(words) < MIN_WORDS:
+        return None
+    shingles = zip(*(words[i:] for i in range(SHINGLE_WORDS)))
+    bins = [_EMPTY] * NUM_HASHES
+    for h in {zlib.crc32(" ".join(shingle).encode("utf-8")) for shingle in shingles}:
+        # Multiplicative scrambling; the high bits pick the bin
+        h = (h * 0x9E3779B1) & 0xFFFFFFFF
+        b = h >> _VALUE_BITS
+        v = h & ((1 << _VALUE_BITS) - 1)
+        if v < bins[b]:
+            bins[b] = v
+    for i in range(NUM_HASHES):
+        if bins[i] == _EMPTY:
+            for distance in range(1, NUM_HASHES):
+                value = bins[(i + distance) % NUM_HASHES]
+                if value < 1 << _VALUE_BITS:  # a bin filled by a shingle
+                    bins[i] = value + (distance << _VALUE_BITS)
+                    break
+    return tuple(bins)
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_HASHES
+
+
+def buckets(sig):
+    """One LSH bucket per band; the band number is hashed in, so bands never collide."""
+    packed = _SIGNATURE.pack(*sig)
+    return [
+        int.from_bytes(hashlib.blake2b(packed[band * ROWS * 4:(band + 1) * ROWS * 4],
+                                       digest_size=8, person=b"band%d" % band).digest(),
+                       "big", signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def index(cursor, note_id, plain_text, sig=False):
+    """(Re)index a note; `sig` can be passed when it was computed beforehand."""
+    if sig is False:
+        sig = signature(plain_text)
+    cursor.execute("DELETE FROM note_lsh WHERE note_id = ?", (note_id,))
+    cursor.execute("INSERT OR REPLACE INTO note_minhash (note_id, signature) VALUES (?, ?)",
+                   (note_id, _SIGNATURE.pack(*sig) if sig else None))
+    if sig:
+        cursor.executemany("INSERT OR IGNORE INTO note_lsh (bucket, note_id) VALUES (?, ?)",
+                           [(bucket, note_id) for bucket in buckets(sig)])
+
+
+def remove(cursor, note_id):
+    cursor.execute("DELETE FROM note_lsh WHERE note_id = ?", (note_id,))
+    cursor.execute("DELETE FROM note_minhash WHERE note_id = ?", (note_id,))
+
+
+def _signatures(conn, note_ids):
+    found = {}
+    note_ids = list(note_ids)
+    for start in range(0, len(note_ids), 500):
+        batch = note_ids[start:start + 500]
+        for note_id, packed in conn.execute(
+                f"SELECT note_id, signature FROM note_minhash WHERE note_id IN ({','.join('?' * len(batch))})",
+                batch):
+            if packed is not None:
+                found[note_id] = _SIGNATURE.unpack(packed)
+    return found
+
+
+def similar(conn, plain_text, exclude=None, threshold=DUPLICATE_THRESHOLD):
+    """[(note_id, similarity)] of indexed notes like `plain_text`, most similar first."""
+    sig = signature(plain_text)
+    if sig is None:
+        return []
+    keys = buckets(sig)
+    candidates = {row[0] for row in conn.execute(
+        f"SELECT note_id FROM note_lsh WHERE bucket IN ({','.join('?' * len(keys))})", keys)}
+    candidates.discard(exclude)
+    scored = [(note_id, similarity(sig, other))
+              for note_id, other in _signatures(conn, candidates).items()]
+    return sorted([item for item in scored if item[1] >= threshold], key=lambda item: -item[1])
+
+
+def groups(conn, threshold=DUPLICATE_THRESHOLD, cancel=None):
+    """Groups of note ids whose texts are near-duplicates, largest groups first.
+
+    Candidates come from the buckets shared by more than one note. Within a
+    bucket each note is compared with the representatives found so far
+    there, and matches are merged with union-find, so the work grows with
+    the number of candidates and not with the square of the notes.
+    """
+    parent = {}
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while x != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    shared = [
+        [int(i) for i in members.split(",")]
+        for (members,) in conn.execute("""
+            SELECT group_concat(note_id) FROM note_lsh
+            GROUP BY bucket HAVING COUNT(*) > 1 AND COUNT(*) <= ?
+        """, (MAX_BUCKET_SIZE,))
+    ]
+    signatures = _signatures(conn, {note_id for members in shared for note_id in members})
+    for members in shared:
+        if cancel is not None and cancel.is_set():
+            return None
+        representatives = []
+        for note_id in members:
+            sig = signatures.get(note_id)
+            if sig is None:
+                continue
+            parent.setdefault(note_id, note_id)
+            for other in representatives:
+                if find(other) == find(note_id) or similarity(sig, signatures[other]) >= threshold:
+                    parent[find(note_id)] = find(other)
+                    break
+            else:
+                representatives.append(note_id)
+    clusters = {}
+    for note_id in parent:
+        clusters.setdefault(find(note_id), []).append(note_id)
+    return sorted((sorted(ids) for ids in clusters.values() if len(ids) > 1),
+                  key=lambda ids: (-len(ids), ids[0]))
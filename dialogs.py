@@ -0,0 +1,381 @@
+"""Note editor and detail dialogs, imported by MainWindow when first opened."""
+import time
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import (QCheckBox, QComboBox, QDialog, QFileDialog, QFormLayout,
+                               QHBoxLayout, QLabel, QLineEdit, QListWidget,
+                               QListWidgetItem, QMessageBox, QPushButton, QSplitter,
+                               QTreeWidget, QTreeWidgetItem, QVBoxLayout)
+from PySide6.QtGui import QImage
+import locking
+from drafts import DRAFT_DEBOUNCE_MS, DRAFT_MAX_DELAY_MS, draft_key
+from notes_model import format_date
+from rich_text import AttachmentTextEdit
+
+class NoteDialog(QDialog):
+    def __init__(self, parent=None, note_data=None, db=None, details=None, drafts=None, draft=None):
+        """`details` is (updated_at, pinned, tags, notebook_id) as from get_note_details().
+
+        With a DraftWriter in `drafts` the fields are autosaved while typing;
+        `draft` is the data of a stored draft to continue from.
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Tambah Catatan" if note_data is None else "Ubah Catatan")
+        self.setMinimumWidth(500)
+        self.setMinimumHeight(400)
+        
+        layout = QFormLayout(self)
+        
+        self.title_input = QLineEdit()
+        self.catatan_input = AttachmentTextEdit(db)
+        self.catatan_input.setAcceptRichText(True)  # Enable HTML support
+        self.sumber_input = QLineEdit()
+        self.tags_input = QLineEdit()
+        self.tags_input.setPlaceholderText("pisahkan dengan koma, misalnya: kerja, resep")
+        self.pinned_input = QCheckBox("Sematkan catatan ini")
+        self.notebook_input = QComboBox()
+        self.notebook_input.addItem("(tanpa notebook)", 0)
+        for notebook_id, name, _ in (db.list_notebooks() if db is not None else []):
+            self.notebook_input.addItem(name, notebook_id)
+        
+        if details:
+            self.pinned_input.setChecked(details[1])
+            self.tags_input.setText(", ".join(details[2]))
+            index = self.notebook_input.findData(details[3] or 0)
+            self.notebook_input.setCurrentIndex(max(index, 0))
+        if note_data:
+            self.title_input.setText(note_data[1] if note_data[1] else "")
+            # note_data[2] is the HTML content
+            self.catatan_input.setHtml(note_data[2])
+            self.sumber_input.setText(note_data[3] if note_data[3] else "")
+        if draft:
+            self.set_data(draft)
+            
+        layout.addRow("Judul:", self.title_input)
+        layout.addRow("Catatan:", self.catatan_input)
+        layout.addRow("Sumber:", self.sumber_input)
+        layout.addRow("Notebook:", self.notebook_input)
+        layout.addRow("Tag:", self.tags_input)
+        layout.addRow("", self.pinned_input)
+        
+        buttons = QHBoxLayout()
+        self.image_button = QPushButton("Sisipkan Gambar")
+        self.image_button.clicked.connect(self.insert_image)
+        buttons.addWidget(self.image_button)
+        buttons.addStretch()
+        self.save_button = QPushButton("Simpan")
+        self.save_button.setDefault(True)
+        self.save_button.clicked.connect(self.accept)
+        self.cancel_button = QPushButton("Batal")
+        self.cancel_button.clicked.connect(self.reject)
+        
+        buttons.addWidget(self.save_button)
+        buttons.addWidget(self.cancel_button)
+        layout.addRow(buttons)
+
+        self.db = db
+        self.drafts = drafts
+        self.note_id = note_data[0] if note_data else None
+        self.draft_key = draft_key(self.note_id)
+        self.draft_timer = QTimer(self)
+        self.draft_timer.setSingleShot(True)
+        self.draft_timer.setInterval(DRAFT_DEBOUNCE_MS)
+        self.draft_timer.timeout.connect(self.save_draft)
+        self._dirty_since = None
+        if drafts is not None:
+            for changed in (self.title_input.textChanged, self.catatan_input.textChanged,
+                            self.sumber_input.textChanged, self.tags_input.textChanged,
+                            self.pinned_input.toggled, self.notebook_input.currentIndexChanged):
+                changed.connect(self.schedule_draft)
+            if draft:
+                # Stored under this editor's key right away, the caller drops the old one
+                self.save_draft()
+
+    def schedule_draft(self, *args):
+        """Restart the autosave countdown; runs on every keystroke, so it only touches the timer."""
+        now = time.monotonic()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        if (now - self._dirty_since) * 1000 >= DRAFT_MAX_DELAY_MS:
+            self.save_draft()
+        else:
+            self.draft_timer.start()
+
+    def save_draft(self):
+        # Serializing the document is the only work done on the GUI thread
+        self.draft_timer.stop()
+        self._dirty_since = None
+        data = self.get_data()
+        del data["text"]
+        self.drafts.put(self.draft_key, self.note_id, data)
+
+    def accept(self):
+        data = self.get_data()
+        if not data["title"].strip() or not data["text"].strip():
+            QMessageBox.warning(self, "Peringatan", "Judul dan Catatan tidak boleh kosong!")
+            return
+        if self.db is not None and not self.confirm_not_duplicate(data["catatan"]):
+            return
+        super().accept()
+
+    def confirm_not_duplicate(self, catatan):
+        """Warn when another note has nearly the same text; False keeps the editor open."""
+        similar = self.db.find_similar(catatan, exclude=self.note_id)
+        if not similar:
+            return True
+        lines = [f'- "{title}" ({score:.0%})' for _, title, score in similar[:5]]
+        if len(similar) > 5:
+            lines.append(f"- dan {len(similar) - 5} catatan lain")
+        reply = QMessageBox.question(
+            self, "Catatan Mirip",
+            "Catatan ini mirip dengan:\n" + "\n".join(lines) + "\n\nTetap simpan?",
+            QMessageBox.Yes | QMessageBox.No)
+        return reply == QMessageBox.Yes
+
+    def done(self, result):
+        # Saved or abandoned on purpose: only crashes leave a draft behind
+        self.draft_timer.stop()
+        if self.drafts is not None:
+            self.drafts.discard(self.draft_key)
+        super().done(result)
+
+    def insert_image(self):
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Sisipkan Gambar", "", "Gambar (*.png *.jpg *.jpeg *.gif *.bmp *.webp)"
+        )
+        if not file_path: return
+        image = QImage(file_path)
+        if image.isNull():
+            QMessageBox.warning(self, "Peringatan", "File gambar tidak dapat dibaca.")
+            return
+        self.catatan_input.insert_image(image)
+
+    def set_data(self, data):
+        self.title_input.setText(data["title"])
+        self.catatan_input.setHtml(data["catatan"])
+        self.sumber_input.setText(data["sumber"] or "")
+        self.tags_input.setText(data["tags"])
+        self.pinned_input.setChecked(data["pinned"])
+        self.notebook_input.setCurrentIndex(max(self.notebook_input.findData(data["notebook_id"] or 0), 0))
+
+    def get_data(self):
+        return {
+            "title": self.title_input.text(),
+            "catatan": self.catatan_input.toHtml(),  # Get HTML content
+            "text": self.catatan_input.toPlainText(),  # Used to reject empty notes
+            "sumber": self.sumber_input.text(),
+            "tags": self.tags_input.text(),
+            "pinned": self.pinned_input.isChecked(),
+            "notebook_id": self.notebook_input.currentData(),  # 0 for none
+        }
+
+class NoteDetailDialog(QDialog):
+    def __init__(self, parent=None, note_data=None, db=None, details=None):
+        super().__init__(parent)
+        self.setWindowTitle("Detail Catatan")
+        self.setMinimumWidth(600)
+        self.setMinimumHeight(450)
+        
+        layout = QVBoxLayout(self)
+        
+        # Details section
+        info_layout = QFormLayout()
+        
+        created_at = note_data[4] if note_data and len(note_data) > 4 else "-"
+        created_field = QLineEdit(str(created_at))
+        created_field.setReadOnly(True)
+        info_layout.addRow("Dibuat Pada:", created_field)
+        
+        title_text = QLineEdit(note_data[1] if note_data and note_data[1] else "-")
+        title_text.setReadOnly(True)
+        info_layout.addRow("Judul:", title_text)
+        
+        sumber_text = QLineEdit(note_data[3] if note_data and note_data[3] else "-")
+        sumber_text.setReadOnly(True)
+        info_layout.addRow("Sumber:", sumber_text)
+        
+        if details:
+            updated_at, pinned, tags, _ = details
+            updated_field = QLineEdit(format_date(updated_at) or "-")
+            updated_field.setReadOnly(True)
+            info_layout.addRow("Diubah Pada:", updated_field)
+            tags_text = QLineEdit(", ".join(tags) or "-")
+            tags_text.setReadOnly(True)
+            info_layout.addRow("Tag:", tags_text)
+            if pinned:
+                info_layout.addRow("", QLabel("\U0001F4CC Disematkan"))
+        
+        layout.addLayout(info_layout)
+        
+        # Catatan content
+        label = QLabel("Catatan:")
+        label.setStyleSheet("font-weight: bold; margin-top: 10px;")
+        layout.addWidget(label)
+        
+        self.catatan_display = AttachmentTextEdit(db)
+        self.catatan_display.setHtml(note_data[2] if note_data else "")
+        self.catatan_display.setReadOnly(True)
+        layout.addWidget(self.catatan_display)
+        
+        buttons = QHBoxLayout()
+        self.note_id = note_data[0] if note_data else None
+        if db is not None and self.note_id is not None:
+            history_button = QPushButton("Riwayat")
+            history_button.clicked.connect(self.show_history)
+            buttons.addWidget(history_button)
+        buttons.addStretch()
+        close_button = QPushButton("Tutup")
+        close_button.clicked.connect(self.accept)
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+        self.db = db
+
+    def show_history(self):
+        dialog = RevisionDialog(self, self.db, self.note_id)
+        if dialog.exec():
+            # A version was restored, what is shown here is out of date
+            self.accept()
+
+
+class RevisionDialog(QDialog):
+    """Earlier versions of a note, with a preview and restore."""
+
+    def __init__(self, parent, db, note_id):
+        super().__init__(parent)
+        self.setWindowTitle("Riwayat Catatan")
+        self.setMinimumWidth(800)
+        self.setMinimumHeight(500)
+        self.db = db
+
+        layout = QVBoxLayout(self)
+        splitter = QSplitter(Qt.Horizontal)
+        self.revision_list = QListWidget()
+        for revision_id, saved_at, title, size in db.list_revisions(note_id):
+            item = QListWidgetItem(f"{format_date(saved_at)}  {title}  ({size // 1024 or 1} KB)")
+            item.setData(Qt.UserRole, revision_id)
+            self.revision_list.addItem(item)
+        self.revision_list.currentItemChanged.connect(self.show_revision)
+        self.preview = AttachmentTextEdit(db)
+        self.preview.setReadOnly(True)
+        splitter.addWidget(self.revision_list)
+        splitter.addWidget(self.preview)
+        splitter.setSizes([250, 550])
+        layout.addWidget(splitter)
+
+        buttons = QHBoxLayout()
+        if not self.revision_list.count():
+            buttons.addWidget(QLabel("Belum ada versi sebelumnya."))
+        buttons.addStretch()
+        self.restore_button = QPushButton("Pulihkan Versi Ini")
+        self.restore_button.setEnabled(False)
+        self.restore_button.clicked.connect(self.restore)
+        close_button = QPushButton("Tutup")
+        close_button.clicked.connect(self.reject)
+        buttons.addWidget(self.restore_button)
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+        self.revision_list.setCurrentRow(0)
+
+    def selected_revision(self):
+        item = self.revision_list.currentItem()
+        return item.data(Qt.UserRole) if item is not None else None
+
+    def show_revision(self, *args):
+        revision_id = self.selected_revision()
+        # Rebuilt from deltas only when selected
+        revision = self.db.get_revision(revision_id) if revision_id is not None else None
+        self.preview.setHtml(revision[2] if revision else "")
+        self.restore_button.setEnabled(revision is not None)
+
+    def restore(self):
+        reply = QMessageBox.question(
+            self, "Konfirmasi",
+            "Pulihkan versi ini? Isi catatan sekarang tetap tersimpan di riwayat.",
+            QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.db.restore_revision(self.selected_revision())
+            self.accept()
+
+
+class DuplicatesDialog(QDialog):
+    """Groups of near-duplicate notes from find_duplicates(), to view or delete."""
+
+    def __init__(self, parent, db, groups):
+        super().__init__(parent)
+        self.setWindowTitle("Catatan Duplikat")
+        self.setMinimumWidth(700)
+        self.setMinimumHeight(450)
+        self.db = db
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"{len(groups)} kelompok catatan yang isinya hampir sama."
+                                if groups else "Tidak ada catatan duplikat."))
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["Judul", "Dibuat", "Sumber"])
+        self.tree.setColumnWidth(0, 380)
+        for number, rows in enumerate(groups, 1):
+            group = QTreeWidgetItem(self.tree, [f"Kelompok {number} ({len(rows)} catatan)"])
+            for note_id, title, _, sumber, created_at in rows:
+                item = QTreeWidgetItem(group, [title, format_date(created_at), sumber or ""])
+                item.setData(0, Qt.UserRole, note_id)
+            group.setExpanded(True)
+        self.tree.currentItemChanged.connect(self.update_buttons)
+        self.tree.itemDoubleClicked.connect(self.view_note)
+        layout.addWidget(self.tree)
+
+        buttons = QHBoxLayout()
+        self.view_button = QPushButton("Lihat")
+        self.view_button.clicked.connect(self.view_note)
+        self.delete_button = QPushButton("Hapus")
+        self.delete_button.clicked.connect(self.delete_note)
+        buttons.addWidget(self.view_button)
+        buttons.addWidget(self.delete_button)
+        buttons.addStretch()
+        close_button = QPushButton("Tutup")
+        close_button.clicked.connect(self.accept)
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+        self.update_buttons()
+
+    def selected_note(self):
+        item = self.tree.currentItem()
+        return item.data(0, Qt.UserRole) if item is not None else None
+
+    def update_buttons(self, *args):
+        selected = self.selected_note() is not None
+        self.view_button.setEnabled(selected)
+        self.delete_button.setEnabled(selected)
+
+    def view_note(self, *args):
+        note_id = self.selected_note()
+        if note_id is None:
+            return
+        try:
+            note = self.db.get_note(note_id)
+        except locking.LockingError as e:
+            # Locked after the search ran
+            QMessageBox.warning(self, "Peringatan", str(e))
+            return
+        if note is None:
+            QMessageBox.warning(self, "Peringatan", "Catatan tidak ditemukan, mungkin sudah dihapus.")
+            return
+        note_id, title, catatan_html, sumber, created_at = note
+        NoteDetailDialog(self, (note_id, title, catatan_html, sumber, format_date(created_at)),
+                         db=self.db, details=self.db.get_note_details(note_id)).exec()
+
+    def delete_note(self):
+        note_id = self.selected_note()
+        if note_id is None:
+            return
+        reply = QMessageBox.question(self, "Konfirmasi", "Apakah Anda yakin ingin menghapus catatan ini?",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        self.db.delete_note(note_id)
+        item = self.tree.currentItem()
+        group = item.parent()
+        group.removeChild(item)
+        if group.childCount() < 2:
+            # A single note left is no duplicate any more
+            self.tree.takeTopLevelItem(self.tree.indexOfTopLevelItem(group))
+        else:
+            group.setText(0, f"{group.text(0).split(' (')[0]} ({group.childCount()} catatan)")
@@ -0,0 +1,89 @@
+"""Autosave of the note editor.
+
+NoteDialog hands a snapshot of its fields to the DraftWriter once the user
+pauses typing. The writer keeps only the newest snapshot per editor and a
+background thread stores whatever is pending in one transaction, so a burst
+of edits costs a single write and the GUI thread never waits for SQLite.
+"""
+import threading
+
+# Snapshot this long after the last edit...
+DRAFT_DEBOUNCE_MS = 1500
+# ...and at least this often while the typing goes on
+DRAFT_MAX_DELAY_MS = 10000
+NEW_NOTE_KEY = "new"
+
+
+def draft_key(note_id=None):
+    """Drafts key: one per edited note, one for the new note editor."""
+    return NEW_NOTE_KEY if note_id is None else f"note:{note_id}"
+
+
+class DraftWriter:
+    """Background thread that writes and deletes drafts for the editors.
+
+    `put` and `discard` only update the pending state and return at once.
+    If a write fails the snapshot is dropped (the next one replaces it
+    anyway) and the exception is kept in `error`.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.writes = 0
+        self.error = None
+        self._pending = {}      # key -> (note_id, data)
+        self._discarded = set()
+        self._busy = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="catat-drafts", daemon=True)
+        self._thread.start()
+
+    def put(self, key, note_id, data):
+        with self._cond:
+            self._pending[key] = (note_id, data)
+            self._discarded.discard(key)
+            self._cond.notify()
+
+    def discard(self, key):
+        """Forget the draft of `key`, written or not (the editor was closed)."""
+        with self._cond:
+            self._pending.pop(key, None)
+            self._discarded.add(key)
+            self._cond.notify()
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is stored; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: not (self._pending or self._discarded or self._busy), timeout)
+
+    def close(self):
+        """Write what is still pending and stop the thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._discarded or self._closed)
+                if not (self._pending or self._discarded):
+                    return
+                pending, self._pending = self._pending, {}
+                discarded, self._discarded = self._discarded, set()
+                self._busy = True
+            try:
+                if discarded:
+                    self.db.delete_drafts(discarded)
+                if pending:
+                    self.db.save_drafts([(key, note_id, data)
+                                         for key, (note_id, data) in pending.items()])
+                self.writes += 1
+            except Exception as e:
+                self.error = e
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
@@ -0,0 +1,129 @@
+"""Streaming export of notes to CSV, JSON Lines or a folder of Markdown files.
+
+Notes flow through a generator pipeline (read batch -> optional HTML strip ->
+write), so memory use stays flat no matter how many notes are exported.
+"""
+import csv
+import json
+import os
+import re
+import shutil
+from database import QueryCancelled
+from text_utils import html_to_text, parse_tags
+
+CSV_HEADER = ["ID", "Judul", "Catatan", "Sumber", "Dibuat Pada", "Tag", "Disematkan", "Notebook"]
+FORMATS = ("csv", "jsonl", "markdown")
+BATCH_SIZE = 500
+
+_SLUG = re.compile(r"[^\w-]+")
+
+
+def sanitize_csv_value(value):
+    """Security: neutralize spreadsheet formulas (CSV formula injection)."""
+    if isinstance(value, str) and value.startswith(("=", "+", "-", "@")):
+        return "'" + value  # Prefix with single quote to escape
+    return value
+
+
+def iter_records(db, strip=False, batch_size=BATCH_SIZE, cancel=None):
+    """Yield batches of note dicts; with `strip` the body is plain text."""
+    # Keep exported HTML self-contained: images go back to data: URIs
+    for rows in db.iter_notes(batch_size=batch_size, cancel=cancel, resolve_attachments=not strip):
+        yield [
+            {
+                "id": note_id,
+                "title": title,
+                "catatan": html_to_text(catatan) if strip else catatan,
+                "sumber": sumber,
+                "created_at": created_at,
+                "tags": parse_tags(tags),
+                "pinned": bool(pinned),
+                "notebook": notebook,
+            }
+            for note_id, title, catatan, sumber, created_at, tags, pinned, notebook in rows
+        ]
+
+
+def _write_csv(batches, path):
+    with open(path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(CSV_HEADER)
+        for batch in batches:
+            writer.writerows(
+                [sanitize_csv_value(r[key]) for key in ("id", "title", "catatan", "sumber", "created_at")]
+                + [sanitize_csv_value(", ".join(r["tags"])), int(r["pinned"]), sanitize_csv_value(r["notebook"])]
+                for r in batch
+            )
+            yield len(batch)
+
+
+def _write_jsonl(batches, path):
+    with open(path, "w", encoding="utf-8") as jsonfile:
+        for batch in batches:
+            jsonfile.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in batch)
+            yield len(batch)
+
+
+def markdown_filename(record):
+    slug = _SLUG.sub("-", (record["title"] or "").lower()).strip("-")[:60]
+    return f"{record['id']:06d}-{slug or 'catatan'}.md"
+
+
+def _write_markdown(batches, path):
+    os.makedirs(path)
+    for batch in batches:
+        for r in batch:
+            lines = [f"# {r['title']}", ""]
+            if r["sumber"]:
+                lines.append(f"- Sumber: {r['sumber']}")
+            if r["notebook"]:
+                lines.append(f"- Notebook: {r['notebook']}")
+            if r["tags"]:
+                lines.append(f"- Tag: {', '.join(r['tags'])}")
+            if r["pinned"]:
+                lines.append("- Disematkan")
+            lines += [f"- Dibuat Pada: {r['created_at']}", "", r["catatan"], ""]
+            with open(os.path.join(path, markdown_filename(r)), "w", encoding="utf-8") as mdfile:
+                mdfile.write("\n".join(lines))
+        yield len(batch)
+
+
+_WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "markdown": _write_markdown}
+
+
+def export_notes(db, path, fmt="csv", strip=None, progress=None, cancel=None,
+                 batch_size=BATCH_SIZE):
+    """Export every note to `path` and return the number of notes written.
+
+    `fmt` is one of FORMATS; for "markdown" `path` is a directory that must not
+    exist yet. `strip` defaults to plain text for Markdown and HTML otherwise.
+    Locked notes are left out, they stay readable only inside this database.
+    `progress(done, total)` is called after each batch, and setting the
+    `cancel` event raises QueryCancelled. Output is written to a temporary
+    name first, so a cancelled or failed export leaves nothing behind.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if strip is None:
+        strip = fmt == "markdown"
+    if os.path.exists(path) and fmt == "markdown":
+        raise FileExistsError(path)
+    total = db.count_notes(locked=False)
+    tmp_path = path + ".part"
+    done = 0
+    try:
+        batches = iter_records(db, strip=strip, batch_size=batch_size, cancel=cancel)
+        for written in _WRITERS[fmt](batches, tmp_path):
+            done += written
+            if progress is not None:
+                progress(done, total)
+            if cancel is not None and cancel.is_set():
+                raise QueryCancelled()
+    except BaseException:
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return done
@@ -0,0 +1,123 @@
+"""Readers that turn CSV, JSON Lines and folders of HTML files into notes.
+
+Every reader is a generator of dicts in the shape DatabaseManager.import_notes
+expects, so files are streamed instead of being loaded whole.
+"""
+import csv
+import json
+import os
+import re
+from datetime import datetime, timezone
+
+# Header names accepted for each field; the first ones match exporter.CSV_HEADER
+FIELD_NAMES = {
+    "title": ("Judul", "title", "judul"),
+    "catatan": ("Catatan", "catatan", "content", "body", "html"),
+    "sumber": ("Sumber", "sumber", "sumber_catatan", "source", "url"),
+    "created_at": ("Dibuat Pada", "created_at", "dibuat_pada", "date"),
+    "tags": ("Tag", "tags", "tag"),
+    "pinned": ("Disematkan", "pinned", "disematkan"),
+    "notebook": ("Notebook", "notebook"),
+}
+_TRUE = ("1", "true", "yes", "ya")
+HTML_EXTENSIONS = (".html", ".htm")
+
+_TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_ESCAPED_FORMULA = re.compile(r"^'[=+\-@]")
+
+# Pasted web pages easily exceed the default csv field limit of 128 KB
+csv.field_size_limit(2**31 - 1)
+
+
+def _pick(record, field):
+    for name in FIELD_NAMES[field]:
+        value = record.get(name)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def unescape_csv_value(value):
+    """Undo exporter.sanitize_csv_value so CSV exports round-trip."""
+    if isinstance(value, str) and _ESCAPED_FORMULA.match(value):
+        return value[1:]
+    return value
+
+
+def normalize(record):
+    note = {field: _pick(record, field) for field in FIELD_NAMES}
+    # "1" or "true" in CSV files, a boolean in JSON
+    if isinstance(note["pinned"], str):
+        note["pinned"] = note["pinned"].strip().lower() in _TRUE
+    return note
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as csvfile:
+        for record in csv.DictReader(csvfile):
+            yield normalize({k: unescape_csv_value(v) for k, v in record.items() if k})
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as jsonfile:
+        for line in jsonfile:
+            line = line.strip()
+            if line:
+                yield normalize(json.loads(line))
+
+
+def read_json(path):
+    """A .json file holding an array of notes, or JSON Lines under that name."""
+    with open(path, encoding="utf-8-sig") as jsonfile:
+        start = jsonfile.read(1)
+        while start.isspace():
+            start = jsonfile.read(1)
+        if start != "[":
+            yield from read_jsonl(path)
+            return
+        jsonfile.seek(0)
+        # An array has to be parsed whole, unlike the line-by-line formats
+        records = json.load(jsonfile)
+    for record in records:
+        yield normalize(record)
+
+
+def read_html_folder(path):
+    """One note per .html file; the <title> (or file name) becomes the title."""
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.lower().endswith(HTML_EXTENSIONS):
+                continue
+            file_path = os.path.join(root, name)
+            with open(file_path, encoding="utf-8", errors="replace") as htmlfile:
+                content = htmlfile.read()
+            match = _TITLE.search(content)
+            title = match.group(1).strip() if match else ""
+            modified = datetime.fromtimestamp(os.path.getmtime(file_path), timezone.utc)
+            yield {
+                "title": title or os.path.splitext(name)[0],
+                "catatan": content,
+                "sumber": None,
+                # Same UTC format as CURRENT_TIMESTAMP
+                "created_at": modified.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+
+
+def read_source(path):
+    """Pick a reader from the path: a directory, .csv, .jsonl or .json file."""
+    if os.path.isdir(path):
+        return read_html_folder(path)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return read_csv(path)
+    if extension in (".jsonl", ".ndjson"):
+        return read_jsonl(path)
+    if extension == ".json":
+        return read_json(path)
+    raise ValueError(f"Unsupported import file: {path}")
+
+
+def import_file(db, path, progress=None, cancel=None):
+    """Stream the notes in `path` into `db` and return ImportStats."""
+    return db.import_notes(read_source(path), progress=progress, cancel=cancel)
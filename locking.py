@@ -0,0 +1,153 @@
+"""Encryption for locked notes.
+
+Bodies of locked notes are encrypted with AES-256-GCM. The key is derived from
+the user's password with scrypt (memory-hard) once per session and then kept
+in a KeyCache that forgets it after a timeout. Requires the optional
+`cryptography` package; everything else in the app works without it.
+"""
+import base64
+import hashlib
+import os
+import threading
+import time
+
+# scrypt cost: 2**15 * 8 * 128 bytes = 32 MB of memory per derivation
+SCRYPT_N = 2 ** 15
+SCRYPT_R = 8
+SCRYPT_P = 1
+KEY_CACHE_SECONDS = 5 * 60
+TOKEN_PREFIX = "cs-lock1:"
+_VERIFIER = b"catat-segala vault"
+# (AESGCM, InvalidTag) once cryptography has been imported, () if it is missing
+_backend = None
+
+
+class LockingError(Exception):
+    """Base class for locked note errors."""
+
+
+class LockingUnavailable(LockingError):
+    def __init__(self):
+        super().__init__("Fitur kunci membutuhkan paket 'cryptography' (pip install cryptography)")
+
+
+class WrongPassword(LockingError):
+    pass
+
+
+class VaultLocked(LockingError):
+    """No password has been entered this session (or it timed out)."""
+
+    def __init__(self, message="Sesi terkunci, masukkan kata sandi"):
+        super().__init__(message)
+
+
+class NoteLocked(LockingError):
+    """The note is encrypted and no key for it is cached."""
+
+    def __init__(self, note_id):
+        super().__init__(f"Catatan {note_id} terkunci")
+        self.note_id = note_id
+
+
+def _crypto():
+    # cryptography takes a while to import and only locked notes need it, so
+    # it is loaded on first use instead of at startup
+    global _backend
+    if _backend is None:
+        try:
+            from cryptography.exceptions import InvalidTag
+            from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+            _backend = (AESGCM, InvalidTag)
+        except ImportError:  # pragma: no cover - optional dependency
+            _backend = ()
+    return _backend
+
+
+def available():
+    return bool(_crypto())
+
+
+def require_available():
+    """Return (AESGCM, InvalidTag), or raise LockingUnavailable."""
+    backend = _crypto()
+    if not backend:
+        raise LockingUnavailable()
+    return backend
+
+
+def derive_key(password, salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=2 * 128 * n * r, dklen=32)
+
+
+def new_salt():
+    return os.urandom(16)
+
+
+def encrypt_bytes(key, data, aad):
+    AESGCM, _ = require_available()
+    nonce = os.urandom(12)
+    return nonce + AESGCM(key).encrypt(nonce, data, aad)
+
+
+def decrypt_bytes(key, blob, aad):
+    AESGCM, InvalidTag = require_available()
+    try:
+        return AESGCM(key).decrypt(blob[:12], blob[12:], aad)
+    except InvalidTag as e:
+        raise WrongPassword("kunci tidak cocok") from e
+
+
+def note_aad(note_id):
+    # Binds a ciphertext to its note, so bodies cannot be swapped between rows
+    return f"note:{note_id}".encode("ascii")
+
+
+def encrypt_text(key, text, aad):
+    blob = encrypt_bytes(key, text.encode("utf-8"), aad)
+    return TOKEN_PREFIX + base64.b64encode(blob).decode("ascii")
+
+
+def decrypt_text(key, token, aad):
+    if not token.startswith(TOKEN_PREFIX):
+        raise LockingError("bukan data terenkripsi")
+    blob = base64.b64decode(token[len(TOKEN_PREFIX):])
+    return decrypt_bytes(key, blob, aad).decode("utf-8")
+
+
+def make_verifier(key):
+    return encrypt_bytes(key, _VERIFIER, b"vault")
+
+
+def check_verifier(key, verifier):
+    """Raise WrongPassword unless `key` is the one that made `verifier`."""
+    if decrypt_bytes(key, verifier, b"vault") != _VERIFIER:
+        raise WrongPassword("kata sandi salah")
+
+
+class KeyCache:
+    """Derived keys by vault generation, forgotten `ttl` seconds after unlock."""
+
+    def __init__(self, ttl=KEY_CACHE_SECONDS):
+        self.ttl = ttl
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def put(self, key_id, key):
+        with self._lock:
+            self._keys[key_id] = (key, time.monotonic() + self.ttl)
+
+    def get(self, key_id):
+        with self._lock:
+            entry = self._keys.get(key_id)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry[1]:
+                del self._keys[key_id]
+                return None
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
@@ -0,0 +1,226 @@
+from datetime import datetime
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, Signal
+
+COLUMNS = ["ID", "Judul", "Catatan", "Sumber", "Tgl/Jam"]
+
+
+def format_date(date_str):
+    """Format date string to %d/%m/%Y %H:%M:%S format"""
+    if not date_str:
+        return ""
+    try:
+        # Parse the date from database format (YYYY-MM-DD HH:MM:SS)
+        dt = datetime.strptime(str(date_str), "%Y-%m-%d %H:%M:%S")
+        return dt.strftime("%d/%m/%Y %H:%M:%S")
+    except ValueError:
+        # If parsing fails, return the original string
+        return str(date_str)
+
+
+class NotesTableModel(QAbstractTableModel):
+    """Read-only model over the notes table that loads rows page by page.
+
+    The view asks for more rows through canFetchMore/fetchMore as the user
+    scrolls. Plain listing pages with a keyset on (created_at, id); search
+    results are ranked, so they page with LIMIT/OFFSET over the FTS match.
+    Rows hold the snippet stored in the database, never the HTML body, and
+    dates are only formatted for rows that get painted.
+
+    Writes are not followed by a reload: the model subscribes to the
+    database's change events and inserts, updates or removes the one row
+    concerned, so selection, scroll position and the search stay as they are.
+    """
+
+    PAGE_SIZE = 200
+
+    # Carries NoteChange from whatever thread wrote to the GUI thread
+    _changed = Signal(object)
+
+    def __init__(self, db, page_size=PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.page_size = page_size
+        self._rows = []
+        self._ids = set()
+        self._display = {}
+        self._query = None
+        self._filters = {}
+        self._after = None
+        self._offset = 0
+        # Nothing is fetched before the first reload(), not even when the
+        # view asks while it is laid out, so the window can show up first
+        self._has_more = False
+        self._changed.connect(self.apply_change)
+        db.subscribe(self._changed.emit)
+
+    # Qt model interface
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        note = self._rows[row]
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return str(note[0])
+            if column == 1:
+                return str(note[1])
+            if column == 2:
+                return note[2]
+            if column == 3:
+                return str(note[3]) if note[3] else "-"
+            return self._formatted_date(row)
+        if role == Qt.ToolTipRole and column == 2:
+            return "Klik 2x atau klik 'Detail' untuk melihat format lengkap"
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self._has_more:
+            return
+        rows = self._load_page()
+        if len(rows) < self.page_size:
+            self._has_more = False
+        # Rows inserted by apply_change may come again with a later page
+        rows = [row for row in rows if row[0] not in self._ids]
+        if not rows:
+            return
+        self._ids.update(row[0] for row in rows)
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    # Helpers used by MainWindow
+
+    def reload(self, query=None):
+        """Drop loaded rows and start again, optionally filtered by a search."""
+        self.beginResetModel()
+        self._rows = []
+        self._ids = set()
+        self._display = {}
+        self._query = query or None
+        self._after = None
+        self._offset = 0
+        self._has_more = True
+        self.endResetModel()
+        self.fetchMore()
+
+    def show_results(self, query, rows):
+        """Show a first page of search results that was loaded elsewhere."""
+        self.beginResetModel()
+        self._rows = list(rows)
+        self._ids = {row[0] for row in self._rows}
+        self._display = {}
+        self._query = query or None
+        self._after = None
+        self._offset = len(self._rows)
+        self._has_more = len(rows) >= self.page_size
+        self.endResetModel()
+
+    def set_filters(self, **filters):
+        """Limit rows to the filters of database.note_filters().
+
+        Takes effect with the next reload() or show_results().
+        """
+        self._filters = {name: value for name, value in filters.items() if value is not None}
+
+    def note_id(self, row):
+        return self._rows[row][0]
+
+    def note_ids(self):
+        """Ids of the rows fetched so far (what the user has seen)."""
+        return [note[0] for note in self._rows]
+
+    def row_of(self, note_id):
+        """Row number of a loaded note, or -1."""
+        if note_id not in self._ids:
+            return -1
+        for row, note in enumerate(self._rows):
+            if note[0] == note_id:
+                return row
+        return -1
+
+    def detach(self):
+        """Stop following database changes (the model is about to go away)."""
+        self.db.unsubscribe(self._changed.emit)
+
+    def apply_change(self, change):
+        """Bring the loaded rows in line with one NoteChange."""
+        if change.kind == "reset":
+            self.reload(self._query)
+            return
+        row = self.row_of(change.note_id)
+        if change.kind == "deleted":
+            if row >= 0:
+                self._remove_row(row)
+            return
+        if ((self._query or self._filters)
+                and not self.db.matches(self._query, change.note_id, **self._filters)):
+            # Edited out of the current search results or filters
+            if row >= 0:
+                self._remove_row(row)
+            return
+        if row >= 0:
+            self._rows[row] = change.row
+            self._display.pop(change.note_id, None)
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(COLUMNS) - 1))
+            return
+        self._insert_row(change.row)
+
+    def _insert_row(self, note):
+        if self._query:
+            # The bm25 position is unknown, a new match goes to the top
+            position = 0
+        else:
+            key = (note[4], note[0])
+            position = next((i for i, loaded in enumerate(self._rows)
+                             if (loaded[4], loaded[0]) < key), len(self._rows))
+            if position == len(self._rows) and self._has_more:
+                return  # older than what is loaded, a later page brings it
+        self.beginInsertRows(QModelIndex(), position, position)
+        self._rows.insert(position, note)
+        self._ids.add(note[0])
+        self.endInsertRows()
+
+    def _remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        note = self._rows.pop(row)
+        self.endRemoveRows()
+        self._ids.discard(note[0])
+        self._display.pop(note[0], None)
+        if self._query:
+            # The match set shrank in front of the OFFSET of the next page
+            self._offset = max(0, self._offset - 1)
+
+    def _formatted_date(self, row):
+        note = self._rows[row]
+        value = self._display.get(note[0])
+        if value is None:
+            value = format_date(note[4])
+            self._display[note[0]] = value
+        return value
+
+    def _load_page(self):
+        if self._query:
+            rows = self.db.search_notes(self._query, limit=self.page_size, offset=self._offset,
+                                        **self._filters)
+            self._offset += len(rows)
+            return rows
+        rows = self.db.get_notes_page(after=self._after, limit=self.page_size, **self._filters)
+        if rows:
+            self._after = (rows[-1][4], rows[-1][0])
+        return rows
@@ -0,0 +1,217 @@
+"""Revision history of notes, stored as compressed reverse deltas.
+
+The current version of a note stays in notes. Every save records the
+version it replaces in note_revisions, as a delta against the version that
+came right after it: the next revision, or the note itself for the newest
+one. Reading an old version therefore walks towards the present, and every
+KEYFRAME_INTERVAL-th revision is stored whole to keep that walk short.
+Deltas are difflib opcodes over HTML tokens, zlib compressed, so an edit
+to a long note costs about the size of the edit instead of the whole body.
+
+Like AttachmentStore, functions that write take the cursor of the caller's
+transaction.
+"""
+import json
+import re
+import zlib
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+
+from attachments import references
+
+DELTA = 0
+KEYFRAME = 1
+# At most this many deltas are applied to rebuild any revision
+KEYFRAME_INTERVAL = 16
+COMPRESS_LEVEL = 6
+# Retention: the newest KEEP_MIN revisions of a note and everything from the
+# last KEEP_ALL_DAYS stay, then one revision per day up to KEEP_DAILY_DAYS
+KEEP_MIN = 10
+KEEP_ALL_DAYS = 7
+KEEP_DAILY_DAYS = 90
+
+# Pieces of HTML ending after a tag, a line or a sentence; joined they give
+# back the exact text
+_TOKEN = re.compile(r"[^>\n.!?]*(?:[>\n]|[.!?]+\s?)|[^>\n.!?]+")
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def create_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS note_revisions (
+            id INTEGER PRIMARY KEY,
+            note_id INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+            saved_at DATETIME,
+            title TEXT NOT NULL,
+            sumber_catatan TEXT,
+            size INTEGER NOT NULL,
+            kind INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            attachments TEXT NOT NULL DEFAULT ''
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_note_revisions_note ON note_revisions (note_id, id)")
+
+
+def tokenize(html):
+    return _TOKEN.findall(html)
+
+
+def make_delta(base, target):
+    """Compressed ops that rebuild `target` from `base`.
+
+    An op is either [start, end], a run of base tokens to copy, or a string
+    to insert.
+    """
+    base_tokens, target_tokens = tokenize(base), tokenize(target)
+    # Most edits touch one spot; matching only the part between the common
+    # head and tail keeps difflib fast on long notes
+    head = 0
+    limit = min(len(base_tokens), len(target_tokens))
+    while head < limit and base_tokens[head] == target_tokens[head]:
+        head += 1
+    tail = 0
+    while (tail < limit - head
+           and base_tokens[-1 - tail] == target_tokens[-1 - tail]):
+        tail += 1
+    ops = [[0, head]] if head else []
+    # autojunk stays on: tokens repeated all over a page (<p ...>, </td>)
+    # would otherwise make matching quadratic, the text between them anchors
+    matcher = SequenceMatcher(None, base_tokens[head:len(base_tokens) - tail],
+                              target_tokens[head:len(target_tokens) - tail])
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([head + i1, head + i2])
+        elif j2 > j1:
+            ops.append("".join(target_tokens[head + j1:head + j2]))
+    if tail:
+        ops.append([len(base_tokens) - tail, len(base_tokens)])
+    return zlib.compress(json.dumps(ops, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+                         COMPRESS_LEVEL)
+
+
+def apply_delta(base, delta):
+    tokens = tokenize(base)
+    return "".join(
+        "".join(tokens[op[0]:op[1]]) if isinstance(op, list) else op
+        for op in json.loads(zlib.decompress(delta))
+    )
+
+
+def _encode(kind, base, content):
+    if kind == KEYFRAME:
+        return zlib.compress(content.encode("utf-8"), COMPRESS_LEVEL)
+    return make_delta(base, content)
+
+
+def _decode(kind, data, base):
+    if kind == KEYFRAME:
+        return zlib.decompress(data).decode("utf-8")
+    return apply_delta(base, data)
+
+
+def record(cursor, note_id, old, new_catatan):
+    """Store `old` (title, catatan, sumber, saved_at), just replaced by `new_catatan`."""
+    title, catatan, sumber, saved_at = old
+    kinds = [row[0] for row in cursor.execute(
+        "SELECT kind FROM note_revisions WHERE note_id = ? ORDER BY id DESC LIMIT ?",
+        (note_id, KEYFRAME_INTERVAL - 1))]
+    # The older revisions reach the present through this one, so it becomes a
+    # keyframe once they already follow KEYFRAME_INTERVAL - 1 deltas
+    kind = KEYFRAME if len(kinds) == KEYFRAME_INTERVAL - 1 and KEYFRAME not in kinds else DELTA
+    cursor.execute("""
+        INSERT INTO note_revisions (note_id, saved_at, title, sumber_catatan, size, kind, data,
+                                    attachments)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (note_id, saved_at, title, sumber, len(catatan), kind,
+          _encode(kind, new_catatan, catatan), " ".join(sorted(references(catatan)))))
+
+
+def attachment_references(cursor, note_id):
+    """Attachments still needed by the revisions of a note."""
+    hashes = set()
+    for (names,) in cursor.execute(
+            "SELECT attachments FROM note_revisions WHERE note_id = ? AND attachments != ''",
+            (note_id,)):
+        hashes.update(names.split())
+    return hashes
+
+
+def list_revisions(conn, note_id):
+    """(id, saved_at, title, size) of the revisions of a note, newest first."""
+    return conn.execute("""
+        SELECT id, saved_at, title, size FROM note_revisions
+        WHERE note_id = ? ORDER BY id DESC
+    """, (note_id,)).fetchall()
+
+
+def load(conn, revision_id):
+    """Return (note_id, title, catatan, sumber, saved_at) of a revision, or None."""
+    row = conn.execute(
+        "SELECT note_id, title, sumber_catatan, saved_at FROM note_revisions WHERE id = ?",
+        (revision_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    note_id, title, sumber, saved_at = row
+    # Newer revisions up to the first keyframe, or up to the note itself
+    chain = []
+    for kind, data in conn.execute(
+            "SELECT kind, data FROM note_revisions WHERE note_id = ? AND id >= ? ORDER BY id",
+            (note_id, revision_id)):
+        chain.append((kind, data))
+        if kind == KEYFRAME:
+            break
+    content = None
+    if chain[-1][0] != KEYFRAME:
+        content = conn.execute("SELECT catatan FROM notes WHERE id = ?", (note_id,)).fetchone()[0]
+    for kind, data in reversed(chain):
+        content = _decode(kind, data, content)
+    return note_id, title, content, sumber, saved_at
+
+
+def revisions_to_keep(revisions, now):
+    """Ids among `revisions` ((id, saved_at), newest first) that retention keeps."""
+    keep, days = set(), set()
+    for position, (revision_id, saved_at) in enumerate(revisions):
+        try:
+            age = now - datetime.strptime(saved_at or "", _TIME_FORMAT)
+        except ValueError:
+            age = timedelta(0)  # unknown time, keep
+        if position < KEEP_MIN or age <= timedelta(days=KEEP_ALL_DAYS):
+            keep.add(revision_id)
+        elif age <= timedelta(days=KEEP_DAILY_DAYS) and saved_at[:10] not in days:
+            # Newest first, so this is the last version of that day
+            keep.add(revision_id)
+        if saved_at:
+            days.add(saved_at[:10])
+    return keep
+
+
+def compact(cursor, note_id, keep):
+    """Delete the revisions of a note not in `keep` and re-encode the rest.
+
+    Deltas of the survivors are rebuilt against their new neighbours and
+    keyframes placed again, so every revision stays reachable in at most
+    KEYFRAME_INTERVAL steps. Returns the number of revisions deleted.
+    """
+    rows = cursor.execute(
+        "SELECT id, kind, data FROM note_revisions WHERE note_id = ? ORDER BY id DESC",
+        (note_id,)).fetchall()
+    dropped = [revision_id for revision_id, _, _ in rows if revision_id not in keep]
+    if not dropped:
+        return 0
+    content = cursor.execute("SELECT catatan FROM notes WHERE id = ?", (note_id,)).fetchone()[0]
+    newer, deltas, updates = content, 0, []
+    for revision_id, kind, data in rows:
+        content = _decode(kind, data, content)
+        if revision_id not in keep:
+            continue
+        # Counted from the newest: every KEYFRAME_INTERVAL-th survivor is whole
+        new_kind = KEYFRAME if deltas == KEYFRAME_INTERVAL - 1 else DELTA
+        deltas = 0 if new_kind == KEYFRAME else deltas + 1
+        updates.append((new_kind, _encode(new_kind, newer, content), revision_id))
+        newer = content
+    cursor.executemany("DELETE FROM note_revisions WHERE id = ?", [(i,) for i in dropped])
+    cursor.executemany("UPDATE note_revisions SET kind = ?, data = ? WHERE id = ?", updates)
+    return len(dropped)
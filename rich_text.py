@@ -0,0 +1,86 @@
+import base64
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, Qt
+from PySide6.QtGui import QImage, QTextDocument
+from PySide6.QtWidgets import QTextEdit
+from attachments import SCHEME
+from database import LRUCache
+
+# Images wider than this are shown scaled down
+MAX_IMAGE_WIDTH = 800
+IMAGE_CACHE_SIZE = 64
+
+# Decoded images shared by every editor/viewer, bounded so browsing many
+# notes with pictures does not keep them all in memory
+_image_cache = LRUCache(IMAGE_CACHE_SIZE)
+
+
+def _decode(data):
+    image = QImage.fromData(data)
+    if image.isNull():
+        return None
+    if image.width() > MAX_IMAGE_WIDTH:
+        image = image.scaledToWidth(MAX_IMAGE_WIDTH, Qt.SmoothTransformation)
+    return image
+
+
+def load_attachment_image(db, digest):
+    """Decode an attachment on first use and keep it in the shared cache."""
+    image = _image_cache.get(digest)
+    if image is None:
+        found = db.get_attachment(digest)
+        if found is None:
+            return None
+        image = _decode(found[1])
+        if image is None:
+            return None
+        _image_cache.put(digest, image)
+    return image
+
+
+def image_to_data_uri(image):
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(bytes(data)).decode("ascii")
+
+
+class AttachmentTextEdit(QTextEdit):
+    """QTextEdit that resolves cs-attachment: images from the database.
+
+    Images are only decoded when the document lays them out. Pasted or
+    inserted images are embedded as data: URIs; DatabaseManager moves them
+    into the attachment store when the note is saved.
+    """
+
+    def __init__(self, db=None, parent=None):
+        super().__init__(parent)
+        self.db = db
+
+    def loadResource(self, resource_type, url):
+        if resource_type == QTextDocument.ImageResource:
+            if url.scheme() == SCHEME and self.db is not None:
+                image = load_attachment_image(self.db, url.path())
+                if image is not None:
+                    return image
+            elif url.scheme() == "data":
+                header, _, payload = url.toString().partition(",")
+                if header.endswith(";base64"):
+                    image = _decode(base64.b64decode(payload))
+                    if image is not None:
+                        return image
+        return super().loadResource(resource_type, url)
+
+    def insert_image(self, image):
+        self.textCursor().insertHtml(f'<img src="{image_to_data_uri(image)}" />')
+
+    def canInsertFromMimeData(self, source):
+        return source.hasImage() or super().canInsertFromMimeData(source)
+
+    def insertFromMimeData(self, source):
+        if source.hasImage() and not source.hasHtml():
+            image = QImage(source.imageData())
+            if not image.isNull():
+                self.insert_image(image)
+                return
+        super().insertFromMimeData(source)
@@ -0,0 +1,474 @@
+"""Local HTTP/JSON API over DatabaseManager, for scripts and other tools.
+
+Started with `python -m catat serve`; only the standard library is used, Qt
+is never imported. Endpoints:
+
+    GET    /notes             list rows, newest first (filters as query string)
+    GET    /search?q=...      ranked full-text search, same filters
+    GET    /notes/<id>        one full note
+    POST   /notes             a note object, a JSON array of them, or JSON Lines
+    DELETE /notes/<id>
+    GET    /export            every full note as JSON Lines
+
+Lists are streamed batch by batch with chunked transfer encoding, so large
+results never sit in memory. Notes posted by concurrent requests are
+coalesced by WriteCoalescer into one transaction. Database calls run in a
+thread pool next to the event loop and share the manager's pooled
+connections.
+"""
+import asyncio
+import json
+import sqlite3
+import urllib.parse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import locking
+from exporter import iter_records
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Writes arriving this close together share one transaction
+COALESCE_WINDOW = 0.002
+COALESCE_MAX_NOTES = 2000
+# Rows read from the database per chunk of a streamed response
+STREAM_BATCH = 500
+MAX_BODY_SIZE = 64 * 1024 * 1024
+_INT_MIN, _INT_MAX = -2 ** 63, 2 ** 63 - 1
+ROW_FIELDS = ("id", "title", "snippet", "sumber", "created_at")
+NOTE_FIELDS = ("id", "title", "catatan", "sumber", "created_at")
+
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large", 423: "Locked",
+            431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_filters(params):
+    """Keyword arguments of note_filters() from a parsed query string."""
+    filters = {}
+    for name in ("since", "until"):
+        if name in params:
+            filters[name] = _date(params[name][-1], name)
+    if "sumber" in params:
+        filters["sumber"] = params["sumber"][-1]
+    if "pinned" in params:
+        filters["pinned"] = params["pinned"][-1].lower() in ("1", "true", "yes")
+    if "tag" in params:
+        filters["tags"] = params["tag"]
+    if "notebook" in params:
+        filters["notebook"] = _int(params["notebook"][-1], "notebook")
+    return filters
+
+
+def _int(value, name, minimum=_INT_MIN):
+    try:
+        number = int(value)
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer") from None
+    # SQLite raises OverflowError past 64 bits
+    if not minimum <= number <= _INT_MAX:
+        raise HTTPError(400, f"{name} out of range")
+    return number
+
+
+def _date(value, name):
+    """A "YYYY-MM-DD[ HH:MM:SS]" bound as note_filters() takes it."""
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPError(400, f"{name} must be a date (YYYY-MM-DD)") from None
+    return value
+
+
+def parse_notes(body, content_type=""):
+    """Note dicts from a POST body: one object, an array, or JSON Lines."""
+    try:
+        text = body.decode("utf-8")
+        if "ndjson" in content_type or "jsonl" in content_type:
+            notes = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            notes = json.loads(text)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPError(400, f"invalid JSON: {e}") from None
+    if isinstance(notes, dict):
+        notes = [notes]
+    if not isinstance(notes, list) or not notes:
+        raise HTTPError(400, "expected a note object or a non-empty list of notes")
+    for note in notes:
+        if not isinstance(note, dict) or not (note.get("title") or note.get("catatan")):
+            raise HTTPError(400, "every note needs a title or catatan")
+        for key in ("title", "catatan", "sumber"):
+            if note.get(key) is not None and not isinstance(note[key], str):
+                raise HTTPError(400, f"{key} must be a string")
+        tags = note.get("tags")
+        if tags is not None and not isinstance(tags, str) and not (
+                isinstance(tags, list) and all(isinstance(tag, str) for tag in tags)):
+            raise HTTPError(400, "tags must be a string or a list of strings")
+        if note.get("pinned") is not None and not isinstance(note["pinned"], bool):
+            raise HTTPError(400, "pinned must be true or false")
+        notebook_id = note.get("notebook_id")
+        if notebook_id is not None and (not isinstance(notebook_id, int) or isinstance(notebook_id, bool)):
+            raise HTTPError(400, "notebook_id must be an integer")
+    return notes
+
+
+class WriteCoalescer:
+    """Batches notes from concurrent requests into DatabaseManager.add_notes().
+
+    The first waiting request opens a window of `window` seconds; everything
+    queued meanwhile (up to `max_notes`) is written in the same transaction.
+    If a combined batch fails, its requests are retried one by one so a bad
+    request only fails itself.
+    """
+
+    def __init__(self, db, executor, window=COALESCE_WINDOW, max_notes=COALESCE_MAX_NOTES):
+        self.db = db
+        self.executor = executor
+        self.window = window
+        self.max_notes = max_notes
+        self.batches = 0
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    async def add(self, notes):
+        """Queue `notes` and return their list rows once committed."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((notes, future))
+        return await future
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.window
+            while size < self.max_notes:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            await self._write(loop, pending)
+
+    async def _write(self, loop, pending):
+        notes = [note for batch, _ in pending for note in batch]
+        self.batches += 1
+        try:
+            rows = await loop.run_in_executor(self.executor, self.db.add_notes, notes)
+        except Exception as e:
+            if len(pending) == 1:
+                _settle(pending[0][1], error=e)
+                return
+            for item in pending:
+                await self._write(loop, [item])
+            return
+        start = 0
+        for batch, future in pending:
+            _settle(future, rows[start:start + len(batch)])
+            start += len(batch)
+
+
+def _settle(future, result=None, error=None):
+    # The request may have gone away (client disconnected) in the meantime
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class Request:
+    def __init__(self, method, path, params, headers, body):
+        self.method = method
+        self.path = path
+        self.params = params
+        self.headers = headers
+        self.body = body
+
+
+class NotesServer:
+    """The HTTP server; one instance per DatabaseManager."""
+
+    def __init__(self, db, host=DEFAULT_HOST, port=DEFAULT_PORT, window=COALESCE_WINDOW):
+        self.db = db
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=db.max_readers + 1,
+                                           thread_name_prefix="catat-api")
+        self.writes = WriteCoalescer(db, self.executor, window=window)
+        self._server = None
+        # Writers whose chunked response has started
+        self._streaming = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # port=0 picks a free port; report the real one
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.writes.close()
+        self.executor.shutdown(wait=True)
+
+    def _run(self, function, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    # Connection handling
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                try:
+                    await self._dispatch(request, writer, keep_alive)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive)
+                except locking.NoteLocked as e:
+                    await self._send_json(writer, 423, {"error": str(e)}, keep_alive)
+                except sqlite3.IntegrityError as e:
+                    # Well-formed but pointing nowhere, e.g. an unknown notebook_id
+                    await self._send_json(writer, 400, {"error": str(e)}, keep_alive)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    # After the head of a streamed response the only thing
+                    # left to do is to cut the stream
+                    if writer not in self._streaming:
+                        await self._send_json(writer, 500, {"error": str(e)}, keep_alive=False)
+                    break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._streaming.discard(writer)
+            writer.close()
+
+    async def _readline(self, reader, status, message):
+        try:
+            return await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            # Longer than the stream limit; the connection is closed afterwards
+            raise HTTPError(status, message) from None
+
+    async def _read_request(self, reader):
+        line = await self._readline(reader, 400, "request line too long")
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line") from None
+        headers = {}
+        while True:
+            line = await self._readline(reader, 431, "header line too long")
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = _int(headers.get("content-length", "0"), "Content-Length")
+        if length < 0:
+            raise HTTPError(400, "Content-Length must not be negative")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+        url = urllib.parse.urlsplit(target)
+        return Request(method.upper(), url.path.rstrip("/") or "/",
+                       urllib.parse.parse_qs(url.query), headers, body)
+
+    async def _dispatch(self, request, writer, keep_alive):
+        parts = request.path.strip("/").split("/")
+        method = request.method
+        if parts == ["notes"] and method == "GET":
+            await self._list(request, writer, keep_alive)
+        elif parts == ["notes"] and method == "POST":
+            notes = parse_notes(request.body, request.headers.get("content-type", ""))
+            rows = await self.writes.add(notes)
+            await self._send_json(writer, 201, [_row(r) for r in rows], keep_alive)
+        elif parts == ["search"] and method == "GET":
+            await self._search(request, writer, keep_alive)
+        elif parts == ["export"] and method == "GET":
+            await self._export(writer, keep_alive)
+        elif len(parts) == 2 and parts[0] == "notes" and method in ("GET", "DELETE"):
+            note_id = _int(parts[1], "note id")
+            if method == "GET":
+                note = await self._run(self.db.get_note, note_id)
+                if note is None:
+                    raise HTTPError(404, f"note {note_id} not found")
+                await self._send_json(writer, 200, dict(zip(NOTE_FIELDS, note)), keep_alive)
+            else:
+                row = await self._run(self.db.delete_note, note_id)
+                if row is None:
+                    raise HTTPError(404, f"note {note_id} not found")
+                await self._send_json(writer, 200, _row(row), keep_alive)
+        elif parts[0] in ("notes", "search", "export"):
+            raise HTTPError(405, f"{method} not allowed on {request.path}")
+        else:
+            raise HTTPError(404, f"no such endpoint: {request.path}")
+
+    # Endpoints
+
+    async def _list(self, request, writer, keep_alive):
+        filters = parse_filters(request.params)
+        limit = _int(request.params["limit"][-1], "limit", minimum=0) if "limit" in request.params else None
+
+        async def pages():
+            after, left = None, limit
+            while left is None or left > 0:
+                size = STREAM_BATCH if left is None else min(left, STREAM_BATCH)
+                rows = await self._run(lambda: self.db.get_notes_page(after, size, **filters))
+                if rows:
+                    yield rows
+                if len(rows) < size:
+                    break
+                after = (rows[-1][4], rows[-1][0])
+                if left is not None:
+                    left -= len(rows)
+
+        await self._stream_array(writer, pages(), keep_alive)
+
+    async def _search(self, request, writer, keep_alive):
+        query = request.params.get("q", [""])[-1]
+        if not query.strip():
+            raise HTTPError(400, "missing q")
+        filters = parse_filters(request.params)
+        limit = _int(request.params["limit"][-1], "limit", minimum=0) if "limit" in request.params else None
+
+        async def pages():
+            offset = 0
+            while limit is None or offset < limit:
+                size = STREAM_BATCH if limit is None else min(limit - offset, STREAM_BATCH)
+                rows = await self._run(
+                    lambda: self.db.search_notes(query, limit=size, offset=offset, **filters))
+                if rows:
+                    yield rows
+                if len(rows) < size:
+                    break
+                offset += len(rows)
+
+        await self._stream_array(writer, pages(), keep_alive)
+
+    async def _export(self, writer, keep_alive):
+        batches = iter_records(self.db, batch_size=STREAM_BATCH)
+        await self._start_chunked(writer, 200, "application/x-ndjson", keep_alive)
+        try:
+            while True:
+                batch = await self._run(next, batches, None)
+                if batch is None:
+                    break
+                await self._chunk(writer, "".join(
+                    json.dumps(r, ensure_ascii=False) + "\n" for r in batch))
+        finally:
+            # Gives the generator's pooled connection back, even on disconnect
+            await self._run(batches.close)
+        await self._chunk(writer, "")
+
+    # Responses
+
+    async def _send_json(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(_head(status, "application/json", keep_alive)
+                     + f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+        await writer.drain()
+
+    async def _start_chunked(self, writer, status, content_type, keep_alive):
+        writer.write(_head(status, content_type, keep_alive) + b"Transfer-Encoding: chunked\r\n\r\n")
+        self._streaming.add(writer)
+        await writer.drain()
+
+    async def _chunk(self, writer, text):
+        data = text.encode("utf-8")
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        if not data:
+            self._streaming.discard(writer)
+        await writer.drain()
+
+    async def _stream_array(self, writer, pages, keep_alive):
+        # Reading the first page before the head keeps errors reportable as JSON
+        try:
+            first = await pages.__anext__()
+        except StopAsyncIteration:
+            first = None
+        await self._start_chunked(writer, 200, "application/json", keep_alive)
+        await self._chunk(writer, "[")
+        separator = ""
+        async for rows in _prepend(first, pages):
+            await self._chunk(writer, separator + ",".join(
+                json.dumps(_row(r), ensure_ascii=False) for r in rows))
+            separator = ","
+        await self._chunk(writer, "]")
+        await self._chunk(writer, "")
+
+
+async def _prepend(first, rest):
+    if first is not None:
+        yield first
+    async for item in rest:
+        yield item
+
+
+def _row(row):
+    return dict(zip(ROW_FIELDS, row))
+
+
+def _head(status, content_type, keep_alive):
+    return (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}; charset=utf-8\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n").encode("ascii")
+
+
+def serve(db, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Run the API until interrupted (Ctrl+C)."""
+    server = NotesServer(db, host, port)
+
+    async def main():
+        await server.start()
+        print(f"Catat Segala API di http://{server.host}:{server.port}", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,118 @@
+from PySide6.QtCore import Qt, QTimer, Signal
+from PySide6.QtWidgets import (QHBoxLayout, QInputDialog, QLabel, QListWidget,
+                               QListWidgetItem, QMessageBox, QPushButton,
+                               QVBoxLayout, QWidget)
+
+# Coalesces bursts of changes (imports, bulk tagging) into one refresh
+REFRESH_DELAY_MS = 200
+
+
+class FacetSidebar(QWidget):
+    """Notebooks and tag facets with their note counts.
+
+    Counts come from the counter columns kept by triggers, so a refresh
+    reads one small row per tag or notebook. Checking several tags keeps
+    the notes that carry all of them.
+    """
+
+    filters_changed = Signal()
+    # Carries NoteChange from whatever thread wrote to the GUI thread
+    _changed = Signal(object)
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        layout.addWidget(QLabel("Notebook"))
+        self.notebook_list = QListWidget()
+        self.notebook_list.currentItemChanged.connect(lambda *args: self.filters_changed.emit())
+        layout.addWidget(self.notebook_list, 1)
+
+        buttons = QHBoxLayout()
+        add_button = QPushButton("Baru")
+        add_button.clicked.connect(self.add_notebook)
+        delete_button = QPushButton("Hapus")
+        delete_button.clicked.connect(self.delete_notebook)
+        buttons.addWidget(add_button)
+        buttons.addWidget(delete_button)
+        layout.addLayout(buttons)
+
+        layout.addWidget(QLabel("Tag"))
+        self.tag_list = QListWidget()
+        self.tag_list.itemChanged.connect(lambda item: self.filters_changed.emit())
+        layout.addWidget(self.tag_list, 2)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(REFRESH_DELAY_MS)
+        self.timer.timeout.connect(self.refresh)
+        self._changed.connect(self.schedule_refresh)
+        db.subscribe(self._changed.emit)
+
+    def detach(self):
+        self.db.unsubscribe(self._changed.emit)
+
+    def schedule_refresh(self, *args):
+        self.timer.start()
+
+    def refresh(self):
+        """Reload names and counts, keeping the current selection.
+
+        A deleted notebook or a vanished tag drops out of the selection; the
+        list signals are blocked while rebuilding, so that change is
+        announced once at the end.
+        """
+        notebook = self.notebook()
+        checked = {name.lower() for name in self.tags()}
+        self.notebook_list.blockSignals(True)
+        self.tag_list.blockSignals(True)
+        self.notebook_list.clear()
+        all_item = QListWidgetItem("Semua catatan")
+        all_item.setData(Qt.UserRole, None)
+        self.notebook_list.addItem(all_item)
+        self.notebook_list.setCurrentItem(all_item)
+        for notebook_id, name, count in self.db.list_notebooks():
+            item = QListWidgetItem(f"{name} ({count})")
+            item.setData(Qt.UserRole, notebook_id)
+            self.notebook_list.addItem(item)
+            if notebook_id == notebook:
+                self.notebook_list.setCurrentItem(item)
+        self.tag_list.clear()
+        for _, name, count in self.db.list_tags():
+            item = QListWidgetItem(f"{name} ({count})")
+            item.setData(Qt.UserRole, name)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked if name.lower() in checked else Qt.Unchecked)
+            self.tag_list.addItem(item)
+        self.notebook_list.blockSignals(False)
+        self.tag_list.blockSignals(False)
+        if self.notebook() != notebook or {name.lower() for name in self.tags()} != checked:
+            self.filters_changed.emit()
+
+    def notebook(self):
+        """Id of the selected notebook, None for all notes."""
+        item = self.notebook_list.currentItem()
+        return item.data(Qt.UserRole) if item is not None else None
+
+    def tags(self):
+        return [self.tag_list.item(i).data(Qt.UserRole) for i in range(self.tag_list.count())
+                if self.tag_list.item(i).checkState() == Qt.Checked]
+
+    def add_notebook(self):
+        name, ok = QInputDialog.getText(self, "Notebook Baru", "Nama notebook:")
+        if not ok or not name.strip():
+            return
+        self.db.add_notebook(name)
+        self.refresh()
+
+    def delete_notebook(self):
+        notebook = self.notebook()
+        if notebook is None:
+            return
+        reply = QMessageBox.question(
+            self, "Konfirmasi", "Hapus notebook ini? Catatannya tetap ada, tanpa notebook.",
+            QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.db.delete_notebook(notebook)
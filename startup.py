@@ -0,0 +1,43 @@
+"""Timing of the way from launching main.py to the first screen of notes.
+
+main.py marks every step on STARTUP; `python main.py --profile-startup`
+prints the breakdown to stderr once the first page of notes is shown and
+compares the total with STARTUP_BUDGET_MS. Time spent before main.py runs
+(interpreter start, PyInstaller --onefile unpacking) is not included, time
+it externally, e.g. with the "startup" scenario of benchmarks/run.py.
+"""
+import sys
+import time
+
+# Time to first painted window with notes, measured from the top of main.py
+STARTUP_BUDGET_MS = 700
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.steps = []
+
+    def mark(self, label):
+        """Record the time since the previous mark under `label`."""
+        now = time.perf_counter()
+        self.steps.append((label, (now - self._last) * 1000))
+        self._last = now
+
+    def total_ms(self):
+        return (self._last - self.started) * 1000
+
+    def report(self, budget_ms=STARTUP_BUDGET_MS, file=None):
+        """Print the breakdown; returns False when the budget was exceeded."""
+        file = file or sys.stderr
+        for label, ms in self.steps:
+            print(f"{label:<24} {ms:8.1f} ms", file=file)
+        total = self.total_ms()
+        within = total <= budget_ms
+        print(f"{'total':<24} {total:8.1f} ms (budget {budget_ms} ms{'' if within else ', EXCEEDED'})",
+              file=file)
+        return within
+
+
+STARTUP = StartupTimer()
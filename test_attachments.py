@@ -0,0 +1,104 @@
+from database import DatabaseManager
+import attachments
+import exporter
+import base64
+import json
+import os
+import shutil
+import sqlite3
+import threading
+
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+def image_html(data, text="gambar"):
+    uri = "data:image/png;base64," + base64.b64encode(data).decode()
+    return f'<p>{text}</p><p><img src="{uri}" width="10" /></p>'
+
+def test_attachments():
+    print("Starting attachment tests...")
+    db_test_name = "test_attachments.db"
+    folder = ".catat-segala/test_attachments"
+    shutil.rmtree(folder, ignore_errors=True)
+
+    db = DatabaseManager(db_test_name, folder=folder)
+
+    print("Testing deduplicated storage...")
+    db.add_note("Satu", image_html(PNG, "pertama"))
+    db.add_note("Dua", image_html(PNG, "kedua"))
+    digest = attachments.extract_data_uris(image_html(PNG))[1][0][0]
+    first, second = db.get_all_notes()[1], db.get_all_notes()[0]
+    assert "data:" not in first[2]
+    assert f'src="cs-attachment:{digest}"' in first[2]
+    with db.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM attachments").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM note_attachments").fetchone()[0] == 2
+    assert db.get_attachment(digest) == ("image/png", PNG)
+    assert db.search_notes("pertama")[0][2] == "pertama"
+
+    print("Testing reference counting...")
+    db.update_note(first[0], "Satu", "<p>tanpa gambar</p>")
+    assert db.get_attachment(digest) is not None
+    db.delete_note(second[0])
+    # The earlier version of "Satu" still shows the image
+    assert db.get_attachment(digest) is not None
+    db.delete_note(first[0])
+    assert db.get_attachment(digest) is None
+
+    print("Testing export keeps images...")
+    db.add_note("Tiga", image_html(PNG, "ketiga"))
+    path = os.path.join(folder, "notes.jsonl")
+    exporter.export_notes(db, path, "jsonl")
+    with open(path, encoding="utf-8") as f:
+        bodies = [json.loads(line)["catatan"] for line in f]
+    assert any("data:image/png;base64," in body for body in bodies)
+    db.close()
+
+    print("Testing export with a single reader...")
+    # Images are read on the connection of the export itself, not a second one
+    db = DatabaseManager(db_test_name, folder=folder, max_readers=1)
+    export = threading.Thread(target=exporter.export_notes, args=(db, path, "jsonl"), daemon=True)
+    export.start()
+    export.join(10)
+    assert not export.is_alive(), "export waited for a second reader"
+    db.close()
+
+    print("Testing external files...")
+    db = DatabaseManager("test_external.db", folder=folder, external_attachments=True)
+    db.attachments.external_min_size = 0
+    db.add_note("Luar", image_html(PNG))
+    file_path = os.path.join(folder, "attachments", digest[:2], digest)
+    assert os.path.exists(file_path)
+    with db.reader() as conn:
+        assert conn.execute("SELECT data FROM attachments").fetchone()[0] is None
+    assert db.get_attachment(digest) == ("image/png", PNG)
+    db.delete_note(db.get_all_notes()[0][0])
+    assert not os.path.exists(file_path)
+    db.close()
+
+    print("Testing migration of embedded images...")
+    path = os.path.join(folder, "test_old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            catatan TEXT NOT NULL,
+            sumber_catatan TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("INSERT INTO notes (title, catatan) VALUES (?, ?)", ("Lama", image_html(PNG)))
+    conn.commit()
+    conn.close()
+    db = DatabaseManager("test_old.db", folder=folder)
+    assert "data:" not in db.get_all_notes()[0][2]
+    assert db.get_attachment(digest) == ("image/png", PNG)
+    print("All attachment tests passed successfully!")
+
+    db.close()
+    shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_attachments()
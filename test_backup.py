@@ -0,0 +1,80 @@
+from conftest import remove_database
+from database import DatabaseManager, QueryCancelled
+import backup
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+
+def test_backup_restore():
+    print("Starting backup tests...")
+    db_test_name = "test_backup.db"
+    out_dir = ".catat-segala/test_backup_out"
+    remove_database(db_test_name)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+
+    db = DatabaseManager(db_test_name)
+    for i in range(50):
+        db.add_note(f"Catatan {i}", "<p>" + "isi panjang " * 100 + "</p>")
+
+    print("Testing plain and compressed backups...")
+    steps = []
+    plain = backup.backup_database(db, os.path.join(out_dir, "plain.db"), pages=8,
+                                   progress=lambda done, total: steps.append(done))
+    assert len(steps) > 1 and steps == sorted(steps)
+    compressed = backup.backup_database(db, os.path.join(out_dir, "notes.db.gz"))
+    assert os.path.getsize(compressed) < os.path.getsize(plain)
+    backup.verify_backup(plain)
+
+    print("Testing cancelled backup...")
+    cancel = threading.Event()
+    cancel.set()
+    try:
+        backup.backup_database(db, os.path.join(out_dir, "cancelled.db"), pages=8, cancel=cancel)
+        assert False, "backup should have been cancelled"
+    except QueryCancelled:
+        pass
+    assert sorted(os.listdir(out_dir)) == ["notes.db.gz", "plain.db"]
+
+    print("Testing restore...")
+    for note in db.get_notes_page(limit=10):
+        db.delete_note(note[0])
+    db.add_note("Setelah backup", "<p>hilang setelah restore</p>")
+    backup.restore_database(db, compressed)
+    assert db.count_notes() == 50
+    assert db.search_notes("restore") == []
+    assert len(db.search_notes("panjang", limit=5)) == 5
+    with db.reader() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    # Broken files are rejected before the live database is touched
+    broken = os.path.join(out_dir, "broken.db")
+    with open(broken, "wb") as f:
+        f.write(b"bukan database sqlite" * 100)
+    try:
+        backup.restore_database(db, broken)
+        assert False, "restore of a broken file should fail"
+    except backup.RestoreError:
+        pass
+    assert db.count_notes() == 50
+
+    print("Testing snapshot rotation...")
+    snapshots = backup.SnapshotManager(db, os.path.join(out_dir, "snapshots"), keep=3)
+    assert snapshots.is_due()
+    start = datetime(2024, 1, 1, 8, 0, 0)
+    for day in range(5):
+        snapshots.create(now=start + timedelta(days=day))
+    names = [os.path.basename(p) for p in snapshots.snapshots()]
+    assert names == ["notes-20240105-080000.db.gz", "notes-20240104-080000.db.gz",
+                     "notes-20240103-080000.db.gz"]
+    assert not snapshots.is_due(now=start + timedelta(days=4, hours=1))
+    assert snapshots.is_due(now=start + timedelta(days=5))
+    print("All backup tests passed successfully!")
+
+    db.close()
+    shutil.rmtree(out_dir, ignore_errors=True)
+    remove_database(db_test_name)
+
+if __name__ == "__main__":
+    test_backup_restore()
@@ -0,0 +1,68 @@
+import catat
+import io
+import json
+import os
+import shutil
+import sys
+
+def test_cli():
+    print("Starting CLI tests...")
+    folder = ".catat-segala/test_cli"
+    shutil.rmtree(folder, ignore_errors=True)
+    base = ["--folder", folder]
+
+    print("Testing add and search...")
+    out = io.StringIO()
+    assert catat.main(base + ["add", "Resep kopi", "<p>giling biji kopi</p>", "--tag", "dapur"], out) == 0
+    note_id = int(out.getvalue())
+    stdin = sys.stdin
+    sys.stdin = io.StringIO("teh hijau diseduh\n")
+    try:
+        assert catat.main(base + ["add", "Resep teh", "-"], io.StringIO()) == 0
+    finally:
+        sys.stdin = stdin
+    out = io.StringIO()
+    catat.main(base + ["search", "kopi", "--json"], out)
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["id"] for r in rows] == [note_id]
+    out = io.StringIO()
+    catat.main(base + ["search", "resep", "--tag", "dapur"], out)
+    assert out.getvalue().split("\t")[0] == str(note_id)
+    out = io.StringIO()
+    catat.main(base + ["search", "diseduh"], out)
+    assert "Resep teh" in out.getvalue()
+
+    print("Testing import from stdin...")
+    sys.stdin = io.StringIO("".join(json.dumps({"title": f"Impor {i}", "catatan": "isi"}) + "\n"
+                                    for i in range(50)))
+    out = io.StringIO()
+    try:
+        assert catat.main(base + ["import", "-"], out) == 0
+    finally:
+        sys.stdin = stdin
+    assert out.getvalue().startswith("50 catatan diimpor")
+
+    print("Testing export and backup...")
+    path = os.path.join(folder, "out.jsonl")
+    catat.main(base + ["export", path], io.StringIO())
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 52
+    # Only known extensions pick a format, anything else needs --format
+    try:
+        catat.main(base + ["export", os.path.join(folder, "out.json")], io.StringIO())
+        assert False, "an unknown extension must not become a Markdown folder"
+    except SystemExit as e:
+        assert e.code == 2
+    assert not os.path.exists(os.path.join(folder, "out.json"))
+    path = os.path.join(folder, "markdown")
+    assert catat.main(base + ["export", path], io.StringIO()) == 0
+    assert len(os.listdir(path)) == 52
+    dest = os.path.join(folder, "cadangan.db.gz")
+    assert catat.main(base + ["backup", dest], io.StringIO()) == 0
+    assert os.path.getsize(dest) > 0
+    assert catat.main(base + ["import", os.path.join(folder, "tidak-ada.csv")], io.StringIO()) == 1
+    print("All CLI tests passed successfully!")
+    shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_cli()
@@ -1,11 +1,13 @@
-from database import DatabaseManager
+from conftest import remove_database
+from database import DatabaseManager, QueryCancelled, note_filters
 import os
+import sqlite3
+import threading
 
 def test_db():
     print("Starting database tests...")
     db_test_name = "test_notes.db"
-    if os.path.exists(f".catat-segala/{db_test_name}"):
-        os.remove(f".catat-segala/{db_test_name}")
+    remove_database(db_test_name)
         
     db = DatabaseManager(db_test_name)
     
@@ -45,9 +47,422 @@ def test_db():
     print("Delete tests passed!")
     
     # Cleanup
-    if os.path.exists(f".catat-segala/{db_test_name}"):
-        os.remove(f".catat-segala/{db_test_name}")
+    db.close()
+    remove_database(db_test_name)
     print("All database tests passed successfully!")
 
+def test_fts_search():
+    print("Starting full-text search tests...")
+    db_test_name = "test_fts.db"
+    remove_database(db_test_name)
+
+    db = DatabaseManager(db_test_name)
+    db.add_note("Resep Kopi", "<p style='color:red'>Seduh kopi <b>arabika</b> dengan air panas</p>", "https://kopi.example")
+    db.add_note("Catatan Rapat", "<p>Bahas anggaran kopi untuk kantor</p>", None)
+
+    # Markup is not indexed, only the visible text
+    assert db.search_notes("style") == []
+    assert db.search_notes("color") == []
+
+    # Prefix and phrase queries
+    assert len(db.search_notes("arab")) == 1
+    assert len(db.search_notes('"air panas"')) == 1
+    assert db.search_notes('"panas air"') == []
+
+    # Title matches rank above body matches
+    results = db.search_notes("kopi")
+    assert [r[1] for r in results] == ["Resep Kopi", "Catatan Rapat"]
+
+    # Operators typed by the user are treated as plain text
+    assert db.search_notes("kopi AND OR (") == []
+    assert db.search_notes('"') == []
+
+    # Rows show the part of the body around the match
+    long_id = db.add_note("Panjang", "<p>" + "isi pengisi " * 100 + "kata tersembunyi di akhir</p>")[0]
+    row = db.search_notes("tersembunyi")[0]
+    assert row[0] == long_id and "tersembunyi" in row[2]
+    assert "tersembunyi" not in db.get_notes_page()[0][2]
+    print("Full-text search tests passed!")
+
+    db.close()
+    remove_database(db_test_name)
+
+def test_connection_pool():
+    print("Starting connection pool tests...")
+    db_test_name = "test_pool.db"
+    remove_database(db_test_name)
+
+    db = DatabaseManager(db_test_name)
+    db.add_note("Pertama", "<p>Isi</p>")
+
+    with db.writer() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        conn.execute("INSERT INTO notes (title, catatan) VALUES ('Kedua', 'Isi')")
+        # WAL: readers are not blocked by the open write and see the last commit
+        assert len(db.get_all_notes()) == 1
+    assert len(db.get_all_notes()) == 2
+
+    # A failed write is rolled back as a whole
+    try:
+        with db.writer() as conn:
+            conn.execute("INSERT INTO notes (title, catatan) VALUES ('Ketiga', 'Isi')")
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert len(db.get_all_notes()) == 2
+
+    # Reader connections are reused rather than reopened
+    with db.reader() as first:
+        pass
+    with db.reader() as second:
+        assert second is first
+        try:
+            second.execute("DELETE FROM notes")
+            assert False, "reader connections must be read-only"
+        except sqlite3.OperationalError:
+            pass
+    print("Connection pool tests passed!")
+
+    db.close()
+    remove_database(db_test_name)
+
+def test_notes_page():
+    print("Starting pagination tests...")
+    db_test_name = "test_page.db"
+    remove_database(db_test_name)
+
+    db = DatabaseManager(db_test_name)
+    with db.writer() as conn:
+        # Several notes share a timestamp, the id breaks the tie
+        conn.executemany(
+            "INSERT INTO notes (title, catatan, created_at) VALUES (?, ?, ?)",
+            [(f"Catatan {i}", "<p>Isi</p>", f"2024-01-0{1 + i // 3} 10:00:00") for i in range(7)],
+        )
+
+    pages, after = [], None
+    while True:
+        page = db.get_notes_page(after=after, limit=3)
+        if not page:
+            break
+        pages.append(page)
+        after = (page[-1][4], page[-1][0])
+    ids = [note[0] for page in pages for note in page]
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert ids == [note[0] for note in db.get_all_notes()]
+    assert len(set(ids)) == 7
+
+    assert len(db.search_notes("Catatan", limit=5)) == 5
+    assert len(db.search_notes("Catatan", limit=5, offset=5)) == 2
+    print("Pagination tests passed!")
+
+    db.close()
+    remove_database(db_test_name)
+
+def test_text_columns_migration():
+    print("Starting text column migration tests...")
+    db_test_name = "test_migrate.db"
+    path = f".catat-segala/{db_test_name}"
+    remove_database(db_test_name)
+
+    # Database in the original layout: no derived columns, no search index
+    os.makedirs(".catat-segala", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            catatan TEXT NOT NULL,
+            sumber_catatan TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    html = "<html><head><style>p { color: red; }</style></head><body><p>Halo &amp; dunia</p><p>baris dua</p></body></html>"
+    conn.execute("INSERT INTO notes (title, catatan) VALUES (?, ?)", ("Lama", html))
+    conn.commit()
+    conn.close()
+
+    db = DatabaseManager(db_test_name)
+    with db.reader() as conn:
+        plain_text, snippet, char_count = conn.execute(
+            "SELECT plain_text, snippet, char_count FROM notes"
+        ).fetchone()
+    assert plain_text == "Halo & dunia\nbaris dua"
+    assert snippet == "Halo & dunia baris dua"
+    assert char_count == len(plain_text)
+    assert len(db.search_notes("dunia")) == 1
+    assert db.search_notes("color") == []
+
+    # List rows carry the snippet, the body is fetched on demand
+    assert db.get_notes_page()[0][2] == snippet
+    assert db.get_note(db.get_notes_page()[0][0])[2] == html
+
+    # Derived columns follow updates
+    note_id = db.get_notes_page()[0][0]
+    db.update_note(note_id, "Lama", "<p>" + "kata " * 50 + "</p>")
+    snippet = db.get_notes_page()[0][2]
+    assert snippet.endswith("...") and len(snippet) == 103
+    assert db.search_notes("dunia") == []
+    assert len(db.search_notes("kata")) == 1
+    print("Text column migration tests passed!")
+
+    db.close()
+    remove_database(db_test_name)
+
+def test_note_cache():
+    print("Starting note cache tests...")
+    db_test_name = "test_cache.db"
+    remove_database(db_test_name)
+
+    db = DatabaseManager(db_test_name, note_cache_size=2)
+    for i in range(3):
+        db.add_note(f"Catatan {i}", f"<p>Isi {i}</p>")
+    ids = [note[0] for note in db.get_notes_page()]
+    assert all(len(note) == 5 and not note[2].startswith("<") for note in db.get_notes_page())
+
+    db.get_note(ids[0])
+    assert db.get_note(ids[0])[2] == "<p>Isi 2</p>"
+    assert db.note_cache.hits == 1
+
+    # Least recently used entry is evicted
+    db.get_note(ids[1])
+    db.get_note(ids[2])
+    assert len(db.note_cache) == 2
+    db.get_note(ids[0])
+    assert db.note_cache.misses == 4
+
+    # Writes invalidate the cached body
+    db.update_note(ids[0], "Baru", "<p>Isi baru</p>")
+    assert db.get_note(ids[0])[2] == "<p>Isi baru</p>"
+    db.delete_note(ids[0])
+    assert db.get_note(ids[0]) is None
+    print("Note cache tests passed!")
+
+    db.close()
+    remove_database(db_test_name)
+
+def test_cancel_query():
+    print("Starting query cancellation tests...")
+    db_test_name = "test_cancel.db"
+    remove_database(db_test_name)
+
+    db = DatabaseManager(db_test_name)
+    db.add_note("Kopi", "<p>Kopi</p>")
+
+    cancel = threading.Event()
+    assert len(db.search_notes("kopi", cancel=cancel)) == 1
+    cancel.set()
+    try:
+        db.search_notes("kopi", cancel=cancel)
+        assert False, "search should have been cancelled"
+    except QueryCancelled:
+        pass
+
+    # A long running statement is aborted from another thread
+    cancel = threading.Event()
+    threading.Timer(0.05, cancel.set).start()
+    try:
+        with db.reader() as conn, db.cancellable(conn, cancel):
+            conn.execute("""
+                WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n)
+                SELECT COUNT(*) FROM n
+            """).fetchone()
+        assert False, "query should have been cancelled"
+    except QueryCancelled:
+        pass
+
+    # The connection goes back to the pool without the handler
+    assert len(db.search_notes("kopi")) == 1
+    print("Query cancellation tests passed!")
+
+    db.close()
+    remove_database(db_test_name)
+
+def test_change_events():
+    print("Starting change event tests...")
+    db_test_name = "test_events.db"
+    remove_database(db_test_name)
+
+    db = DatabaseManager(db_test_name)
+    changes = []
+    db.subscribe(changes.append)
+
+    row = db.add_note("Kopi", "<p>Seduh <b>kopi</b></p>", "dapur")
+    assert row[1:4] == ("Kopi", "Seduh kopi", "dapur")
+    assert row == db.get_notes_page()[0]
+    assert changes[-1] == ("added", row[0], row)
+
+    updated = db.update_note(row[0], "Teh", "<p>Seduh teh</p>")
+    assert updated[:3] == (row[0], "Teh", "Seduh teh")
+    assert changes[-1].kind == "updated" and changes[-1].row == updated
+    assert db.matches("teh", row[0]) and not db.matches("kopi", row[0])
+
+    assert db.delete_note(row[0]) == updated
+    assert changes[-1] == ("deleted", row[0], updated)
+    # Writes that touch nothing publish nothing
+    assert db.delete_note(row[0]) is None
+    assert db.update_note(row[0], "x", "<p>x</p>") is None
+    assert len(changes) == 3
+
+    db.import_notes([{"title": f"Impor {i}", "catatan": "<p>isi</p>"} for i in range(3)])
+    assert changes[-1] == ("reset", None, None)
+
+    db.unsubscribe(changes.append)
+    db.add_note("Diam", "<p>tanpa event</p>")
+    assert len(changes) == 4
+    print("Change event tests passed!")
+
+    db.close()
+    remove_database(db_test_name)
+
+def test_schema_migrations():
+    print("Starting schema migration tests...")
+    db_test_name = "test_schema.db"
+    remove_database(db_test_name)
+
+    # Layout of the last version without user_version: what migration 1
+    # builds, but user_version was never set
+    class BeforeVersions(DatabaseManager):
+        MIGRATIONS = DatabaseManager.MIGRATIONS[:1]
+
+    db = BeforeVersions(db_test_name)
+    with db.writer() as conn:
+        conn.execute("""INSERT INTO notes (title, catatan, sumber_catatan, plain_text)
+                        VALUES ('Lama', '<p>isi lama</p>', 'buku', 'isi lama')""")
+        conn.execute("PRAGMA user_version = 0")
+    db.close()
+
+    db = DatabaseManager(db_test_name)
+    assert db.schema_version() == len(DatabaseManager.MIGRATIONS)
+    note_id, _, _, _, created_at = db.get_notes_page()[0]
+    assert db.get_note_details(note_id) == (created_at, False, [], None)
+    assert len(db.search_notes("lama")) == 1
+    db.close()
+
+    # Version 2 kept tags as text, version 3 moves them into note_tags
+    remove_database(db_test_name)
+    class VersionTwo(DatabaseManager):
+        MIGRATIONS = DatabaseManager.MIGRATIONS[:2]
+
+    db = VersionTwo(db_test_name)
+    with db.writer() as conn:
+        conn.execute("""INSERT INTO notes (title, catatan, plain_text, tags)
+                        VALUES ('Bertag', '<p>isi</p>', 'isi', 'kerja, Kopi')""")
+    db.close()
+
+    db = DatabaseManager(db_test_name)
+    note_id = db.get_notes_page()[0][0]
+    assert db.get_note_details(note_id)[2] == ["kerja", "Kopi"]
+    assert [(name, count) for _, name, count in db.list_tags()] == [("kerja", 1), ("Kopi", 1)]
+
+    # Up to date: opening again changes nothing
+    db.init_db()
+    assert db.schema_version() == len(DatabaseManager.MIGRATIONS)
+    print("Schema migration tests passed!")
+
+    db.close()
+    remove_database(db_test_name)
+
+def test_list_filters():
+    print("Starting list filter tests...")
+    db_test_name = "test_filters.db"
+    remove_database(db_test_name)
+
+    db = DatabaseManager(db_test_name)
+    db.import_notes([
+        {"title": f"Catatan {i}", "catatan": f"<p>kopi {i}</p>",
+         "sumber": "blog" if i % 2 else None, "created_at": f"2024-01-{i + 1:02d} 10:00:00"}
+        for i in range(10)
+    ])
+    ids = [row[0] for row in db.get_notes_page(since="2024-01-03", until="2024-01-06")]
+    assert [db.get_note(i)[1] for i in ids] == ["Catatan 4", "Catatan 3", "Catatan 2"]
+    assert len(db.get_notes_page(sumber="blog")) == 5
+    assert len(db.get_notes_page(sumber="")) == 5
+    assert db.count_notes(sumber="blog", since="2024-01-05") == 3
+    assert db.list_sources() == [("blog", 5)]
+    page = db.get_notes_page(limit=2, sumber="blog")
+    after = (page[-1][4], page[-1][0])
+    assert [row[1] for row in db.get_notes_page(after=after, limit=2, sumber="blog")] == ["Catatan 5", "Catatan 3"]
+    assert len(db.search_notes("kopi", sumber="blog", until="2024-01-05")) == 2
+
+    row = db.add_note("Penting", "<p>kopi pagi</p>", tags="kerja, Kopi,kerja", pinned=True)
+    assert db.get_note_details(row[0])[1:3] == (True, ["kerja", "Kopi"])
+    assert [r[0] for r in db.get_notes_page(pinned=True)] == [row[0]]
+    db.set_pinned(row[0], False)
+    db.update_note(row[0], "Penting", "<p>kopi sore</p>")
+    assert db.get_note_details(row[0])[1:3] == (False, ["kerja", "Kopi"])
+    assert db.matches(None, row[0]) and not db.matches(None, row[0], pinned=True)
+    assert db.matches("sore", row[0], since="2000-01-01")
+
+    # Listing walks an index in list order instead of sorting every row
+    with db.reader() as conn:
+        for filters in ({}, {"sumber": "blog"}, {"since": "2024-01-03"}, {"pinned": True}):
+            terms, params = note_filters(**filters)
+            where = ("WHERE " + " AND ".join(terms)) if terms else ""
+            plan = " ".join(str(step[3]) for step in conn.execute(
+                f"EXPLAIN QUERY PLAN SELECT id, title, snippet FROM notes {where} ORDER BY created_at DESC, id DESC",
+                params))
+            assert "INDEX idx_notes_" in plan and "TEMP B-TREE" not in plan, (filters, plan)
+    print("List filter tests passed!")
+
+    db.close()
+    remove_database(db_test_name)
+
+def test_tags_and_notebooks():
+    print("Starting tag and notebook tests...")
+    db_test_name = "test_tags.db"
+    remove_database(db_test_name)
+
+    db = DatabaseManager(db_test_name)
+    kerja = db.add_notebook("Kerja")
+    assert db.add_notebook(" kerja ") == kerja
+    a = db.add_note("Rapat kopi", "<p>kopi dan anggaran</p>", tags="kerja, rapat", notebook_id=kerja)[0]
+    b = db.add_note("Resep kopi", "<p>kopi susu</p>", tags="kopi, resep")[0]
+    c = db.add_note("Rapat tim", "<p>teh</p>", tags=["Rapat", "kerja"])[0]
+
+    def counts():
+        return {name: count for _, name, count in db.list_tags()}
+
+    assert counts() == {"kerja": 2, "kopi": 1, "rapat": 2, "resep": 1}
+    assert db.list_notebooks() == [(kerja, "Kerja", 1)]
+
+    # Every given tag must be present, combined with search and other filters
+    assert {r[0] for r in db.get_notes_page(tags=["kerja", "RAPAT"])} == {a, c}
+    assert [r[0] for r in db.search_notes("kopi", tags="rapat")] == [a]
+    assert db.get_notes_page(tags=["kerja", "tidak-ada"]) == []
+    assert [r[0] for r in db.get_notes_page(notebook=kerja)] == [a]
+    assert db.matches("kopi", a, tags=["kerja"]) and not db.matches("kopi", b, tags=["kerja"])
+
+    # Counters follow updates and deletes
+    db.update_note(c, "Rapat tim", "<p>teh</p>", tags="rapat", notebook_id=kerja)
+    assert counts()["kerja"] == 1 and db.list_notebooks()[0][2] == 2
+    db.update_note(a, "Rapat kopi", "<p>kopi</p>", notebook_id=0)
+    assert db.list_notebooks()[0][2] == 1
+    assert db.get_note_details(a)[2:] == (["kerja", "rapat"], None)
+    db.delete_note(c)
+    assert counts() == {"kerja": 1, "kopi": 1, "rapat": 1, "resep": 1}
+    assert db.list_notebooks()[0][2] == 0
+
+    db.tag_notes([a, b], "penting")
+    assert counts()["penting"] == 2
+    db.delete_notebook(kerja)
+    assert db.list_notebooks() == []
+    with db.reader() as conn:
+        assert conn.execute("SELECT SUM(note_count) FROM tags").fetchone()[0] == \
+            conn.execute("SELECT COUNT(*) FROM note_tags").fetchone()[0]
+    print("Tag and notebook tests passed!")
+
+    db.close()
+    remove_database(db_test_name)
+
 if __name__ == "__main__":
     test_db()
+    test_fts_search()
+    test_connection_pool()
+    test_notes_page()
+    test_text_columns_migration()
+    test_note_cache()
+    test_cancel_query()
+    test_change_events()
+    test_schema_migrations()
+    test_list_filters()
+    test_tags_and_notebooks()
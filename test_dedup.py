@@ -0,0 +1,71 @@
+from conftest import remove_database
+from database import DatabaseManager
+import dedup
+import random
+
+WORDS = ["catat", "segala", "kopi", "teh", "resep", "pasar", "kerja", "rapat", "buku", "kota",
+         "hujan", "kereta", "sore", "pagi", "nasi", "goreng", "jalan", "rumah", "kantor", "libur"]
+
+def text(rng, count=200):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+def page(body):
+    return f"<html><body><p>{body}</p></body></html>"
+
+def test_dedup():
+    print("Starting duplicate detection tests...")
+    db_test_name = "test_dedup.db"
+    remove_database(db_test_name)
+    db = DatabaseManager(db_test_name)
+    rng = random.Random(11)
+
+    print("Testing signatures...")
+    base = text(rng)
+    edited = base + " tambahan kecil di akhir"
+    assert dedup.signature("terlalu pendek") is None
+    assert dedup.similarity(dedup.signature(base), dedup.signature(base)) == 1.0
+    assert dedup.similarity(dedup.signature(base), dedup.signature(edited)) >= dedup.DUPLICATE_THRESHOLD
+    assert dedup.similarity(dedup.signature(base), dedup.signature(text(rng))) < 0.3
+
+    print("Testing the save-time check...")
+    original = db.add_note("Asli", page(base))[0]
+    others = [db.add_note(f"Lain {i}", page(text(rng)))[0] for i in range(20)]
+    found = db.find_similar(page(edited))
+    assert [(note_id, title) for note_id, title, _ in found] == [(original, "Asli")]
+    assert db.find_similar(page(edited), exclude=original) == []
+    assert db.find_similar(page("pendek saja")) == []
+
+    print("Testing duplicate groups...")
+    copy = db.add_note("Salinan", page(edited))[0]
+    third = db.add_note("Salinan lagi", page(base + " catatan kaki"))[0]
+    pair = db.add_note("Pasangan", page(text(rng)))[0]
+    db.update_note(others[0], "Lain 0", db.get_note(pair)[2])
+    groups = db.find_duplicates()
+    assert [[row[0] for row in group] for group in groups] == [
+        sorted([original, copy, third]), sorted([others[0], pair])]
+    assert groups[0][0][1] == "Asli"
+
+    print("Testing edits and deletes keep the index in step...")
+    db.update_note(others[0], "Lain 0", page(text(rng)))
+    db.delete_note(third)
+    assert [[row[0] for row in group] for group in db.find_duplicates()] == [[original, copy]]
+    db.set_password("rahasia")
+    db.lock_notes([copy])
+    assert db.find_duplicates() == []
+    assert db.find_similar(page(edited), exclude=original) == []
+    db.unlock_note(copy)
+    assert [[row[0] for row in group] for group in db.find_duplicates()] == [[original, copy]]
+
+    print("Testing the backfill of imported notes...")
+    stats = db.import_notes([{"title": f"Impor {i}", "catatan": page(edited)} for i in range(3)])
+    assert stats.imported == 3
+    assert db.index_duplicates(batch_size=2) == 3
+    assert db.index_duplicates() == 0
+    assert len(db.find_duplicates()[0]) == 5
+    print("All duplicate detection tests passed successfully!")
+
+    db.close()
+    remove_database(db_test_name)
+
+if __name__ == "__main__":
+    test_dedup()
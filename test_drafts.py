@@ -0,0 +1,51 @@
+from conftest import remove_database
+from database import DatabaseManager
+from drafts import DraftWriter, draft_key
+
+def draft_data(title, catatan="<p>isi</p>"):
+    return {"title": title, "catatan": catatan, "sumber": "", "tags": "kerja",
+            "pinned": False, "notebook_id": 0}
+
+def test_drafts():
+    print("Starting draft autosave tests...")
+    db_test_name = "test_drafts.db"
+    remove_database(db_test_name)
+    db = DatabaseManager(db_test_name)
+    note_id = db.add_note("Lama", "<p>lama</p>")[0]
+
+    print("Testing coalesced snapshots...")
+    writer = DraftWriter(db)
+    big = "<p>" + "ketik " * 50000 + "</p>"
+    for i in range(200):
+        writer.put(draft_key(), None, draft_data(f"Baru {i}", big))
+    writer.put(draft_key(note_id), note_id, draft_data("Lama diubah"))
+    assert writer.flush(5)
+    # 201 snapshots, far fewer transactions; only the newest one per editor is kept
+    assert writer.writes < 201, writer.writes
+    drafts = {key: (stored_id, data) for key, stored_id, data, _ in db.list_drafts()}
+    assert set(drafts) == {"new", f"note:{note_id}"}
+    assert drafts["new"][1]["title"] == "Baru 199"
+    assert drafts["new"][1]["catatan"] == big
+    assert drafts[f"note:{note_id}"] == (note_id, draft_data("Lama diubah"))
+
+    print("Testing restore after a restart...")
+    writer.close()
+    db.close()
+    db = DatabaseManager(db_test_name)
+    assert len(db.list_drafts()) == 2
+
+    print("Testing discard...")
+    writer = DraftWriter(db)
+    writer.put(draft_key(), None, draft_data("Lagi"))
+    writer.discard(draft_key())
+    writer.discard(draft_key(note_id))
+    writer.close()
+    assert db.list_drafts() == []
+    assert writer.error is None
+    print("All draft autosave tests passed successfully!")
+
+    db.close()
+    remove_database(db_test_name)
+
+if __name__ == "__main__":
+    test_drafts()
@@ -0,0 +1,75 @@
+from conftest import remove_database
+from database import DatabaseManager, QueryCancelled
+import exporter
+import csv
+import json
+import os
+import shutil
+import threading
+
+def test_export():
+    print("Starting export tests...")
+    db_test_name = "test_export.db"
+    out_dir = ".catat-segala/test_export_out"
+    remove_database(db_test_name)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+
+    db = DatabaseManager(db_test_name)
+    db.add_note("=SUM(A1:A2)", "<p>Isi <b>tebal</b></p>", "@sumber")
+    for i in range(9):
+        db.add_note(f"Catatan {i}", f"<p>Isi {i}</p>")
+
+    # CSV keeps the HTML and escapes formulas
+    print("Testing CSV export...")
+    calls = []
+    path = os.path.join(out_dir, "notes.csv")
+    count = exporter.export_notes(db, path, "csv", batch_size=4,
+                                  progress=lambda done, total: calls.append((done, total)))
+    assert count == 10
+    assert calls == [(4, 10), (8, 10), (10, 10)]
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == exporter.CSV_HEADER
+    assert rows[1][1] == "'=SUM(A1:A2)"
+    assert rows[1][2] == "<p>Isi <b>tebal</b></p>"
+    assert rows[1][3] == "'@sumber"
+    assert len(rows) == 11
+
+    print("Testing JSON Lines export...")
+    path = os.path.join(out_dir, "notes.jsonl")
+    exporter.export_notes(db, path, "jsonl", strip=True)
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 10
+    assert records[0]["title"] == "=SUM(A1:A2)"
+    assert records[0]["catatan"] == "Isi tebal"
+
+    print("Testing Markdown export...")
+    path = os.path.join(out_dir, "markdown")
+    exporter.export_notes(db, path, "markdown")
+    files = sorted(os.listdir(path))
+    assert len(files) == 10
+    assert files[1] == "000002-catatan-0.md"
+    with open(os.path.join(path, files[0]), encoding="utf-8") as f:
+        assert "Isi tebal" in f.read()
+
+    print("Testing cancelled export...")
+    cancel = threading.Event()
+    path = os.path.join(out_dir, "cancelled.csv")
+    try:
+        exporter.export_notes(db, path, "csv", batch_size=2, cancel=cancel,
+                              progress=lambda done, total: cancel.set())
+        assert False, "export should have been cancelled"
+    except QueryCancelled:
+        pass
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + ".part")
+    print("All export tests passed successfully!")
+
+    db.close()
+    shutil.rmtree(out_dir, ignore_errors=True)
+    remove_database(db_test_name)
+
+if __name__ == "__main__":
+    test_export()
@@ -0,0 +1,158 @@
+from conftest import remove_database
+from database import DatabaseManager
+import exporter
+import importer
+import json
+import os
+import shutil
+import threading
+
+def test_import():
+    print("Starting import tests...")
+    source_name = "test_import_source.db"
+    target_name = "test_import_target.db"
+    out_dir = ".catat-segala/test_import_out"
+    for name in (source_name, target_name):
+        remove_database(name)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+
+    source = DatabaseManager(source_name)
+    source.add_note("=formula", "<p>Isi dengan <b>HTML</b>, koma dan \"kutip\"</p>", "-sumber")
+    source.add_note("Kedua", "<p>baris\nbaru</p>")
+
+    print("Testing CSV round trip...")
+    csv_path = os.path.join(out_dir, "notes.csv")
+    exporter.export_notes(source, csv_path, "csv")
+    target = DatabaseManager(target_name)
+    stats = importer.import_file(target, csv_path)
+    assert stats.imported == 2 and stats.skipped == 0
+    assert [n[1:] for n in target.get_all_notes()] == [n[1:] for n in source.get_all_notes()]
+
+    print("Testing JSON Lines import...")
+    jsonl_path = os.path.join(out_dir, "notes.jsonl")
+    exporter.export_notes(source, jsonl_path, "jsonl")
+    stats = importer.import_file(target, jsonl_path)
+    assert stats.imported == 2
+    assert target.count_notes() == 4
+
+    print("Testing JSON array import...")
+    json_path = os.path.join(out_dir, "notes.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump([{"title": "Larik", "catatan": "<p>dari larik json</p>"},
+                   {"judul": "Larik kedua", "body": "<p>isi kedua</p>"}], f)
+    stats = importer.import_file(target, json_path)
+    assert stats.imported == 2
+    assert target.search_notes("larik")[0][1] == "Larik"
+    # JSON Lines saved as .json still works
+    with open(json_path, "w", encoding="utf-8") as f:
+        f.write('{"title": "Baris", "catatan": "<p>satu baris</p>"}\n')
+    assert importer.import_file(target, json_path).imported == 1
+    assert target.count_notes() == 7
+
+    print("Testing HTML folder import...")
+    html_dir = os.path.join(out_dir, "html")
+    os.makedirs(html_dir)
+    with open(os.path.join(html_dir, "artikel.html"), "w", encoding="utf-8") as f:
+        f.write("<html><head><title>Artikel Web</title></head><body><p>isi artikel unik</p></body></html>")
+    with open(os.path.join(html_dir, "tanpa-judul.htm"), "w", encoding="utf-8") as f:
+        f.write("<p>tanpa judul</p>")
+    with open(os.path.join(html_dir, "catatan.txt"), "w", encoding="utf-8") as f:
+        f.write("diabaikan")
+    stats = importer.import_file(target, html_dir)
+    assert stats.imported == 2
+    assert target.search_notes("unik")[0][1] == "Artikel Web"
+    assert len(target.search_notes("tanpa")) == 1
+
+    print("Testing bulk import in chunks...")
+    notes = ({"title": f"Massal {i}", "catatan": f"<p>catatan massal nomor {i}</p>"} for i in range(2500))
+    calls = []
+    stats = target.import_notes(
+        list(notes) + [{"title": "", "catatan": "<p> </p>"}],
+        chunk_size=1000, progress=lambda done, total: calls.append(done), workers=2)
+    assert stats.imported == 2500 and stats.skipped == 1
+    assert calls == [1000, 2000, 2501]
+    assert stats.rate > 0
+    assert len(target.search_notes("massal")) == 2500
+    # Untitled notes are named after their text
+    target.import_notes([{"catatan": "<p>hanya isi saja</p>"}])
+    assert target.search_notes("hanya")[0][1] == "hanya isi saja"
+
+    # The search trigger is back for normal writes
+    target.add_note("Setelah impor", "<p>kata istimewa</p>")
+    assert len(target.search_notes("istimewa")) == 1
+
+    print("Testing a cancelled import...")
+    cancel = threading.Event()
+    try:
+        target.import_notes(
+            ({"title": f"Batal {i}", "catatan": "<p>catatan dibatalkan</p>"} for i in range(30)),
+            chunk_size=10, progress=lambda done, total: cancel.set(), cancel=cancel)
+        assert False, "import should have been cancelled"
+    except Exception as e:
+        assert type(e).__name__ == "QueryCancelled"
+    assert len(target.search_notes("dibatalkan")) == 10
+    target.add_note("Sesudah batal", "<p>kata pilihan</p>")
+    assert len(target.search_notes("pilihan")) == 1
+
+    print("Testing the repair of a killed import...")
+    with target.writer() as conn:
+        conn.execute("DROP TRIGGER notes_fts_ai")
+    target.add_note("Yatim", "<p>kata terlantar</p>")
+    target.close()
+    target = DatabaseManager(target_name)
+    assert len(target.search_notes("terlantar")) == 1
+    with target.writer() as conn:
+        conn.execute("INSERT INTO notes_fts (notes_fts, rank) VALUES ('integrity-check', 1)")
+    print("All import tests passed successfully!")
+
+    source.close()
+    target.close()
+    shutil.rmtree(out_dir, ignore_errors=True)
+    for name in (source_name, target_name):
+        remove_database(name)
+
+def test_metadata_round_trip():
+    print("Starting tag, pin and notebook round trip tests...")
+    source_name = "test_import_meta_source.db"
+    out_dir = ".catat-segala/test_import_meta_out"
+    names = [source_name] + [f"test_import_meta_{fmt}.db" for fmt in ("csv", "jsonl")]
+    for name in names:
+        remove_database(name)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+
+    source = DatabaseManager(source_name)
+    kerja = source.add_notebook("Kerja")
+    source.add_note("Rapat", "<p>agenda rapat</p>", tags=["kantor", "=rumus"], pinned=True,
+                    notebook_id=kerja)
+    source.add_note("Belanja", "<p>daftar belanja</p>", tags="rumah")
+    source.add_note("Polos", "<p>tanpa apa-apa</p>")
+
+    def records(db):
+        return [row[1:] for batch in db.iter_notes() for row in batch]
+
+    for fmt in ("csv", "jsonl"):
+        print(f"Testing {fmt}...")
+        path = os.path.join(out_dir, f"notes.{fmt}")
+        exporter.export_notes(source, path, fmt)
+        target = DatabaseManager(f"test_import_meta_{fmt}.db")
+        # An existing notebook is reused, whatever its case
+        target.add_notebook("kerja")
+        assert importer.import_file(target, path).imported == 3
+        assert [row[:-1] for row in records(target)] == [row[:-1] for row in records(source)]
+        assert records(target)[0][-3:] == ("=rumus, kantor", 1, "kerja")
+        assert [row[1:] for row in target.list_notebooks()] == [("kerja", 1)]
+        assert [row[1:] for row in target.list_tags()] == [("=rumus", 1), ("kantor", 1), ("rumah", 1)]
+        assert len(target.get_notes_page(pinned=True)) == 1
+        target.close()
+    print("All round trip tests passed successfully!")
+
+    source.close()
+    shutil.rmtree(out_dir, ignore_errors=True)
+    for name in names:
+        remove_database(name)
+
+if __name__ == "__main__":
+    test_import()
+    test_metadata_round_trip()
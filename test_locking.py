@@ -0,0 +1,171 @@
+import pytest
+pytest.importorskip("cryptography")
+
+from database import DatabaseManager, QueryCancelled
+import backup
+import exporter
+import importer
+import locking
+import os
+import shutil
+import threading
+
+def test_locked_notes():
+    # Cheap scrypt parameters keep the test fast, the real cost comes back afterwards
+    scrypt_n = locking.SCRYPT_N
+    locking.SCRYPT_N = 2 ** 10
+    try:
+        check_locked_notes()
+    finally:
+        locking.SCRYPT_N = scrypt_n
+
+def check_locked_notes():
+    print("Starting locked note tests...")
+    folder = ".catat-segala/test_locking"
+    shutil.rmtree(folder, ignore_errors=True)
+    db = DatabaseManager("test_locking.db", folder=folder)
+    db.add_note("Token API", "<p>rahasia-123 sangat rahasia supersecretapikey</p>")
+    db.add_note("Biasa", "<p>catatan terbuka</p>")
+    secret_id = db.search_notes("Token")[0][0]
+
+    print("Testing lock and decrypt on demand...")
+    try:
+        db.lock_notes([secret_id])
+        assert False, "locking needs a password"
+    except locking.VaultLocked:
+        pass
+    db.set_password("kata sandi")
+    draft = {"title": "Token API", "catatan": "<p>rahasia-123 belum disimpan</p>", "sumber": "",
+             "tags": "", "pinned": False, "notebook_id": 0}
+    db.save_drafts([(f"note:{secret_id}", secret_id, draft)])
+    assert db.lock_notes([secret_id]) == 1
+    assert db.list_drafts() == []
+    with db.reader() as conn:
+        catatan, plain_text = conn.execute(
+            "SELECT catatan, plain_text FROM notes WHERE id = ?", (secret_id,)).fetchone()
+    assert "rahasia" not in catatan and plain_text == ""
+    # Neither free pages nor old full-text segments keep the text
+    for suffix in ("", "-wal"):
+        path = os.path.join(folder, "test_locking.db" + suffix)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                assert b"supersecretapikey" not in f.read(), path
+    # List and search never see the body
+    assert db.search_notes("rahasia") == []
+    assert db.search_notes("Token")[0][2] == "\U0001F512 Catatan terkunci"
+    assert "rahasia-123" in db.get_note(secret_id)[2]
+
+    print("Testing exports leave locked notes out...")
+    for fmt in ("csv", "jsonl"):
+        path = os.path.join(folder, f"notes.{fmt}")
+        assert exporter.export_notes(db, path, fmt) == 1
+        with open(path, encoding="utf-8") as f:
+            assert locking.TOKEN_PREFIX not in f.read()
+        copy = DatabaseManager(f"copy_{fmt}.db", folder=folder)
+        assert importer.import_file(copy, path).imported == 1
+        assert [note[1] for note in copy.get_notes_page()] == ["Biasa"]
+        copy.close()
+    # Ciphertext from an older export is refused instead of becoming a note
+    with db.reader() as conn:
+        token = conn.execute("SELECT catatan FROM notes WHERE id = ?", (secret_id,)).fetchone()[0]
+    stats = db.import_notes([{"title": "Token API", "catatan": token}])
+    assert stats.imported == 0 and stats.skipped == 1
+
+    db.lock_session()
+    try:
+        db.get_note(secret_id)
+        assert False, "locked note must not decrypt without the key"
+    except locking.NoteLocked:
+        pass
+    try:
+        db.unlock("salah")
+        assert False, "wrong password must be rejected"
+    except locking.WrongPassword:
+        pass
+    print("Testing a save racing with a lock...")
+    db.unlock("kata sandi")
+    # The note was checked as unlocked just before it got locked
+    db.is_locked = lambda note_id: False
+    db.update_note(secret_id, "Token API", "<p>rahasia-789</p>")
+    del db.is_locked
+    with db.reader() as conn:
+        catatan, plain_text = conn.execute(
+            "SELECT catatan, plain_text FROM notes WHERE id = ?", (secret_id,)).fetchone()
+    assert catatan.startswith(locking.TOKEN_PREFIX) and plain_text == ""
+    assert "rahasia-789" in db.get_note(secret_id)[2]
+
+    print("Testing a save after the key expired...")
+    db.keys.ttl = 0
+    db.unlock("kata sandi")
+    try:
+        db.update_note(secret_id, "Token API", "<p>rahasia-456</p>")
+        assert False, "saving a locked note needs the key"
+    except locking.VaultLocked:
+        pass
+    # The editor asks for the password again and retries with the same data
+    db.keys.ttl = locking.KEY_CACHE_SECONDS
+    db.unlock("kata sandi")
+    db.update_note(secret_id, "Token API", "<p>rahasia-456</p>")
+    assert db.search_notes("456") == []
+    assert "rahasia-456" in db.get_note(secret_id)[2]
+
+    print("Testing resumable re-key...")
+    for i in range(5):
+        db.add_note(f"Rahasia {i}", f"<p>isi {i}</p>")
+    ids = [note[0] for note in db.get_notes_page() if note[0] != secret_id]
+    assert db.lock_notes(ids, batch_size=2) == len(ids)
+    db.set_password("sandi baru", current_password="kata sandi")
+    assert db.pending_rekey() == len(ids) + 1
+
+    cancel = threading.Event()
+    try:
+        db.rekey_notes(batch_size=2, cancel=cancel, progress=lambda done, total: cancel.set())
+        assert False, "re-key should have been cancelled"
+    except QueryCancelled:
+        pass
+    assert db.pending_rekey() == len(ids) - 1
+
+    # After a restart only the new password is known
+    db.close()
+    db = DatabaseManager("test_locking.db", folder=folder)
+    db.unlock("sandi baru")
+    assert "rahasia-456" in db.get_note(secret_id)[2]
+    db.rekey_notes(batch_size=2)
+    assert db.pending_rekey() == 0
+    with db.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM vault_keys").fetchone()[0] == 1
+
+    print("Testing unlock for good...")
+    db.unlock_note(secret_id)
+    assert not db.is_locked(secret_id)
+    assert [note[0] for note in db.search_notes("456")] == [secret_id]
+    db.lock_session()
+    assert "rahasia-456" in db.get_note(secret_id)[2]
+
+    print("Testing restore forgets cached keys...")
+    # Both vaults number their first key 1, with different passwords
+    source = DatabaseManager("source.db", folder=folder)
+    source.set_password("sandi sumber")
+    source_id = source.add_note("Sumber", "<p>isi sumber</p>")[0]
+    source.lock_notes([source_id])
+    backup_path = os.path.join(folder, "source_backup.db")
+    backup.backup_database(source, backup_path)
+    source.close()
+    target = DatabaseManager("target.db", folder=folder)
+    target.set_password("sandi tujuan")
+    backup.restore_database(target, backup_path)
+    try:
+        target.get_note(source_id)
+        assert False, "the restored note needs its own password"
+    except locking.NoteLocked:
+        pass
+    target.unlock("sandi sumber")
+    assert "isi sumber" in target.get_note(source_id)[2]
+    target.close()
+    print("All locked note tests passed successfully!")
+
+    db.close()
+    shutil.rmtree(folder, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_locked_notes()
@@ -0,0 +1,79 @@
+from conftest import remove_database
+from database import DatabaseManager
+import revisions
+from datetime import datetime, timedelta
+import random
+
+def page(paragraphs):
+    return "<html><body>\n" + "\n".join(f'<p style="margin:0">{p}</p>' for p in paragraphs) + "\n</body></html>"
+
+def test_revisions():
+    print("Starting revision tests...")
+    db_test_name = "test_revisions.db"
+    remove_database(db_test_name)
+    db = DatabaseManager(db_test_name)
+
+    print("Testing delta storage of a heavily edited note...")
+    rng = random.Random(7)
+    paragraphs = [f"Paragraf {i}. " + " ".join(rng.choice(["catat", "segala", "kopi", "teh", "resep"])
+                                               for _ in range(40)) for i in range(300)]
+    versions = [page(paragraphs)]
+    note_id = db.add_note("Panjang", versions[0])[0]
+    for i in range(40):
+        paragraphs[rng.randrange(len(paragraphs))] += f" Tambahan {i}."
+        versions.append(page(paragraphs))
+        db.update_note(note_id, f"Panjang {i}", versions[-1])
+    history = db.list_revisions(note_id)
+    assert len(history) == 40
+    assert history[0][2] == "Panjang 38" and history[-1][2] == "Panjang"
+    # Oldest to newest, every earlier version comes back exactly
+    for (revision_id, _, _, size), expected in zip(reversed(history), versions):
+        assert db.get_revision(revision_id)[2] == expected
+        assert size == len(expected)
+    with db.reader() as conn:
+        stored, keyframes = conn.execute(
+            "SELECT SUM(LENGTH(data)), SUM(kind) FROM note_revisions").fetchone()
+    naive = sum(len(v.encode("utf-8")) for v in versions[:-1])
+    assert stored < naive * 0.1, (stored, naive)
+    assert keyframes == 40 // revisions.KEYFRAME_INTERVAL
+    # Metadata-only saves are not new versions
+    db.update_note(note_id, "Panjang 39", versions[-1], pinned=True)
+    assert len(db.list_revisions(note_id)) == 40
+
+    print("Testing restore...")
+    oldest = history[-1][0]
+    db.restore_revision(oldest)
+    assert db.get_note(note_id)[1:3] == ("Panjang", versions[0])
+    assert db.list_revisions(note_id)[0][2] == "Panjang 39"
+
+    print("Testing pruning and compaction...")
+    with db.writer() as conn:
+        ids = [row[0] for row in conn.execute(
+            "SELECT id FROM note_revisions WHERE note_id = ? ORDER BY id", (note_id,))]
+        start = datetime(2024, 1, 1)
+        # Two revisions per day, the newest ones from today
+        for n, revision_id in enumerate(ids):
+            saved = start + timedelta(hours=12 * n)
+            conn.execute("UPDATE note_revisions SET saved_at = ? WHERE id = ?",
+                         (saved.strftime("%Y-%m-%d %H:%M:%S"), revision_id))
+    now = start + timedelta(hours=12 * len(ids))
+    expected = {revision_id: db.get_revision(revision_id)[2] for revision_id in ids}
+    deleted = db.prune_revisions(now=now)
+    kept = [row[0] for row in db.list_revisions(note_id)]
+    assert deleted == len(ids) - len(kept) > 0
+    assert len(kept) >= revisions.KEEP_MIN
+    for revision_id in kept:
+        assert db.get_revision(revision_id)[2] == expected[revision_id]
+    assert db.prune_revisions(now=now) == 0
+
+    print("Testing locked notes keep no history...")
+    db.set_password("rahasia")
+    db.lock_notes([note_id])
+    assert db.list_revisions(note_id) == []
+    print("All revision tests passed successfully!")
+
+    db.close()
+    remove_database(db_test_name)
+
+if __name__ == "__main__":
+    test_revisions()
@@ -0,0 +1,123 @@
+from conftest import remove_database
+from database import DatabaseManager
+import server
+import asyncio
+import json
+
+async def request(port, method, path, body=None, content_type="application/json"):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = b"" if body is None else body.encode("utf-8")
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                 f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    status = int(head.split(b" ")[1])
+    if b"chunked" in head:
+        chunks = b""
+        while True:
+            size, _, payload = payload.partition(b"\r\n")
+            size = int(size, 16)
+            if not size:
+                break
+            chunks, payload = chunks + payload[:size], payload[size + 2:]
+        payload = chunks
+    return status, payload.decode("utf-8")
+
+async def run_server_checks(db):
+    api = await server.NotesServer(db, port=0, window=0.05).start()
+    port = api.port
+    try:
+        print("Testing coalesced writes...")
+        results = await asyncio.gather(*[
+            request(port, "POST", "/notes", json.dumps({"title": f"API {i}", "catatan": "<p>isi api</p>",
+                                                        "tags": ["api"]}))
+            for i in range(20)
+        ])
+        assert all(status == 201 for status, _ in results)
+        ids = [json.loads(body)[0]["id"] for _, body in results]
+        assert len(set(ids)) == 20
+        assert api.writes.batches < 20
+
+        status, body = await request(port, "POST", "/notes",
+                                     '{"title": "satu"}\n{"title": "dua", "sumber": "cli"}\n',
+                                     content_type="application/x-ndjson")
+        assert status == 201 and len(json.loads(body)) == 2
+        status, _ = await request(port, "POST", "/notes", json.dumps([{"title": 5}]))
+        assert status == 400
+        # A bad note (unknown notebook) fails alone, not the batch it shared
+        good, bad = await asyncio.gather(
+            request(port, "POST", "/notes", json.dumps({"title": "baik"})),
+            request(port, "POST", "/notes", json.dumps({"title": "buruk", "notebook_id": 999})),
+        )
+        assert good[0] == 201 and bad[0] == 400
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /notes HTTP/1.1\r\nX-Besar: " + b"a" * 100000 + b"\r\n\r\n")
+        await writer.drain()
+        assert (await reader.readline()).split(b" ")[1] == b"431"
+        writer.close()
+        for length in (b"-5", b"%d" % (server.MAX_BODY_SIZE + 1)):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"POST /notes HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+            await writer.drain()
+            status = (await reader.readline()).split(b" ")[1]
+            assert status == (b"400" if length == b"-5" else b"413"), status
+            writer.close()
+        status, _ = await request(port, "POST", "/notes", json.dumps({"title": "x", "tags": {"a": 1}}))
+        assert status == 400
+        status, _ = await request(port, "POST", "/notes", json.dumps({"title": "x", "notebook_id": "1"}))
+        assert status == 400
+        status, _ = await request(port, "POST", "/notes", json.dumps({"title": "x", "pinned": "no"}))
+        assert status == 400
+        # Untitled notes are named after their text, as imports are
+        status, body = await request(port, "POST", "/notes", json.dumps({"catatan": "<p>tanpa judul</p>"}))
+        assert status == 201 and json.loads(body)[0]["title"] == "tanpa judul"
+        await request(port, "DELETE", f"/notes/{json.loads(body)[0]['id']}")
+
+        print("Testing streamed lists...")
+        server.STREAM_BATCH = 7
+        status, body = await request(port, "GET", "/notes")
+        assert status == 200 and len(json.loads(body)) == 23
+        status, body = await request(port, "GET", "/notes?limit=10&tag=api")
+        assert [r["id"] for r in json.loads(body)] == sorted(ids, reverse=True)[:10]
+        status, body = await request(port, "GET", "/search?q=api&limit=15")
+        assert len(json.loads(body)) == 15
+        status, body = await request(port, "GET", "/search?q=tidakada")
+        assert json.loads(body) == []
+        status, body = await request(port, "GET", "/export")
+        assert len(body.splitlines()) == 23
+
+        print("Testing single notes...")
+        status, body = await request(port, "GET", f"/notes/{ids[0]}")
+        assert status == 200 and json.loads(body)["catatan"] == "<p>isi api</p>"
+        status, _ = await request(port, "DELETE", f"/notes/{ids[0]}")
+        assert status == 200
+        status, _ = await request(port, "GET", f"/notes/{ids[0]}")
+        assert status == 404
+        status, _ = await request(port, "GET", "/tidak-ada")
+        assert status == 404
+        for path in ("/notes/99999999999999999999999", "/notes?limit=-1",
+                     "/notes?since=kemarin", "/search?q=api&limit=99999999999999999999"):
+            status, _ = await request(port, "GET", path)
+            assert status == 400, path
+        status, _ = await request(port, "GET", "/notes?since=2020-01-01&until=2999-01-01%2000:00:00")
+        assert status == 200
+        status, _ = await request(port, "PUT", "/notes")
+        assert status == 405
+    finally:
+        server.STREAM_BATCH = 500
+        await api.close()
+
+def test_server():
+    print("Starting API server tests...")
+    db_test_name = "test_server.db"
+    remove_database(db_test_name)
+    db = DatabaseManager(db_test_name)
+    asyncio.run(run_server_checks(db))
+    print("All API server tests passed successfully!")
+    db.close()
+    remove_database(db_test_name)
+
+if __name__ == "__main__":
+    test_server()
@@ -0,0 +1,77 @@
+import re
+from html.parser import HTMLParser
+
+SNIPPET_LENGTH = 100
+
+# Elements whose content is never shown to the user. QTextEdit.toHtml() emits a
+# full document with a <style> block in the head, pasted web pages add scripts.
+_HIDDEN_TAGS = {"head", "title", "style", "script", "noscript", "template"}
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt",
+    "figcaption", "figure", "footer", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table",
+    "td", "th", "tr", "ul",
+}
+_SPACES = re.compile(r"[ \t\r\f\v\xa0]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.hidden = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _HIDDEN_TAGS:
+            self.hidden += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _HIDDEN_TAGS:
+            self.hidden = max(0, self.hidden - 1)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.hidden:
+            self.parts.append(data)
+
+
+def html_to_text(html_str):
+    """Extract the visible text of an HTML document, one line per block."""
+    if not html_str:
+        return ""
+    parser = _TextExtractor()
+    parser.feed(str(html_str))
+    parser.close()
+    lines = (_SPACES.sub(" ", line).strip() for line in "".join(parser.parts).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def strip_html(html_str):
+    """Return the visible text of an HTML fragment on a single line."""
+    return _WHITESPACE.sub(" ", html_to_text(html_str)).strip()
+
+
+def make_snippet(text, length=SNIPPET_LENGTH):
+    """Shorten already extracted text for the list preview."""
+    text = _WHITESPACE.sub(" ", text or "").strip()
+    return (text[:length] + "...") if len(text) > length else text
+
+
+def parse_tags(text):
+    """Split "a, b,  c" into ["a", "b", "c"], without empty or repeated tags."""
+    if isinstance(text, (list, tuple, set)):
+        text = ",".join(text)
+    tags = []
+    for tag in (text or "").split(","):
+        tag = _WHITESPACE.sub(" ", tag).strip()
+        if tag and tag.lower() not in (t.lower() for t in tags):
+            tags.append(tag)
+    return tags
@@ -0,0 +1,137 @@
+import threading
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+from database import QueryCancelled
+
+SEARCH_DEBOUNCE_MS = 250
+
+
+class SearchSignals(QObject):
+    finished = Signal(int, str, list)
+    failed = Signal(int, str)
+
+
+class SearchTask(QRunnable):
+    """Runs one search on a pooled reader connection off the GUI thread."""
+
+    def __init__(self, db, generation, query, limit, cancel, filters=None):
+        super().__init__()
+        self.db = db
+        self.generation = generation
+        self.query = query
+        self.limit = limit
+        self.cancel = cancel
+        self.filters = dict(filters or {})
+        self.signals = SearchSignals()
+
+    def run(self):
+        try:
+            rows = self.db.search_notes(self.query, limit=self.limit, cancel=self.cancel,
+                                        **self.filters)
+        except QueryCancelled:
+            return
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+            return
+        if not self.cancel.is_set():
+            self.signals.finished.emit(self.generation, self.query, rows)
+
+
+class SearchController(QObject):
+    """Search-as-you-type: debounces input and keeps only the latest query.
+
+    Every new query sets the cancel event of the one still running, which
+    makes SQLite abort it from its progress handler. Results that arrive for
+    an older generation are dropped, so the table never flickers back to a
+    stale result set.
+    """
+
+    results_ready = Signal(str, list)
+    search_failed = Signal(str)
+
+    def __init__(self, db, page_size, delay_ms=SEARCH_DEBOUNCE_MS, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.page_size = page_size
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(2)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay_ms)
+        self.timer.timeout.connect(self._start)
+        self._pending = ""
+        # List filters (see database.note_filters) applied to every search
+        self.filters = {}
+        self._generation = 0
+        self._cancel = None
+
+    def schedule(self, query):
+        """Search for `query` once the user stops typing."""
+        self._pending = query
+        self.timer.start()
+
+    def run_now(self, query):
+        self._pending = query
+        self.timer.stop()
+        self._start()
+
+    def cancel(self):
+        """Drop the pending and the running search."""
+        self.timer.stop()
+        self._generation += 1
+        if self._cancel is not None:
+            self._cancel.set()
+            self._cancel = None
+
+    def _start(self):
+        self.cancel()
+        self._cancel = threading.Event()
+        task = SearchTask(self.db, self._generation, self._pending, self.page_size, self._cancel,
+                          self.filters)
+        task.signals.finished.connect(self._on_finished)
+        task.signals.failed.connect(self._on_failed)
+        self.pool.start(task)
+
+    def _on_finished(self, generation, query, rows):
+        if generation == self._generation:
+            self.results_ready.emit(query, rows)
+
+    def _on_failed(self, generation, message):
+        if generation == self._generation:
+            self.search_failed.emit(message)
+
+
+class TaskSignals(QObject):
+    progress = Signal(int, int)
+    finished = Signal(object)
+    failed = Signal(str)
+    cancelled = Signal()
+
+
+class BackgroundTask(QRunnable):
+    """Runs `fn(progress=..., cancel=...)` on the global thread pool.
+
+    The result is delivered through `signals.finished`; setting `cancel`
+    (e.g. from a QProgressDialog) ends the task with `signals.cancelled`.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.cancel = threading.Event()
+        self.signals = TaskSignals()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, progress=self.signals.progress.emit,
+                             cancel=self.cancel, **self.kwargs)
+        except QueryCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+    def start(self):
+        QThreadPool.globalInstance().start(self)